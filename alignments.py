@@ -0,0 +1,334 @@
+"""
+Alignment-based conformance checking.
+
+An alignment pairs every event of a trace with a run of the network (read as a Petri net like in
+`conformance`). Moves are
+
+    (activity, node)  synchronous move - event and transition agree, cost 0
+    (activity, SKIP)  log move - event the network cannot do at this point, cost 1
+    (SKIP, node)      model move - transition with no event, cost 1 (0 for gates, SOURCE and SINK)
+
+Optimal alignment (lowest cost) is found by A* search over the synchronous product of the trace
+and the network, states are (position in trace, marking). Heuristic is the number of remaining events
+whose activity is not in the network at all (or all remaining events once the marking is empty),
+those must be log moves, so it never overestimates and found alignments are optimal.
+
+Every unique variant is aligned once, variants are distributed over a process pool. Search of a variant
+stops after `max_states` expanded states, the deepest partial alignment found so far is then completed
+by log moves and a search for the final marking with its own budget `max_completion_states` - an approximate
+alignment, its cost is an upper bound. The same happens when the final marking is not reachable at all
+(unsound network). If the completion fails too, the alignment is incomplete - its cost covers only moves
+up to the end of the trace, so it is left out of the log fitness and counted in `AlignmentResult.incomplete`.
+"""
+from __future__ import annotations
+
+import hashlib
+import heapq
+import json
+import os
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from itertools import count
+from typing import Dict, FrozenSet, Iterable, List, MutableMapping, NamedTuple, Optional, Tuple, Union
+
+from conformance import Model, Place, SOURCE, Variant
+from import_handler import Result
+from instrumentation import instrumented
+from network import Network
+
+SKIP = '>>'
+
+Move = Tuple[str, str]
+Marking = FrozenSet[Tuple[Place, int]]
+
+
+class Alignment(NamedTuple):
+    trace: Tuple[str, ...]
+    count: float
+    moves: Tuple[Move, ...]
+    cost: int  # if not complete, only of moves up to the end of the trace
+    fitness: float
+    optimal: bool  # False if search budget was exceeded
+    complete: bool  # False if final marking was not reached, even approximately
+    expanded: int  # number of expanded search states
+    deviations: Tuple[Tuple[int, Move], ...]  # (position in trace, move) of log and visible model moves
+
+
+class AlignmentResult:
+    def __init__(self, alignments: List[Alignment], empty_cost: int):
+        """
+        :param alignments: alignment of every unique variant, most frequent first
+        :param empty_cost: cost of aligning an empty trace - the shortest visible run of the network
+        """
+        self.alignments = alignments
+        self.empty_cost = empty_cost
+
+    @property
+    def fitness(self) -> float:
+        """
+        Log fitness, 1 - total cost / total cost of worst alignments (all log moves, then the shortest run).
+        Incomplete alignments have no upper bound of cost, they are left out.
+        """
+        complete = [a for a in self.alignments if a.complete]
+        worst = sum((len(a.trace) + self.empty_cost) * a.count for a in complete)
+        return 1 - sum(a.cost * a.count for a in complete) / worst if worst else 1.0
+
+    @property
+    def approximate(self) -> int:
+        """
+        :return: number of variants with approximate alignment
+        """
+        return sum(1 for a in self.alignments if not a.optimal)
+
+    @property
+    def incomplete(self) -> int:
+        """
+        :return: number of variants whose alignment doesn't reach the final marking
+        """
+        return sum(1 for a in self.alignments if not a.complete)
+
+    def deviations(self) -> Counter:
+        """
+        :return: Counter (activity, node) -> number of cases, of log and visible model moves
+        """
+        counter = Counter()
+        for alignment in self.alignments:
+            for _, move in alignment.deviations:
+                counter[move] += alignment.count
+        return counter
+
+
+class _Aligned(NamedTuple):
+    # alignment without variant count, the cached value
+    moves: Tuple[Move, ...]
+    cost: int
+    optimal: bool
+    complete: bool
+    expanded: int
+
+
+class _Product:
+    """
+    Synchronous product of a model and a trace, shared by all traces aligned with the model
+    """
+    def __init__(self, model: Model):
+        self.model = model
+        self.labels = {name for name in model.successors if model.has_transition(name)}
+        self.consumers: Dict[Place, List[str]] = dict()
+        for name, inputs in model.inputs.items():
+            for place in inputs:
+                self.consumers.setdefault(place, []).append(name)
+        initial = Counter()
+        for place in model.outputs[SOURCE]:
+            initial[place] += 1
+        self.initial: Marking = frozenset(initial.items())
+
+    def model_moves(self, marking: Marking) -> Iterable[Tuple[str, Marking]]:
+        """
+        :return: (node, marking after firing it) of all enabled transitions
+        """
+        tokens = dict(marking)
+        seen = set()
+        for place in tokens:
+            for name in self.consumers.get(place, ()):
+                inputs = self.model.inputs[name]
+                if self.model.is_and[name]:
+                    if name in seen or not all(p in tokens for p in inputs):
+                        continue
+                    seen.add(name)
+                    consumed = inputs
+                else:
+                    consumed = (place,)
+                yield name, self._fire(tokens, consumed, self.model.outputs[name])
+
+    @staticmethod
+    def _fire(tokens: Dict[Place, int], consumed, produced) -> Marking:
+        new = dict(tokens)
+        for place in consumed:
+            if new[place] == 1:
+                del new[place]
+            else:
+                new[place] -= 1
+        for place in produced:
+            new[place] = new.get(place, 0) + 1
+        return frozenset(new.items())
+
+    def search(self, trace: Tuple[str, ...], initial: Marking, max_states: Optional[int]) -> \
+            Tuple[Optional[List[Move]], int, Tuple[int, Marking], List[Move], int]:
+        """
+        A* search from `initial` marking to the empty one
+
+        :return: (moves or None if budget was exceeded or final marking is unreachable, cost,
+            deepest state reached, moves to it, number of expanded states)
+        """
+        # remaining events which have to be log moves
+        not_in_model = [0] * (len(trace) + 1)
+        for i in range(len(trace) - 1, -1, -1):
+            not_in_model[i] = not_in_model[i + 1] + (trace[i] not in self.labels)
+
+        def heuristic(i: int, marking: Marking) -> int:
+            return not_in_model[i] if marking else len(trace) - i
+
+        start = (0, initial)
+        best = {start: 0}
+        parents: Dict[Tuple[int, Marking], Tuple[Tuple[int, Marking], Move]] = dict()
+        tie = count()
+        heap = [(heuristic(0, initial), 0, next(tie), 0, start)]
+        deepest = start
+        expanded = 0
+
+        def path(state) -> List[Move]:
+            moves = []
+            while state in parents:
+                state, move = parents[state]
+                moves.append(move)
+            return moves[::-1]
+
+        while heap:
+            _, _, _, g, state = heapq.heappop(heap)
+            if g > best[state]:
+                continue
+            i, marking = state
+            if i == len(trace) and not marking:
+                return path(state), g, state, [], expanded
+            if i > deepest[0]:
+                deepest = state
+            expanded += 1
+            if max_states is not None and expanded > max_states:
+                return None, g, deepest, path(deepest), expanded
+
+            successors = []
+            if i < len(trace):
+                successors.append(((i + 1, marking), (trace[i], SKIP), 1))
+            for name, new_marking in self.model_moves(marking):
+                if self.model.is_silent[name]:
+                    successors.append(((i, new_marking), (SKIP, name), 0))
+                else:
+                    successors.append(((i, new_marking), (SKIP, name), 1))
+                    if i < len(trace) and trace[i] == name:
+                        successors.append(((i + 1, new_marking), (name, name), 0))
+
+            for new_state, move, cost in successors:
+                new_g = g + cost
+                if new_g < best.get(new_state, new_g + 1):
+                    best[new_state] = new_g
+                    parents[new_state] = (state, move)
+                    # deeper states first among equal estimates
+                    heapq.heappush(heap, (new_g + heuristic(*new_state), -new_state[0], next(tie), new_g, new_state))
+
+        return None, 0, deepest, path(deepest), expanded
+
+    def align(self, trace: Tuple[str, ...], max_states: Optional[int],
+              max_completion_states: Optional[int]) -> _Aligned:
+        moves, cost, deepest, partial, expanded = self.search(trace, self.initial, max_states)
+        if moves is not None:
+            return _Aligned(tuple(moves), cost, True, True, expanded)
+
+        # approximate: deepest partial alignment, rest of trace as log moves, then the final marking
+        i, marking = deepest
+        moves = partial + [(activity, SKIP) for activity in trace[i:]]
+        completion, _, _, _, completion_expanded = self.search((), marking, max_completion_states)
+        complete = completion is not None
+        if complete:
+            moves += completion
+        cost = len(self.deviations(moves))
+        return _Aligned(tuple(moves), cost, False, complete, expanded + completion_expanded)
+
+    def deviations(self, moves: Iterable[Move]) -> Tuple[Tuple[int, Move], ...]:
+        """
+        :return: (position in trace, move) of log and visible model moves
+        """
+        position = 0
+        result = []
+        for log, name in moves:
+            if name == SKIP or (log == SKIP and not self.model.is_silent[name]):
+                result.append((position, (log, name)))
+            if log != SKIP:
+                position += 1
+        return tuple(result)
+
+
+def model_key(model: Model) -> str:
+    """
+    :return: hash of model structure, identifies cached alignments
+    """
+    description = [(name, model.inputs[name], model.outputs[name], model.is_and[name], model.is_silent[name])
+                   for name in sorted(model.successors)]
+    return hashlib.sha256(json.dumps(description).encode()).hexdigest()[:32]
+
+
+# product of the model, in every worker process
+_worker_product: Optional[_Product] = None
+
+
+def _init_worker(model: Model):
+    global _worker_product
+    _worker_product = _Product(model)
+
+
+def _align_in_worker(trace: Tuple[str, ...], max_states: Optional[int], max_completion_states: Optional[int]) \
+        -> _Aligned:
+    return _worker_product.align(trace, max_states, max_completion_states)
+
+
+def _alignment_counts(result: AlignmentResult, *args, **kwargs):
+    return {'variants': len(result.alignments), 'approximate': result.approximate, 'incomplete': result.incomplete}
+
+
+@instrumented(counts=_alignment_counts)
+def align_log(network: Network, log: Union[Result, Iterable[Variant]], max_states: Optional[int] = 100000,
+              max_completion_states: Optional[int] = 100000,
+              workers: int = None, cache: MutableMapping[str, _Aligned] = None) -> AlignmentResult:
+    """
+    Aligns every unique variant of the log with the network
+
+    :param network: network to check, usually mined by `miner.alpha_miner`
+    :param log: import result or (trace, number of cases) pairs
+    :param max_states: search budget per variant, None for no limit. Variants exceeding it get approximate alignments
+    :param max_completion_states: search budget for completing an approximate alignment to the final marking
+    :param workers: number of processes, CPU count by default. 1 aligns in this process
+    :param cache: mapping (e.g. dict or `shelve`) keeping alignments between calls, keys contain
+        hash of the network structure and the budgets, so it can be shared by different networks
+    """
+    variants = log.get_variants() if isinstance(log, Result) else log
+    counts = Counter()
+    for trace, cnt in variants:
+        counts[tuple(trace)] += cnt
+
+    model = Model(network)
+    product = _Product(model)
+    key_prefix = json.dumps([model_key(model), max_states, max_completion_states])
+
+    def cache_key(trace):
+        return f'{key_prefix}{json.dumps(trace)}'
+
+    aligned: Dict[Tuple[str, ...], _Aligned] = dict()
+    if cache is not None:
+        for trace in counts:
+            if cache_key(trace) in cache:
+                aligned[trace] = cache[cache_key(trace)]
+
+    # longest first, so the pool is not left waiting for one long trace at the end
+    pending = sorted((trace for trace in counts if trace not in aligned), key=len, reverse=True)
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(pending) <= 1:
+        results = [product.align(trace, max_states, max_completion_states) for trace in pending]
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(pending)), initializer=_init_worker,
+                                 initargs=(model,)) as executor:
+            results = list(executor.map(_align_in_worker, pending, [max_states] * len(pending),
+                                        [max_completion_states] * len(pending),
+                                        chunksize=max(1, len(pending) // (4 * workers))))
+    for trace, result in zip(pending, results):
+        aligned[trace] = result
+        if cache is not None:
+            cache[cache_key(trace)] = result
+
+    empty = aligned.get(()) or product.align((), max_states, max_completion_states)
+    alignments = []
+    for trace, cnt in counts.most_common():
+        result = aligned[trace]
+        worst = len(trace) + empty.cost
+        alignments.append(Alignment(trace, cnt, result.moves, result.cost, 1 - result.cost / worst if worst else 1.0,
+                                    result.optimal, result.complete, result.expanded, product.deviations(result.moves)))
+    return AlignmentResult(alignments, empty.cost)
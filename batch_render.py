@@ -0,0 +1,160 @@
+"""
+Rendering many diagrams at once in worker processes
+
+Every job is rendered in its own process, so a job exceeding its timeout can be killed
+without affecting the others. Hash of DOT source of every rendered job is kept in a cache file
+in the output directory and jobs which didn't change since the last run are skipped.
+"""
+import hashlib
+import json
+import multiprocessing
+import os
+import queue
+import tempfile
+import time
+from typing import Dict, NamedTuple, Optional, Union
+
+from network import Network
+
+CACHE_FILE = '.render_cache.json'
+
+
+class RenderOutcome(NamedTuple):
+    path: str
+    status: str  # 'rendered', 'unchanged', 'failed' or 'timeout'
+    error: Optional[str] = None
+    seconds: float = 0.0
+
+
+def render_batch(jobs: Dict[str, Union[Network, str]],
+                 output_dir='results',
+                 format='png',
+                 prog='dot',
+                 workers: int = None,
+                 timeout: float = None,
+                 use_cache=True,
+                 **graph_options) -> Dict[str, RenderOutcome]:
+    """
+    Renders many networks in parallel, each one to `{output_dir}/{name}.{format}`
+
+    :param jobs: dict name -> network or its DOT source
+    :param output_dir: directory for rendered files and cache
+    :param format: Graphviz output format
+    :param prog: Graphviz layout engine
+    :param workers: number of jobs rendered at once, CPU count by default
+    :param timeout: max seconds per job, job is killed after that
+    :param use_cache: skip jobs with unchanged DOT source whose output file exists
+    :param graph_options: passed to `drawing.build_graph` for networks
+    :return: dict name -> outcome of the job
+    """
+    from drawing import build_graph
+
+    os.makedirs(output_dir, exist_ok=True)
+    cache_path = os.path.join(output_dir, CACHE_FILE)
+    cache = _load_cache(cache_path) if use_cache else {}
+
+    outcomes = dict()
+    pending = []
+    hashes = dict()
+    for name, source in jobs.items():
+        dot = source if isinstance(source, str) else build_graph(source, **graph_options).string()
+        path = os.path.join(output_dir, f'{name}.{format}')
+        hashes[name] = hashlib.sha256(f'{prog}\0{format}\0{dot}'.encode()).hexdigest()
+        if use_cache and cache.get(name) == hashes[name] and os.path.exists(path):
+            outcomes[name] = RenderOutcome(path, 'unchanged')
+        else:
+            pending.append((name, dot, path))
+
+    outcomes.update(_run_jobs(pending, format, prog, workers or os.cpu_count() or 1, timeout))
+
+    for name, outcome in outcomes.items():
+        if outcome.status == 'rendered':
+            cache[name] = hashes[name]
+        elif outcome.status != 'unchanged':
+            cache.pop(name, None)
+    if use_cache:
+        with open(cache_path, 'w') as f:
+            json.dump(cache, f, indent=1, sort_keys=True)
+
+    return outcomes
+
+
+def render_dot(dot: str, format='png', prog='dot', timeout: float = None) -> Optional[bytes]:
+    """
+    Renders single DOT source in a separate process, which is killed after `timeout` seconds
+
+    :return: rendered image or None on timeout
+    """
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, f'graph.{format}')
+        outcome = _run_jobs([('graph', dot, path)], format, prog, 1, timeout)['graph']
+        if outcome.status == 'timeout':
+            return None
+        if outcome.status == 'failed':
+            raise RuntimeError(f'Rendering failed: {outcome.error}')
+        with open(path, 'rb') as f:
+            return f.read()
+
+
+def _run_jobs(pending, format, prog, workers, timeout) -> Dict[str, RenderOutcome]:
+    outcomes = dict()
+    results = multiprocessing.Queue()
+    running = dict()  # name -> (process, path, start time)
+    pending = list(reversed(pending))
+
+    while pending or running:
+        while pending and len(running) < workers:
+            name, dot, path = pending.pop()
+            process = multiprocessing.Process(target=_render_job, args=(name, dot, path, format, prog, results),
+                                              daemon=True)
+            process.start()
+            running[name] = (process, path, time.perf_counter())
+
+        try:
+            name, error, seconds = results.get(timeout=0.05)
+            # job could have reported just after it was killed for timeout, its outcome is already set
+            job = running.pop(name, None)
+            if job is not None and name not in outcomes:
+                job[0].join()
+                outcomes[name] = RenderOutcome(job[1], 'failed' if error else 'rendered', error, seconds)
+        except queue.Empty:
+            pass
+
+        now = time.perf_counter()
+        for name, (process, path, started) in list(running.items()):
+            if timeout is not None and now - started > timeout:
+                process.kill()
+                process.join()
+                if os.path.exists(f'{path}.tmp'):
+                    os.remove(f'{path}.tmp')
+                del running[name]
+                outcomes[name] = RenderOutcome(path, 'timeout', f'exceeded {timeout}s', now - started)
+            elif not process.is_alive() and results.empty():
+                # died without reporting, e.g. crash inside Graphviz
+                process.join()
+                del running[name]
+                outcomes[name] = RenderOutcome(path, 'failed', f'exit code {process.exitcode}', now - started)
+
+    return outcomes
+
+
+def _render_job(name, dot, path, format, prog, results):
+    import pygraphviz as pgv
+
+    start = time.perf_counter()
+    try:
+        # write to temporary file first, so killed jobs don't leave broken output
+        tmp_path = f'{path}.tmp'
+        pgv.AGraph(string=dot).draw(tmp_path, format=format, prog=prog)
+        os.replace(tmp_path, path)
+        results.put((name, None, time.perf_counter() - start))
+    except Exception as e:
+        results.put((name, repr(e), time.perf_counter() - start))
+
+
+def _load_cache(path: str) -> Dict[str, str]:
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
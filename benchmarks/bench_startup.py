@@ -0,0 +1,93 @@
+"""
+Startup time of the main entry points, measured by `python -X importtime`.
+
+Every entry point is imported in a fresh interpreter a few times, the fastest run is kept.
+Results are appended to a history file, so a regression (e.g. a heavy dependency imported
+at module level again) shows up as a jump against the previous runs.
+
+Usage (from the repository root):
+    python benchmarks/bench_startup.py [--repeat 5] [--history benchmarks/history/startup.jsonl]
+"""
+import argparse
+import os
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+import history
+from history import ROOT
+
+ENTRY_POINTS = ['main', 'cli', 'examples', 'miner', 'import_handler', 'drawing']
+
+# should be loaded only by code paths which really need them
+HEAVY_MODULES = ['pandas', 'matplotlib', 'pygraphviz', 'opyenxes']
+
+
+def measure(module: str) -> Tuple[float, List[str]]:
+    """
+    Imports `module` in a fresh interpreter
+
+    :return: cumulative import time in ms and heavy modules imported on the way
+    """
+    process = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                             cwd=ROOT, capture_output=True, text=True, check=True)
+
+    total_us = 0
+    heavy = []
+    for line in process.stderr.splitlines():
+        if not line.startswith('import time:') or '|' not in line:
+            continue
+        _, cumulative, name = line.split('|')
+        if not cumulative.strip().isdigit():
+            continue  # header
+        # top level imports are not indented
+        if not name.startswith('  '):
+            total_us += int(cumulative)
+        if name.strip() in HEAVY_MODULES:
+            heavy.append(name.strip())
+    return total_us / 1000, heavy
+
+
+def run(repeat: int) -> Tuple[Dict[str, float], Dict[str, List[str]]]:
+    """
+    :return: import time in ms and heavy modules loaded, for every entry point
+    """
+    times = dict()
+    heavy = dict()
+    for module in ENTRY_POINTS:
+        runs = [measure(module) for _ in range(repeat)]
+        times[module] = min(ms for ms, _ in runs)
+        heavy[module] = runs[0][1]
+    return times, heavy
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--history', default=os.path.join(history.HISTORY_DIR, 'startup.jsonl'))
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='relative slowdown against previous runs reported as regression')
+    args = parser.parse_args(argv)
+
+    times, heavy = run(args.repeat)
+    base = history.baseline(history.load(args.history))
+
+    for module, ms in times.items():
+        line = f'{module:16} {ms:8.1f} ms'
+        if module in base:
+            line += f'  ({ms / base[module] - 1:+.0%})'
+        if heavy[module]:
+            line += f'  loads: {", ".join(heavy[module])}'
+        print(line)
+
+    history.append(args.history, times, heavy=heavy)
+
+    slower = history.regressions(times, base, args.tolerance)
+    if slower:
+        print(f'Startup regression in: {", ".join(slower)}')
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
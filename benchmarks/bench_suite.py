@@ -0,0 +1,145 @@
+"""
+Performance benchmarks of the whole pipeline on synthetic logs.
+
+For every log size a log is generated by `generate_log` (and cached in `--cache-dir`),
+then each stage is timed separately:
+
+    import       import_handler.import_handler
+    dependency   filtering - dependency and 2-loop matrices, filter_network_by_matrices
+    network      network_factory.from_importer
+    filters      filters.filter_edges + filter_events
+    filter_view  filters.FilterView with the same thresholds, materialized
+    alpha        miner.alpha_miner
+    render       drawing.render_with_budget (SVG)
+
+Every stage is run `--repeat` times and the fastest run is kept. Results are appended to a history
+file and compared to the median of previous runs; exit code is 1 if any stage got slower than `--tolerance`.
+
+Usage (from the repository root):
+    python benchmarks/bench_suite.py --sizes 1000 10000 100000 --alphabet 30 --noise 0.01
+"""
+import argparse
+import os
+import sys
+import time
+from typing import Callable, Dict
+
+import history
+from generate_log import GeneratorParams, write_csv
+from history import ROOT
+
+sys.path.insert(0, ROOT)
+
+
+def _timed(func: Callable, repeat: int):
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def cached_log(params: GeneratorParams, cache_dir: str) -> str:
+    """
+    :return: path of generated log, generated only if it doesn't exist yet
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    name = '_'.join(f'{field}{value}' for field, value in zip(params._fields, params))
+    path = os.path.join(cache_dir, f'{name}.csv')
+    if not os.path.exists(path):
+        write_csv(f'{path}.tmp', params)
+        os.replace(f'{path}.tmp', path)
+    return path
+
+
+def run_size(params: GeneratorParams, repeat: int, cache_dir: str, render=True) -> Dict[str, float]:
+    """
+    :return: dict stage -> best time in seconds
+    """
+    import filtering
+    import network_factory
+    from drawing import render_with_budget
+    from filters import filter_edges, filter_events, FilterView
+    from import_handler import import_handler
+    from miner import alpha_miner
+    # modules imported lazily by the pipeline, so their import isn't timed as the first stage
+    import pandas, pygraphviz  # noqa: F401
+
+    path = cached_log(params, cache_dir)
+    times = dict()
+
+    times['import'], log = _timed(lambda: import_handler(path), repeat)
+
+    def dependency():
+        matrix = filtering.calculate_significance_dependency_matrix(log)
+        two_loop = filtering.calculate_2loop_matrix(log)
+        return filtering.filter_network_by_matrices(matrix, two_loop, 0.5)
+    times['dependency'], _ = _timed(dependency, repeat)
+
+    times['network'], network = _timed(lambda: network_factory.from_importer(log, import_start_end_events=True),
+                                       repeat)
+
+    # keep edges and events making up 99% of behaviour, roughly
+    edge_threshold = max(edge.cnt for edge in network.get_edge_list()) * 0.01
+    event_threshold = max(node.cnt for node in network.nodes.values()) * 0.01
+
+    def filter_copies():
+        filtered = filter_events(filter_edges(network, edge_threshold), event_threshold)
+        filtered.delete_filtered_out_items()
+        return filtered
+    times['filters'], filtered = _timed(filter_copies, repeat)
+    times['filter_view'], _ = _timed(
+        lambda: FilterView(network).edges_below(edge_threshold).events_below(event_threshold).materialize(), repeat)
+
+    times['alpha'], mined = _timed(lambda: alpha_miner(filtered), repeat)
+
+    if render:
+        times['render'], _ = _timed(lambda: render_with_budget(mined, format='svg'), repeat)
+
+    return times
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=float, nargs='+', default=[1e3, 1e4, 1e5],
+                        help='numbers of events in generated logs')
+    defaults = GeneratorParams()
+    for field in ('alphabet', 'concurrency', 'loops', 'noise', 'seed'):
+        parser.add_argument(f'--{field}', type=type(getattr(defaults, field)), default=getattr(defaults, field))
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--no-render', dest='render', action='store_false')
+    parser.add_argument('--cache-dir', default=os.path.join(ROOT, 'benchmarks', 'logs'))
+    parser.add_argument('--history', default=os.path.join(history.HISTORY_DIR, 'suite.jsonl'))
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='relative slowdown against previous runs reported as regression')
+    args = parser.parse_args(argv)
+
+    results = dict()
+    for size in args.sizes:
+        params = GeneratorParams(events=int(size), alphabet=args.alphabet, concurrency=args.concurrency,
+                                 loops=args.loops, noise=args.noise, seed=args.seed)
+        for stage, seconds in run_size(params, args.repeat, args.cache_dir, args.render).items():
+            # results of different generator settings are tracked separately
+            results[f'{stage}/{params.events}/a{params.alphabet}c{params.concurrency}'
+                    f'l{params.loops}n{params.noise}s{params.seed}'] = seconds
+
+    base = history.baseline(history.load(args.history))
+    slower = history.regressions(results, base, args.tolerance)
+    for name, seconds in results.items():
+        line = f'{name:48} {seconds * 1000:10.1f} ms'
+        if name in base:
+            line += f'  ({seconds / base[name] - 1:+.0%})'
+        if name in slower:
+            line += '  REGRESSION'
+        print(line)
+
+    history.append(args.history, results, repeat=args.repeat)
+
+    return 1 if slower else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,154 @@
+"""
+Seeded synthetic event log generator.
+
+A random process model is built from the alphabet first: a sequence of blocks, where every block
+is a single activity, a parallel block (branches interleaved randomly in every trace) or a loop
+(body repeated with given probability). Cases are then simulated from the model and written
+as CSV in the format read by `import_handler.from_csv`:
+
+    Case ID,Activity,Start Timestamp,Complete Timestamp
+
+Rows are streamed to the file, so logs of 10^8 events need only constant memory.
+The same parameters and seed always produce the same log.
+
+Usage:
+    python benchmarks/generate_log.py out.csv --events 1000000 --alphabet 50 --concurrency 0.3 --loops 0.1 --noise 0.01
+"""
+import argparse
+import csv
+import random
+from datetime import datetime, timedelta
+from typing import Iterator, List, NamedTuple, Union
+
+
+class GeneratorParams(NamedTuple):
+    events: int = 10 ** 4  # total number of events, the last case is not cut
+    alphabet: int = 20  # number of distinct activities
+    concurrency: float = 0.2  # probability that a block is parallel
+    loops: float = 0.1  # probability that a block is a loop
+    noise: float = 0.0  # probability that an event is swapped with the next one, dropped or replaced
+    seed: int = 0
+
+
+# block = activity name | ('and', [branches]) | ('loop', [body], repeat probability)
+Block = Union[str, tuple]
+
+
+def build_model(params: GeneratorParams, rnd: random.Random) -> List[Block]:
+    """
+    :return: random block structured model using every activity of the alphabet exactly once
+    """
+    activities = [f'a{i}' for i in range(params.alphabet)]
+    model = []
+    i = 0
+    while i < len(activities):
+        kind = rnd.random()
+        remaining = len(activities) - i
+        if kind < params.concurrency and remaining >= 2:
+            size = rnd.randint(2, min(remaining, 6))
+            branches = [[] for _ in range(rnd.randint(2, size))]
+            for j, activity in enumerate(activities[i:i + size]):
+                branches[j % len(branches)].append(activity)
+            model.append(('and', branches))
+            i += size
+        elif kind < params.concurrency + params.loops:
+            size = rnd.randint(1, min(remaining, 3))
+            model.append(('loop', activities[i:i + size], rnd.uniform(0.2, 0.6)))
+            i += size
+        else:
+            model.append(activities[i])
+            i += 1
+    return model
+
+
+def _simulate(model: List[Block], rnd: random.Random) -> List[str]:
+    trace = []
+    for block in model:
+        if isinstance(block, str):
+            trace.append(block)
+        elif block[0] == 'and':
+            # random interleaving, which keeps order inside branches
+            branches = [list(reversed(branch)) for branch in block[1]]
+            while branches:
+                branch = rnd.choice(branches)
+                trace.append(branch.pop())
+                if not branch:
+                    branches.remove(branch)
+        else:
+            _, body, probability = block
+            trace.extend(body)
+            while rnd.random() < probability:
+                trace.extend(body)
+    return trace
+
+
+def _add_noise(trace: List[str], noise: float, alphabet: int, rnd: random.Random) -> List[str]:
+    noisy = list(trace)
+    i = 0
+    while i < len(noisy):
+        if rnd.random() < noise:
+            action = rnd.randrange(3)
+            if action == 0 and i + 1 < len(noisy):
+                noisy[i], noisy[i + 1] = noisy[i + 1], noisy[i]
+            elif action == 1 and len(noisy) > 1:
+                del noisy[i]
+                continue
+            else:
+                noisy[i] = f'a{rnd.randrange(alphabet)}'
+        i += 1
+    return noisy
+
+
+def generate_traces(params: GeneratorParams) -> Iterator[List[str]]:
+    """
+    Yields traces until `params.events` events are generated
+    """
+    rnd = random.Random(params.seed)
+    model = build_model(params, rnd)
+    generated = 0
+    while generated < params.events:
+        trace = _simulate(model, rnd)
+        if params.noise > 0:
+            trace = _add_noise(trace, params.noise, params.alphabet, rnd)
+        generated += len(trace)
+        yield trace
+
+
+def write_csv(path: str, params: GeneratorParams) -> int:
+    """
+    Streams generated log to CSV file
+
+    :return: number of written events
+    """
+    rnd = random.Random(params.seed + 1)
+    start = datetime(2021, 1, 1)
+    written = 0
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['Case ID', 'Activity', 'Start Timestamp', 'Complete Timestamp'])
+        for case, trace in enumerate(generate_traces(params)):
+            time = start + timedelta(minutes=case)
+            rows = []
+            for activity in trace:
+                duration = timedelta(seconds=rnd.randint(1, 600))
+                rows.append((case, activity, time.isoformat(sep=' '), (time + duration).isoformat(sep=' ')))
+                time += duration + timedelta(seconds=rnd.randint(0, 300))
+            writer.writerows(rows)
+            written += len(rows)
+    return written
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('output')
+    defaults = GeneratorParams()
+    for field, default in zip(GeneratorParams._fields, defaults):
+        parser.add_argument(f'--{field}', type=type(default), default=default)
+    args = parser.parse_args(argv)
+
+    params = GeneratorParams(**{field: getattr(args, field) for field in GeneratorParams._fields})
+    print(f'{write_csv(args.output, params)} events written to {args.output}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+"""
+Benchmark history - results of every run appended as one JSON line,
+and comparison of new results against previous runs.
+"""
+import json
+import os
+import statistics
+import subprocess
+import time
+from typing import Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HISTORY_DIR = os.path.join(ROOT, 'benchmarks', 'history')
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ''
+
+
+def load(path: str) -> List[Dict]:
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def append(path: str, results: Dict[str, float], **info):
+    """
+    :param results: dict benchmark name -> seconds (or any other 'lower is better' value)
+    :param info: additional fields stored with the run
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'a') as f:
+        f.write(json.dumps({'time': time.time(), 'revision': git_revision(), 'results': results, **info}) + '\n')
+
+
+def baseline(history: List[Dict], window=5) -> Dict[str, float]:
+    """
+    :return: median of last `window` runs for every benchmark, less noisy than the last run alone
+    """
+    values = dict()
+    for run in history[-window:]:
+        for name, value in run['results'].items():
+            values.setdefault(name, []).append(value)
+    return {name: statistics.median(v) for name, v in values.items()}
+
+
+def regressions(results: Dict[str, float], base: Dict[str, float], tolerance: float) -> Dict[str, float]:
+    """
+    :return: dict benchmark name -> relative slowdown, for benchmarks slower than `tolerance` (0.1 = 10%)
+    """
+    slower = dict()
+    for name, value in results.items():
+        if base.get(name, 0) > 0:
+            change = value / base[name] - 1
+            if change > tolerance:
+                slower[name] = change
+    return slower
@@ -3,7 +3,7 @@ from copy import deepcopy
 from enum import Enum
 from math import inf
 from pprint import pprint
-from typing import Set, Dict, Union
+from typing import Set, Dict, Union, List, Tuple, Optional, FrozenSet
 
 from more_itertools import pairwise
 
@@ -23,6 +23,12 @@ class NodeFunction(Enum):
     LOOP_GATE = 3
 
 
+class LoopType(Enum):
+    SELF = 0
+    SHORT = 1
+    TWO = 2
+
+
 class UtilityNode(Node):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -54,6 +60,17 @@ def _get_merge_gate_name(sources: Set[Node], target: Node, kind: NodeKind):
 class BPMNNetwork(Network):
     def __init__(self):
         super().__init__()
+        self._relation_cache = {}
+        self._relation_cache_version = -1
+
+    def _get_relation_cache(self) -> dict:
+        """
+        Cache of relation queries, valid as long as network `version` doesn't change
+        """
+        if self._relation_cache_version != self.version:
+            self._relation_cache = {}
+            self._relation_cache_version = self.version
+        return self._relation_cache
 
     def insert_split_node_between(self, source: Node, targets: Set[Node], kind: NodeKind):
         # TODO: add assertions
@@ -161,15 +178,18 @@ class BPMNNetwork(Network):
         results = list(map(lambda pair: self.are_nodes_parallel(pair[0], pair[1]), pairs))
         return all(results)
 
-    def causalities_for_node(self, node: Union[Node, str]) -> Set[Node]:
+    def causalities_for_node(self, node: Union[Node, str]) -> FrozenSet[Node]:
         if isinstance(node, str):
             node = self.nodes[node]
 
-        causalities = set(n for n in node.successors if n not in node.predecessors)
+        cache = self._get_relation_cache()
+        key = ('causality', node)
+        if key not in cache:
+            cache[key] = frozenset(n for n in node.successors if n not in node.predecessors)
 
-        return causalities
+        return cache[key]
 
-    def parallel_events_for_node(self, node: Union[Node, str]) -> Set[Node]:
+    def parallel_events_for_node(self, node: Union[Node, str]) -> FrozenSet[Node]:
         """
         Finds nodes parallel to provided node
 
@@ -179,20 +199,30 @@ class BPMNNetwork(Network):
         if isinstance(node, str):
             node = self.nodes[node]
 
-        return set(n for n in node.successors if n in node.predecessors)
+        cache = self._get_relation_cache()
+        key = ('parallel', node)
+        if key not in cache:
+            cache[key] = frozenset(n for n in node.successors if n in node.predecessors)
+
+        return cache[key]
 
-    def get_causality(self) -> Dict[Node, Set[Node]]:
+    def get_causality(self) -> Dict[Node, FrozenSet[Node]]:
         """
         Returns causality almost the same way as during lab
         Each dict key is a node, and elements are set of directly succeeding nodes
 
+        Result is cached until the network changes, so it must not be modified
+
         :return: dict Node -> set of succeeding nodes
         """
-        result = {}
-        for node in self.nodes.values():
-            if node.type == NodeType.EVENT:
-                result[node] = self.causalities_for_node(node)
-        return result
+        cache = self._get_relation_cache()
+        if 'causality' not in cache:
+            result = {}
+            for node in self.nodes.values():
+                if node.type == NodeType.EVENT:
+                    result[node] = self.causalities_for_node(node)
+            cache['causality'] = result
+        return cache['causality']
 
     def autodetect_start_nodes(self, update_nodes=True) -> Set[Node]:
         """
@@ -262,7 +292,7 @@ class BPMNNetwork(Network):
             s.predecessors.remove(node)
             s.predecessors.add(gate)
 
-    def build_short_loop(self, node: Node):
+    def build_short_loop(self, node: Node, validate=True):
         assert node.is_short_loop(), f'Node {node} is not short loop!'
 
         # remove self-succession and make life easier
@@ -317,9 +347,10 @@ class BPMNNetwork(Network):
             post_gate.name: Edge(self, pre_gate, post_gate, over_cnt),
         }
 
-        self._validate_structure()
+        if validate:
+            self._validate_structure()
 
-    def build_two_loop(self, node: Node):
+    def build_two_loop(self, node: Node, validate=True):
         assert node.is_two_loop(), f'Node {node} is not short loop!'
 
         # remove self-succession and make life easier
@@ -388,14 +419,94 @@ class BPMNNetwork(Network):
         for s in succs:
             self.edges[post_gate.name][s.name] = Edge(self, post_gate, s, cnt=cnts[two][s])
 
-        self._validate_structure()
+        if validate:
+            self._validate_structure()
+
+    def classify_loops(self) -> Tuple[List[Tuple[Node, LoopType]], List[Tuple[Node, LoopType]]]:
+        """
+        Finds all loop patterns in a single sweep over nodes (in name order, so result
+        doesn't depend on set iteration order). Every node gets at most one pattern,
+        with the same priority as before: two loop, short loop, self loop.
+
+        Conflicts are resolved up front: each pattern reads and rewrites some neighbour sets.
+        A pattern goes to the batch only if it doesn't read anything an already accepted
+        pattern rewrites and doesn't rewrite anything it reads, so the whole batch can be
+        built one by one without re-checking. Other patterns are deferred.
+
+        :return: tuple (batch, deferred), both are lists of (node, loop type)
+        """
+        batch, deferred = [], []
+        accepted_reads, accepted_writes = set(), set()
+        for node in sorted(self.nodes.values(), key=lambda n: n.name):
+            loop_type = _get_loop_type(node)
+            if loop_type is None:
+                continue
+
+            reads, writes = _get_loop_footprint(node, loop_type)
+            if reads.isdisjoint(accepted_writes) and writes.isdisjoint(accepted_reads):
+                batch.append((node, loop_type))
+                accepted_reads |= reads
+                accepted_writes |= writes
+            else:
+                deferred.append((node, loop_type))
+
+        return batch, deferred
+
+    def build_loop(self, node: Node, loop_type: LoopType, validate=True):
+        if loop_type == LoopType.TWO:
+            self.build_two_loop(node, validate=validate)
+        elif loop_type == LoopType.SHORT:
+            self.build_short_loop(node, validate=validate)
+        elif loop_type == LoopType.SELF:
+            self.build_self_loop(node)
 
     def process_short_loops(self):
-        nodes = set(self.nodes.values())    # copy to avoid weird errors
-        for node in nodes:
-            if node.is_two_loop():
-                self.build_two_loop(node)
-            elif node.is_short_loop():
-                self.build_short_loop(node)
-            elif node.is_self_loop():
-                self.build_self_loop(node)
+        batch, deferred = self.classify_loops()
+        for node, loop_type in batch:
+            self.build_loop(node, loop_type, validate=False)
+
+        # these overlapped with the batch, their neighbourhood might be already rewritten
+        for node, _ in deferred:
+            loop_type = _get_loop_type(node)
+            if loop_type is not None:
+                self.build_loop(node, loop_type, validate=False)
+
+        self._validate_structure()
+
+
+def _get_loop_type(node: Node) -> Optional[LoopType]:
+    if node.is_two_loop():
+        return LoopType.TWO
+    elif node.is_short_loop():
+        return LoopType.SHORT
+    elif node.is_self_loop():
+        return LoopType.SELF
+    return None
+
+
+def _get_loop_footprint(node: Node, loop_type: LoopType) -> Tuple[Set[Tuple[Node, str]], Set[Tuple[Node, str]]]:
+    """
+    Neighbour sets that building given loop reads and rewrites,
+    as (node, 'succ' | 'pred') pairs
+
+    :return: tuple (reads, writes)
+    """
+    both = lambda n: {(n, 'succ'), (n, 'pred')}
+    others = lambda nodes: (n for n in nodes if n is not node)
+
+    if loop_type == LoopType.SELF:
+        reads = {(node, 'succ')}
+        writes = both(node) | {(s, 'pred') for s in others(node.successors)}
+    elif loop_type == LoopType.SHORT:
+        pred = next(others(node.predecessors))
+        succ = next(others(node.successors))
+        reads = both(node) | {(pred, 'succ')}
+        writes = both(node) | {(pred, 'succ'), (succ, 'pred')}
+    else:
+        two = next(others(node.successors))
+        reads = both(node) | both(two)
+        writes = both(node) | both(two) \
+            | {(p, 'succ') for p in two.predecessors if p is not node} \
+            | {(s, 'pred') for s in two.successors if s is not node}
+
+    return reads, writes
@@ -0,0 +1,253 @@
+"""
+BPMN 2.0 XML export and import of mined networks.
+
+Events are exported as tasks, `UtilityNode` gates as parallel (AND) or exclusive (XOR) gateways
+and edges as sequence flows. Start and end nodes are connected to a single start and end event.
+Counts and flags which BPMN has no place for (event / edge counts, gate function, loop flags...)
+are written as attributes in the `miner` namespace, so `import_bpmn` can restore the network
+without mining it again.
+
+Export is written element by element to a text stream, only the map of node ids is kept in memory.
+Diagram interchange (positions of shapes and edges) is optional and needs Graphviz layout.
+"""
+from __future__ import annotations
+
+import json
+from math import inf
+from typing import Dict, Iterator, Optional, TextIO, Tuple, Union
+from xml.etree.ElementTree import iterparse
+from xml.sax.saxutils import quoteattr
+
+from bpmn_network import BPMNNetwork, UtilityNode, NodeKind, NodeFunction
+from instrumentation import instrumented, network_counts
+from network import Network, NodeType
+
+BPMN_NS = 'http://www.omg.org/spec/BPMN/20100524/MODEL'
+BPMNDI_NS = 'http://www.omg.org/spec/BPMN/20100524/DI'
+DC_NS = 'http://www.omg.org/spec/DD/20100524/DC'
+DI_NS = 'http://www.omg.org/spec/DD/20100524/DI'
+MINER_NS = 'https://github.com/barthap/BPMN/miner'
+
+START_ID = 'start'
+END_ID = 'end'
+
+GATEWAY_TAGS = {NodeKind.AND: 'parallelGateway', NodeKind.XOR: 'exclusiveGateway', NodeKind.UNKNOWN: 'exclusiveGateway'}
+GATEWAY_DIRECTIONS = {NodeFunction.SPLIT: 'Diverging', NodeFunction.MERGE: 'Converging',
+                      NodeFunction.LOOP_GATE: 'Mixed', NodeFunction.ANY: 'Unspecified'}
+
+
+def _attrs(**attrs) -> str:
+    return ''.join(f' {name.replace("__", ":")}={quoteattr(str(value))}' for name, value in attrs.items()
+                   if value is not None)
+
+
+def _count_attr(cnt) -> Optional[str]:
+    return None if cnt == inf else repr(cnt if isinstance(cnt, float) else int(cnt))
+
+
+def _node_attrs(node) -> Dict[str, Optional[str]]:
+    attrs = {'miner__count': _count_attr(node.cnt)}
+    if node.is_filtered_out:
+        attrs['miner__filteredOut'] = 'true'
+    if node.is_self_looped:
+        attrs['miner__selfLooped'] = 'true'
+    if node.is_in_two_loop_main:
+        attrs['miner__inTwoLoopMain'] = 'true'
+    if node.and_paralleled_with is not None:
+        attrs['miner__andParalleledWith'] = json.dumps(sorted(node.and_paralleled_with))
+    if node.in_two_loop_feedback_with is not None:
+        attrs['miner__inTwoLoopFeedbackWith'] = json.dumps(sorted(node.in_two_loop_feedback_with))
+    return attrs
+
+
+def _flows(network: Network, ids: Dict[str, str]) -> Iterator[Tuple[str, str, Optional[str], bool]]:
+    """
+    Yields (source id, target id, count, is filtered out) of all sequence flows, including start and end flows
+    """
+    for node in network.nodes.values():
+        if node.is_start_node:
+            yield START_ID, ids[node.name], None, False
+    for edge in network.get_edge_list():
+        yield ids[edge.src.name], ids[edge.target.name], _count_attr(edge.cnt), edge.is_filtered_out
+    for node in network.nodes.values():
+        if node.is_end_node:
+            yield ids[node.name], END_ID, None, False
+
+
+@instrumented(counts=lambda result, network, *args, **kwargs: network_counts(network))
+def export_bpmn(network: Network, stream: TextIO, process_id='process', with_layout=False, prog='dot'):
+    """
+    Writes network as BPMN 2.0 XML. Nodes get ids `n{i}`, flows `f{i}`, in network order.
+
+    :param network: network to export
+    :param stream: text stream to write to
+    :param process_id: id of the BPMN process
+    :param with_layout: add diagram interchange (BPMNDiagram) with positions from Graphviz layout
+    :param prog: Graphviz layout engine, for `with_layout`
+    """
+    write = stream.write
+    write('<?xml version="1.0" encoding="UTF-8"?>\n')
+    write(f'<definitions xmlns="{BPMN_NS}" xmlns:bpmndi="{BPMNDI_NS}" xmlns:dc="{DC_NS}" xmlns:di="{DI_NS}" '
+          f'xmlns:miner="{MINER_NS}" id="definitions" targetNamespace="{MINER_NS}">\n')
+    write(f'  <process{_attrs(id=process_id, isExecutable="false")}>\n')
+
+    ids = dict()
+    write(f'    <startEvent{_attrs(id=START_ID)}/>\n')
+    for i, node in enumerate(network.nodes.values()):
+        node_id = ids[node.name] = f'n{i}'
+        attrs = _node_attrs(node)
+        if node.type == NodeType.UTILITY and isinstance(node, UtilityNode):
+            write(f'    <{GATEWAY_TAGS[node.kind]}'
+                  f'{_attrs(id=node_id, name=node.name, gatewayDirection=GATEWAY_DIRECTIONS[node.function])}'
+                  f'{_attrs(miner__kind=node.kind.name, miner__function=node.function.name, **attrs)}/>\n')
+        else:
+            if node.type != NodeType.EVENT:
+                attrs['miner__type'] = node.type.name
+            write(f'    <task{_attrs(id=node_id, name=node.name, **attrs)}/>\n')
+    write(f'    <endEvent{_attrs(id=END_ID)}/>\n')
+
+    for i, (source, target, cnt, filtered_out) in enumerate(_flows(network, ids)):
+        write(f'    <sequenceFlow{_attrs(id=f"f{i}", sourceRef=source, targetRef=target)}'
+              f'{_attrs(miner__count=cnt, miner__filteredOut="true" if filtered_out else None)}/>\n')
+    write('  </process>\n')
+
+    if with_layout:
+        _write_diagram(network, ids, stream, process_id, prog)
+    write('</definitions>\n')
+
+
+def _write_diagram(network: Network, ids: Dict[str, str], stream: TextIO, process_id: str, prog: str):
+    from drawing import build_graph
+
+    G = build_graph(network, ortho=False, draw_filtered_out=True)
+    G.layout(prog=prog)
+    height = float(G.graph_attr['bb'].split(',')[3])
+
+    # Graphviz y axis goes up, BPMN down
+    centers = dict()
+    graph_ids = {'_start': START_ID, '_end': END_ID, **ids}
+    write = stream.write
+    write(f'  <bpmndi:BPMNDiagram{_attrs(id="diagram")}>\n')
+    write(f'    <bpmndi:BPMNPlane{_attrs(id="plane", bpmnElement=process_id)}>\n')
+    for graph_node in G.nodes_iter():
+        element_id = graph_ids.get(graph_node.name)
+        if element_id is None:
+            continue
+        x, y = map(float, graph_node.attr['pos'].split(','))
+        width = float(graph_node.attr['width']) * 72
+        node_height = float(graph_node.attr['height']) * 72
+        centers[element_id] = (x, height - y)
+        write(f'      <bpmndi:BPMNShape{_attrs(id=f"{element_id}_di", bpmnElement=element_id)}>'
+              f'<dc:Bounds{_attrs(x=round(x - width / 2, 2), y=round(height - y - node_height / 2, 2), width=round(width, 2), height=round(node_height, 2))}/>'
+              f'</bpmndi:BPMNShape>\n')
+
+    for i, (source, target, _, _) in enumerate(_flows(network, ids)):
+        if source not in centers or target not in centers:
+            continue  # filtered out edge of a node which is not drawn
+        (x1, y1), (x2, y2) = centers[source], centers[target]
+        write(f'      <bpmndi:BPMNEdge{_attrs(id=f"f{i}_di", bpmnElement=f"f{i}")}>'
+              f'<di:waypoint{_attrs(x=round(x1, 2), y=round(y1, 2))}/><di:waypoint{_attrs(x=round(x2, 2), y=round(y2, 2))}/>'
+              f'</bpmndi:BPMNEdge>\n')
+    write('    </bpmndi:BPMNPlane>\n')
+    write('  </bpmndi:BPMNDiagram>\n')
+
+
+def save_bpmn(network: Network, path: str, **options):
+    """
+    Exports network to BPMN file, see `export_bpmn` for options
+    """
+    with open(path, 'w', encoding='utf-8') as f:
+        export_bpmn(network, f, **options)
+
+
+def _parse_count(value: Optional[str], default=0):
+    if value is None:
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        return float(value)
+
+
+@instrumented(counts=network_counts)
+def import_bpmn(source: Union[str, TextIO]) -> BPMNNetwork:
+    """
+    Reads BPMN 2.0 XML (a path or a stream) into a network. Elements are parsed one by one
+    and released right away. Tasks and all other activities become events, parallel gateways AND gates,
+    other gateways XOR gates, sequence flows from start / to end events mark start / end nodes.
+    Attributes of `export_bpmn` in the `miner` namespace are restored, if present.
+    """
+    network = BPMNNetwork()
+    names = dict()  # element id -> node name
+    start_events = set()
+    end_events = set()
+    flows = []
+
+    def miner(element, name):
+        return element.get(f'{{{MINER_NS}}}{name}')
+
+    def add_flags(node, element):
+        node.is_filtered_out = miner(element, 'filteredOut') == 'true'
+        node.is_self_looped = miner(element, 'selfLooped') == 'true'
+        node.is_in_two_loop_main = miner(element, 'inTwoLoopMain') == 'true'
+        for attr, xml_name in (('and_paralleled_with', 'andParalleledWith'),
+                               ('in_two_loop_feedback_with', 'inTwoLoopFeedbackWith')):
+            value = miner(element, xml_name)
+            if value is not None:
+                setattr(node, attr, set(json.loads(value)))
+
+    process_depth = 0
+    for event, element in iterparse(source, events=('start', 'end')):
+        if not element.tag.startswith(f'{{{BPMN_NS}}}'):
+            if event == 'end' and process_depth == 0:
+                element.clear()
+            continue
+        tag = element.tag[len(BPMN_NS) + 2:]
+        if tag == 'process':
+            process_depth += 1 if event == 'start' else -1
+            continue
+        if event != 'end' or process_depth == 0:
+            continue
+
+        element_id = element.get('id')
+        if tag == 'startEvent':
+            start_events.add(element_id)
+        elif tag == 'endEvent':
+            end_events.add(element_id)
+        elif tag == 'sequenceFlow':
+            flows.append((element.get('sourceRef'), element.get('targetRef'),
+                          _parse_count(miner(element, 'count')), miner(element, 'filteredOut') == 'true'))
+        elif tag.endswith('Gateway'):
+            name = element.get('name') or element_id
+            gate = UtilityNode(network, name=name)
+            kind = miner(element, 'kind')
+            function = miner(element, 'function')
+            gate.kind = NodeKind[kind] if kind else (NodeKind.AND if tag == 'parallelGateway' else NodeKind.XOR)
+            gate.function = NodeFunction[function] if function else \
+                {'Diverging': NodeFunction.SPLIT, 'Converging': NodeFunction.MERGE}.get(
+                    element.get('gatewayDirection'), NodeFunction.ANY)
+            gate.cnt = _parse_count(miner(element, 'count'), inf)
+            add_flags(gate, element)
+            network.nodes[name] = gate
+            names[element_id] = name
+        elif tag.endswith('Task') or tag in ('task', 'subProcess', 'callActivity'):
+            name = element.get('name') or element_id
+            node = network.add_node(name, cnt=_parse_count(miner(element, 'count')))
+            node_type = miner(element, 'type')
+            if node_type is not None:
+                node.type = NodeType[node_type]
+            add_flags(node, element)
+            names[element_id] = name
+        element.clear()
+
+    # flows may come before nodes they connect in files from other tools
+    for source, target, cnt, filtered_out in flows:
+        if source in start_events and target in names:
+            network.nodes[names[target]].is_start_node = True
+        elif target in end_events and source in names:
+            network.nodes[names[source]].is_end_node = True
+        elif source in names and target in names:
+            network.add_edge(names[source], names[target], cnt)
+            network.edges[names[source]][names[target]].is_filtered_out = filtered_out
+
+    return network
@@ -0,0 +1,229 @@
+"""
+Command line runner - mines many logs at once and renders their diagrams.
+
+    python cli.py data/B*.csv --pipeline filtered --dependency-threshold 0.9 --workers 4
+    python cli.py data/A*.csv --sep ';' --pipeline alpha --format svg --headless
+
+Pipelines:
+    dfg       - directly-follows graph, filtered by edge and event thresholds
+    alpha     - dfg mined by alpha miner
+    filtered  - dependency (heuristic) filtering of direct succession, then alpha miner
+
+Diagrams are written to `{output-dir}/{log name}.{format}`, together with a JSON summary
+containing per-stage timings of every log. With `--trace`, spans of all instrumented functions
+are written too (see `instrumentation`). With `--memory`, the summary contains peak and retained
+memory of every stage. With `--conformance`, token-based fitness of every network
+(see `conformance`) is added. With `--bpmn`, networks are also exported as BPMN 2.0 XML (see `bpmn_xml`).
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List
+
+import instrumentation
+
+PIPELINES = ['dfg', 'alpha', 'filtered']
+
+
+def _expand_inputs(patterns: List[str]) -> List[str]:
+    paths = []
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern)) if glob.has_magic(pattern) else [pattern]
+        for path in matches:
+            if path not in paths:
+                paths.append(path)
+    return paths
+
+
+def run_log(path: str, options: Dict) -> Dict:
+    """
+    Runs selected pipeline on a single log and renders its diagram
+
+    :param path: CSV or XES log
+    :param options: dict of parsed command line options (`vars(args)`)
+    :return: summary of the run - output path, status, error and timings of stages in seconds
+    """
+    from pipeline import standard_pipeline
+
+    name = os.path.splitext(os.path.basename(path))[0]
+    output = os.path.join(options['output_dir'], f'{name}.{options["format"]}')
+    summary = {'input': path, 'output': output, 'status': 'ok', 'error': None, 'stages': dict()}
+
+    # spans are collected per log, so it works the same in worker processes
+    spans = None
+    if options.get('trace'):
+        spans = instrumentation.ListSink()
+        instrumentation.enable(spans)
+    if options.get('memory'):
+        instrumentation.enable_memory(types=options.get('memory_types', False))
+    profiler = None
+    if options.get('profile_stage'):
+        profiler = instrumentation.profile_stage(options['profile_stage'])
+
+    pipeline = standard_pipeline(options['pipeline'])
+    params = {param: options[param] for param in ('sep', 'edge_threshold', 'event_threshold', 'dependency_threshold',
+                                                  'format', 'prog', 'with_numbers', 'ortho')}
+    try:
+        result = pipeline.run(path=path, memory=options.get('memory', False), **params)
+
+        network = result.outputs.get('mine', result.outputs['filter'])
+        summary['nodes'] = len(network.nodes)
+        summary['edges'] = len(network.get_edge_list())
+        with open(output, 'wb') as f:
+            f.write(result['render'])
+        if options.get('conformance'):
+            from conformance import token_replay
+            replay = token_replay(network, result['import'])
+            summary['fitness'] = replay.fitness
+            summary['fitting_cases'] = replay.fitting_cases
+        if options.get('bpmn'):
+            from bpmn_xml import save_bpmn
+            summary['bpmn'] = os.path.join(options['output_dir'], f'{name}.bpmn')
+            save_bpmn(network, summary['bpmn'], with_layout=True, prog=options['prog'])
+    except Exception as e:
+        summary['status'] = 'failed'
+        summary['error'] = f'{type(e).__name__}: {e}'
+        summary['traceback'] = traceback.format_exc()
+        summary['output'] = None
+        result = None
+    finally:
+        if options.get('memory'):
+            instrumentation.disable_memory()
+        if spans is not None:
+            instrumentation.disable()
+            summary['spans'] = spans.spans
+        if profiler is not None:
+            instrumentation.stop_profiling()
+            summary['profile'] = os.path.join(options['output_dir'], f'{name}.{options["profile_stage"]}.prof')
+            profiler.dump_stats(summary['profile'])
+
+    if result is not None:
+        summary['stages'] = {stage: run.seconds for stage, run in result.stages.items()}
+        if options.get('memory'):
+            summary['memory'] = {stage: run.memory for stage, run in result.stages.items()}
+    summary['seconds'] = sum(summary['stages'].values())
+    return summary
+
+
+def _write_trace(path: str, summaries: List[Dict]):
+    """
+    Chrome trace format, or JSON lines if path ends with .jsonl
+    """
+    if path.endswith('.jsonl'):
+        with open(path, 'w') as f:
+            for summary in summaries:
+                for span in summary.get('spans', []):
+                    f.write(json.dumps(span) + '\n')
+    else:
+        sink = instrumentation.ChromeTraceSink(path)
+        for summary in summaries:
+            for span in summary.get('spans', []):
+                sink.add(span)
+        sink.close()
+
+
+def _show(summaries: List[Dict]):
+    import matplotlib.pyplot as plt
+
+    for summary in summaries:
+        if summary['status'] != 'ok' or not summary['output'].endswith('.png'):
+            continue
+        plt.figure()
+        plt.axis('off')
+        plt.imshow(plt.imread(summary['output']))
+        plt.title(os.path.basename(summary['input']))
+    plt.show()
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('inputs', nargs='+', help='log files (CSV or XES) or glob patterns')
+    parser.add_argument('--pipeline', choices=PIPELINES, default='alpha')
+    parser.add_argument('--sep', default=',', help='CSV separator')
+    parser.add_argument('--edge-threshold', type=float, default=0,
+                        help='edges with lower count are removed (dfg, alpha)')
+    parser.add_argument('--event-threshold', type=float, default=0,
+                        help='events with lower count are removed (dfg, alpha)')
+    parser.add_argument('--dependency-threshold', type=float, default=0,
+                        help='minimal significance of dependency (filtered)')
+    parser.add_argument('--format', default='png', help='any Graphviz output format')
+    parser.add_argument('--prog', default='dot', help='Graphviz layout engine')
+    parser.add_argument('--with-numbers', action='store_true', help='show counts on labels')
+    parser.add_argument('--no-ortho', dest='ortho', action='store_false', help='allow non-orthogonal edges')
+    parser.add_argument('--output-dir', default='results')
+    parser.add_argument('--conformance', action='store_true',
+                        help='replay the log on the network and add token-based fitness to the summary')
+    parser.add_argument('--bpmn', action='store_true',
+                        help='also export mined network as BPMN 2.0 XML to {output-dir}/{log name}.bpmn')
+    parser.add_argument('--summary', help='path of JSON summary, {output-dir}/summary.json by default')
+    parser.add_argument('--trace', help='write spans of instrumented stages to this file, '
+                                        'in Chrome trace format (open in Perfetto) or JSON lines if it ends with .jsonl')
+    parser.add_argument('--profile-stage', metavar='SPAN',
+                        help='run cProfile on one instrumented stage, e.g. miner.alpha_miner or pipeline.render. '
+                             'Stats are saved to {output-dir}/{log name}.{SPAN}.prof')
+    parser.add_argument('--memory', action='store_true',
+                        help='measure peak and retained memory of every stage (tracemalloc and RSS), it is slower')
+    parser.add_argument('--memory-types', action='store_true',
+                        help='with --memory, also count Node, Edge, DataFrame and Counter objects created by stages')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='number of logs processed at once, CPU count by default. 1 runs in this process')
+    display = parser.add_mutually_exclusive_group()
+    display.add_argument('--show', action='store_true', help='show rendered PNG diagrams when done')
+    display.add_argument('--headless', action='store_true', help='never open any window (for batch jobs)')
+    return parser
+
+
+def main(argv: List[str] = None) -> int:
+    """
+    :return: exit code - 0 if all logs were processed, 1 if any of them failed
+    """
+    args = build_parser().parse_args(argv)
+    if args.headless:
+        os.environ.setdefault('MPLBACKEND', 'Agg')
+
+    paths = _expand_inputs(args.inputs)
+    options = vars(args)
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    start = time.perf_counter()
+    workers = args.workers or os.cpu_count() or 1
+    if workers == 1 or len(paths) <= 1:
+        summaries = [run_log(path, options) for path in paths]
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(paths))) as executor:
+            summaries = list(executor.map(run_log, paths, [options] * len(paths)))
+
+    for summary in summaries:
+        if summary['status'] == 'ok':
+            peak = max((memory['peak'] for memory in summary.get('memory', {}).values()), default=None)
+            memory = f', peak {peak / 2 ** 20:.1f} MiB' if peak is not None else ''
+            print(f'{summary["input"]} -> {summary["output"]} ({summary["seconds"]:.2f}s{memory})')
+        else:
+            print(f'{summary["input"]} FAILED: {summary["error"]}', file=sys.stderr)
+
+    if args.trace:
+        _write_trace(args.trace, summaries)
+        for summary in summaries:
+            summary.pop('spans', None)
+
+    summary_path = args.summary or os.path.join(args.output_dir, 'summary.json')
+    with open(summary_path, 'w') as f:
+        json.dump({
+            'options': {key: value for key, value in options.items() if key != 'inputs'},
+            'seconds': time.perf_counter() - start,
+            'logs': summaries,
+        }, f, indent=2)
+
+    if args.show:
+        _show(summaries)
+
+    return 0 if all(summary['status'] == 'ok' for summary in summaries) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,366 @@
+"""
+Token-based replay of a log on a (mined) network.
+
+Network is read as a Petri net: every edge is a place, events are visible transitions and gates
+(and dummy nodes) are silent ones. Parallel (AND) gates consume a token from every incoming edge
+and produce one on every outgoing edge, all other nodes consume from any incoming edge and put
+their token on one outgoing edge. That edge is chosen lazily - a node with several outgoing edges
+puts its token into a choice place `(node, None)`, which any of its successors can consume.
+Virtual SOURCE and SINK nodes feed start nodes and take tokens from end nodes.
+
+When an event is not enabled, silent gates in front of it are fired if that enables it,
+otherwise a missing token is created. Fitness is
+
+    1/2 * (1 - missing / consumed) + 1/2 * (1 - remaining / produced)
+
+Unique variants are inserted into a trie and replayed once, the marking after a common prefix
+is shared by all variants starting with it, so replay scales with the number of distinct
+variants and prefixes, not with the number of cases.
+"""
+from __future__ import annotations
+
+from collections import Counter
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set, Tuple, Union
+
+from bpmn_network import UtilityNode, NodeKind
+from import_handler import Result
+from instrumentation import instrumented
+from network import Network, NodeType
+
+SOURCE = '<source>'
+SINK = '<sink>'
+
+# (source, target) of an edge, target is None for a choice place of source
+Place = Tuple[str, Optional[str]]
+Variant = Tuple[Tuple[str, ...], int]
+
+
+class Model:
+    """
+    Transitions of a network, indexed by node name. SOURCE and SINK are included.
+    Filtered out nodes and edges are skipped.
+    """
+    def __init__(self, network: Network):
+        self.predecessors: Dict[str, List[str]] = {SOURCE: [], SINK: []}
+        self.successors: Dict[str, List[str]] = {SOURCE: [], SINK: []}
+        self.is_and: Dict[str, bool] = {SOURCE: False, SINK: False}
+        self.is_silent: Dict[str, bool] = {SOURCE: True, SINK: True}
+
+        for node in network.nodes.values():
+            if node.is_filtered_out:
+                continue
+            self.predecessors[node.name] = []
+            self.successors[node.name] = []
+            self.is_and[node.name] = isinstance(node, UtilityNode) and node.kind == NodeKind.AND
+            self.is_silent[node.name] = node.type != NodeType.EVENT
+        for node in network.nodes.values():
+            if node.name not in self.successors:
+                continue
+            # sorted, so replay does not depend on order of sets
+            for successor in sorted(node.successors, key=lambda n: n.name):
+                edge = network.edges.get(node.name, {}).get(successor.name)
+                if successor.name in self.successors and not (edge is not None and edge.is_filtered_out):
+                    self._link(node.name, successor.name)
+            if node.is_start_node:
+                self._link(SOURCE, node.name)
+            if node.is_end_node:
+                self._link(node.name, SINK)
+
+        self.outputs: Dict[str, List[Place]] = {name: self._outputs(name) for name in self.successors}
+        self.inputs: Dict[str, List[Place]] = {name: [self.outputs_to(p, name) for p in predecessors]
+                                               for name, predecessors in self.predecessors.items()}
+
+    def _link(self, source: str, target: str):
+        self.successors[source].append(target)
+        self.predecessors[target].append(source)
+
+    def _outputs(self, name: str) -> List[Place]:
+        if self.is_and[name] or len(self.successors[name]) <= 1:
+            return [(name, successor) for successor in self.successors[name]]
+        return [(name, None)]
+
+    def outputs_to(self, source: str, target: str) -> Place:
+        """
+        :return: place in which `source` puts tokens for `target`
+        """
+        return (source, target) if self.is_and[source] or len(self.successors[source]) == 1 else (source, None)
+
+    def has_transition(self, name: str) -> bool:
+        return name in self.is_silent and not self.is_silent[name]
+
+
+class _State:
+    __slots__ = ('marking', 'missing', 'consumed', 'produced')
+
+    def __init__(self, marking: Counter, missing: Counter = None, consumed=0, produced=0):
+        self.marking = marking
+        self.missing = missing if missing is not None else Counter()
+        self.consumed = consumed
+        self.produced = produced
+
+    def copy(self) -> _State:
+        return _State(Counter(self.marking), Counter(self.missing), self.consumed, self.produced)
+
+
+class Replayer:
+    def __init__(self, model: Model):
+        self.model = model
+
+    def initial(self) -> _State:
+        state = _State(Counter())
+        self._produce(state, SOURCE)
+        return state
+
+    def fire(self, state: _State, name: str, unknown: Counter = None) -> _State:
+        """
+        Fires visible transition `name`, after enabling it by silent ones if needed.
+        Changes and returns `state`. Activities not in model count as one missing
+        and one remaining token, they are added to `unknown`.
+        """
+        if not self.model.has_transition(name):
+            state.missing[(None, name)] += 1
+            state.consumed += 1
+            state.produced += 1
+            state.marking[(name, None)] += 1
+            if unknown is not None:
+                unknown[name] += 1
+            return state
+
+        return self._fire_enabled(state, name)
+
+    def finish(self, state: _State) -> _State:
+        """
+        Moves the final token to SINK, tokens left in other places stay in marking
+        """
+        return self._fire_enabled(state, SINK)
+
+    def _fire_enabled(self, state: _State, name: str) -> _State:
+        if not self.model.inputs[name]:
+            # unreachable node (or no end nodes for SINK)
+            state.missing[(None, name)] += 1
+            state.consumed += 1
+            self._produce(state, name)
+            return state
+        if not self._has_token(state, name):
+            enabled = self._enable(state, name, set())
+            if enabled is not None:
+                state = enabled
+            elif not self._force_join(state, name):
+                place = self.model.inputs[name][0]
+                state.missing[place] += 1
+                state.marking[place] += 1
+        self._consume(state, name)
+        self._produce(state, name)
+        return state
+
+    def _force_join(self, state: _State, name: str) -> bool:
+        """
+        Fires a partially marked parallel gate in front of `name` with missing tokens on its empty inputs,
+        so they are reported on the branch which was not executed
+
+        :return: True if `name` got a token
+        """
+        for place in self.model.inputs[name]:
+            gate = place[0]
+            if not self.model.is_and[gate] or not self.model.is_silent[gate]:
+                continue
+            gate_inputs = self.model.inputs[gate]
+            if gate_inputs and any(state.marking[gate_place] > 0 for gate_place in gate_inputs):
+                for gate_place in gate_inputs:
+                    if state.marking[gate_place] == 0:
+                        state.missing[gate_place] += 1
+                        state.marking[gate_place] += 1
+                self._consume(state, gate)
+                self._produce(state, gate)
+                return True
+        return False
+
+    def _has_token(self, state: _State, name: str) -> bool:
+        inputs = self.model.inputs[name]
+        if self.model.is_and[name]:
+            return all(state.marking[place] > 0 for place in inputs)
+        return any(state.marking[place] > 0 for place in inputs)
+
+    def _enable(self, state: _State, name: str, visited: Set[str]) -> Optional[_State]:
+        """
+        Fires silent predecessors until `name` is enabled. Each gate is tried at most once per search.
+
+        :return: new state, or None if `name` cannot be enabled (state is not changed)
+        """
+        if self.model.is_and[name]:
+            for place in self.model.inputs[name]:
+                if state.marking[place] == 0:
+                    state = self._fire_silent(state, place[0], visited)
+                    if state is None:
+                        return None
+            return state
+
+        for place in self.model.inputs[name]:
+            predecessor = place[0]
+            if self.model.is_silent[predecessor] and predecessor != SOURCE:
+                fired = self._fire_silent(state, predecessor, visited)
+                if fired is not None and fired.marking[place] > 0:
+                    return fired
+        return None
+
+    def _fire_silent(self, state: _State, name: str, visited: Set[str]) -> Optional[_State]:
+        if not self.model.is_silent[name] or name == SOURCE or name in visited:
+            return None
+        visited.add(name)
+        if not self._has_token(state, name):
+            state = self._enable(state, name, visited)
+            if state is None:
+                return None
+        else:
+            state = state.copy()
+        self._consume(state, name)
+        self._produce(state, name)
+        return state
+
+    def _consume(self, state: _State, name: str):
+        inputs = self.model.inputs[name]
+        if self.model.is_and[name]:
+            for place in inputs:
+                state.marking[place] -= 1
+            state.consumed += len(inputs)
+        else:
+            place = next(place for place in inputs if state.marking[place] > 0)
+            state.marking[place] -= 1
+            state.consumed += 1
+
+    def _produce(self, state: _State, name: str):
+        outputs = self.model.outputs[name]
+        for place in outputs:
+            state.marking[place] += 1
+        state.produced += len(outputs)
+
+
+class VariantReplay(NamedTuple):
+    trace: Tuple[str, ...]
+    count: float
+    fitness: float
+    missing: int
+    remaining: int
+    consumed: int
+    produced: int
+
+
+class ConformanceResult:
+    def __init__(self, variants: List[VariantReplay], missing: Counter, remaining: Counter, unknown: Counter):
+        """
+        :param variants: replay of every unique variant
+        :param missing: place -> missing tokens weighted by case counts, places are `(source, target)`
+            of edges, SOURCE and SINK included. `(None, activity)` is an activity not in the network
+        :param remaining: place -> tokens left after replay weighted by case counts,
+            `(node, None)` is a choice place of a node with several outgoing edges
+        :param unknown: activity -> number of its events which are not in the network
+        """
+        self.variants = variants
+        self.missing = missing
+        self.remaining = remaining
+        self.unknown = unknown
+
+    def _total(self, field: str) -> float:
+        return sum(getattr(v, field) * v.count for v in self.variants)
+
+    @property
+    def fitness(self) -> float:
+        """
+        Fitness of the whole log, from token counts of all cases
+        """
+        return _fitness(self._total('missing'), self._total('remaining'), self._total('consumed'),
+                        self._total('produced'))
+
+    @property
+    def fitting_cases(self) -> float:
+        """
+        :return: fraction of cases replayed without missing and remaining tokens
+        """
+        cases = sum(v.count for v in self.variants)
+        return sum(v.count for v in self.variants if v.fitness == 1.0) / cases if cases else 1.0
+
+    def edge_report(self) -> Dict[Place, Tuple[float, float]]:
+        """
+        :return: place -> (missing, remaining) for places with any problem
+        """
+        return {place: (self.missing[place], self.remaining[place]) for place in self.missing.keys() | self.remaining.keys()
+                if self.missing[place] or self.remaining[place]}
+
+
+class _TrieNode:
+    __slots__ = ('children', 'count', 'cases')
+
+    def __init__(self):
+        self.children: Dict[str, _TrieNode] = dict()
+        self.count = 0  # cases with exactly this trace
+        self.cases = 0  # cases with this prefix
+
+
+def _build_trie(variants: Iterable[Variant]) -> _TrieNode:
+    root = _TrieNode()
+    for trace, count in variants:
+        root.cases += count
+        node = root
+        for activity in trace:
+            node = node.children.setdefault(activity, _TrieNode())
+            node.cases += count
+        node.count += count
+    return root
+
+
+def _fitness(missing: int, remaining: int, consumed: int, produced: int) -> float:
+    if consumed == 0 or produced == 0:
+        return 1.0
+    return 0.5 * (1 - missing / consumed) + 0.5 * (1 - remaining / produced)
+
+
+def _replay_counts(result: ConformanceResult, *args, **kwargs):
+    return {'variants': len(result.variants), 'missing': sum(result.missing.values()),
+            'remaining': sum(result.remaining.values())}
+
+
+@instrumented(counts=_replay_counts)
+def token_replay(network: Network, log: Union[Result, Iterable[Variant]]) -> ConformanceResult:
+    """
+    Replays every unique variant of the log once, sharing the replay of common prefixes
+
+    :param network: network to check, usually mined by `miner.alpha_miner`
+    :param log: import result or (trace, number of cases) pairs
+    """
+    variants = log.get_variants() if isinstance(log, Result) else log
+    replayer = Replayer(Model(network))
+    root = _build_trie(variants)
+
+    replays = []
+    missing = Counter()
+    remaining = Counter()
+    unknown = Counter()
+
+    # iterative DFS, traces can be longer than recursion limit
+    stack = [((), root, replayer.initial())]
+    while stack:
+        prefix, trie_node, state = stack.pop()
+
+        if trie_node.count:
+            final = replayer.finish(state.copy())
+            for place, cnt in final.missing.items():
+                missing[place] += cnt * trie_node.count
+            left = {place: cnt for place, cnt in final.marking.items() if cnt > 0}
+            for place, cnt in left.items():
+                remaining[place] += cnt * trie_node.count
+            n_missing, n_remaining = sum(final.missing.values()), sum(left.values())
+            replays.append(VariantReplay(prefix, trie_node.count,
+                                         _fitness(n_missing, n_remaining, final.consumed, final.produced),
+                                         n_missing, n_remaining, final.consumed, final.produced))
+
+        children = list(trie_node.children.items())
+        for i, (activity, child) in enumerate(children):
+            # the last child can take over the state of its parent
+            child_state = state if i == len(children) - 1 else state.copy()
+            child_unknown = Counter()
+            stack.append((prefix + (activity,), child, replayer.fire(child_state, activity, child_unknown)))
+            for name, cnt in child_unknown.items():
+                unknown[name] += cnt * child.cases
+
+    replays.sort(key=lambda v: v.count, reverse=True)
+    return ConformanceResult(replays, missing, remaining, unknown)
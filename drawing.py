@@ -1,13 +1,26 @@
+from __future__ import annotations
+
+import io
+import json
+import os
+import time
+from math import inf
+from typing import BinaryIO, Dict, Iterable, Optional, Set, Tuple, TYPE_CHECKING
+
 from bpmn_network import UtilityNode, NodeKind
+from instrumentation import instrumented
 from network import Network, NodeType
-import matplotlib.pyplot as plt
-import matplotlib.image as mpimg
 
-import pygraphviz as pgv
+# pygraphviz is imported only when a graph is built
+if TYPE_CHECKING:
+    import pygraphviz as pgv
 
 AND_LABEL = '+'
 XOR_LABEL = 'x'
 
+# engine used when there are too many nodes for `dot`
+FAST_PROG = 'sfdp'
+
 
 def _draw_utility_node(G: pgv.AGraph, name, label='?'):
     G.add_node(name, shape="diamond",
@@ -16,26 +29,41 @@ def _draw_utility_node(G: pgv.AGraph, name, label='?'):
                fontsize="40", label=label)
 
 
-def draw_simple_network(network: Network,
-                        name='graph',
-                        title='Process Diagram',
-                        auto_show=False,
-                        with_numbers=False,
-                        ortho=True,
-                        draw_filtered_out=False,
-                        draw_start_end_circles=True):
+@instrumented(counts=lambda G, *args, **kwargs: {'nodes': G.number_of_nodes(), 'edges': G.number_of_edges()})
+def build_graph(network: Network,
+                with_numbers=False,
+                ortho=True,
+                draw_filtered_out=False,
+                draw_start_end_circles=True,
+                clusters: Iterable[Set[str]] = (),
+                duration_label: str = None,
+                duration_color: str = None) -> pgv.AGraph:
     """
-    Draws a BPMN process diagram using PyGraphViz
+    Converts network to PyGraphViz graph, without any layout
 
     :param network: a Network to render
-    :param name: unique name if multiple renders at time - it is saved to {name}.png
-    :param title: Title to display
-    :param auto_show: If true, it calls `plt.show()`
-    :param numbers: Show event and edge count on labels
+    :param with_numbers: Show event and edge count on labels
     :param ortho: Draw edges only orthogonal
     :param draw_filtered_out: Draw filtered-out edges
     :param draw_start_end_circles: Draw start and end event circle
+    :param clusters: groups of node names drawn inside a common frame
+    :param duration_label: statistic of service and waiting times shown on labels ('mean', 'p50', 'p95', 'max'),
+        network has to be annotated by `durations.annotate`
+    :param duration_color: statistic used to color events and edges from green (fastest) to red (slowest)
     """
+    import pygraphviz as pgv
+    from durations import format_duration, heat_color, statistic
+
+    def duration(item, attr: str, name: Optional[str]) -> Optional[float]:
+        return statistic(getattr(item, attr, None), name) if name is not None else None
+
+    def max_duration(items, attr: str) -> float:
+        return max((value for value in (duration(item, attr, duration_color) for item in items)
+                    if value is not None), default=0.0)
+
+    nodes_max = max_duration(network.nodes.values(), 'service_time')
+    edges_max = max_duration(network.get_edge_list(), 'waiting_time')
+
     G = pgv.AGraph(strict=False, directed=True)
     G.graph_attr['rankdir'] = 'LR'
     G.node_attr['shape'] = 'Mrecord'
@@ -63,13 +91,27 @@ def draw_simple_network(network: Network,
             _draw_utility_node(G, node.name, label)
         elif node.type == NodeType.EVENT:
             label = node.__str__() if with_numbers else node.name
-            G.add_node(node.name, label=label)
+            attrs = dict()
+            value = duration(node, 'service_time', duration_label)
+            if value is not None:
+                label += f'\\n{format_duration(value)}'
+            value = duration(node, 'service_time', duration_color)
+            if value is not None:
+                attrs.update(style='filled', fillcolor=heat_color(value, nodes_max))
+            G.add_node(node.name, label=label, **attrs)
 
     for edge in network.get_edge_list():
         if not draw_filtered_out and edge.is_filtered_out:
             continue
-        label = edge.__str__() if with_numbers else ''
-        G.add_edge(edge.src.name, edge.target.name, label=label)
+        labels = [edge.__str__()] if with_numbers else []
+        attrs = dict()
+        value = duration(edge, 'waiting_time', duration_label)
+        if value is not None:
+            labels.append(format_duration(value))
+        value = duration(edge, 'waiting_time', duration_color)
+        if value is not None:
+            attrs['color'] = heat_color(value, edges_max)
+        G.add_edge(edge.src.name, edge.target.name, label=' '.join(labels), **attrs)
 
     if draw_start_end_circles:
         G.add_node(f'_start', shape="circle", label="")
@@ -80,12 +122,230 @@ def draw_simple_network(network: Network,
         for i, end_evt in enumerate(network.get_end_events()):
             G.add_edge(end_evt.name, f'_end')
 
-    G.layout()
-    G.draw(f'results/{name}.png', prog='dot')
-    img = mpimg.imread(f'results/{name}.png')
+    for i, cluster in enumerate(clusters):
+        G.add_subgraph([name for name in cluster if G.has_node(name)], name=f'cluster_{i}',
+                       style='dashed', color='gray')
+
+    return G
+
+
+class LayoutCache:
+    """
+    Node positions from previous layouts, kept separately for every model lineage
+    (e.g. one process diagram re-rendered with different filter thresholds).
+    Positions are in points, as returned by Graphviz.
+    """
+    def __init__(self, path: str = None):
+        """
+        :param path: optional JSON file, positions are loaded from it and written back by `save()`
+        """
+        self.path = path
+        self.lineages: Dict[str, Dict[str, Tuple[float, float]]] = dict()
+        if path is not None and os.path.exists(path):
+            with open(path) as f:
+                self.lineages = {lineage: {name: tuple(pos) for name, pos in positions.items()}
+                                 for lineage, positions in json.load(f).items()}
+
+    def positions(self, lineage: str) -> Dict[str, Tuple[float, float]]:
+        return self.lineages.get(lineage, dict())
+
+    def apply(self, G: pgv.AGraph, lineage: str, pin=True) -> int:
+        """
+        Sets cached positions as initial (or pinned) positions of nodes of G
+
+        :return: number of nodes with known position
+        """
+        positions = self.positions(lineage)
+        placed = 0
+        for node in G.nodes_iter():
+            pos = positions.get(node.name)
+            if pos is not None:
+                # input positions are in inches
+                node.attr['pos'] = f'{pos[0] / 72},{pos[1] / 72}' + ('!' if pin else '')
+                placed += 1
+        return placed
+
+    def store(self, G: pgv.AGraph, lineage: str):
+        """
+        Remembers positions of all nodes of already laid out G
+        """
+        positions = dict()
+        for node in G.nodes_iter():
+            x, y = node.attr['pos'].rstrip('!').split(',')
+            positions[node.name] = (float(x), float(y))
+        self.lineages[lineage] = positions
+
+    def save(self):
+        with open(self.path, 'w') as f:
+            json.dump(self.lineages, f)
+
+
+@instrumented(counts=lambda data, *args, **kwargs: {'bytes': len(data)})
+def render(network: Network, format='png', stream: BinaryIO = None, prog='dot',
+           layout_cache: LayoutCache = None, lineage='default', pin=True, **graph_options) -> bytes:
+    """
+    Renders network in memory, without touching disk or matplotlib.
+    Layout is computed only once, by the `prog` engine.
+
+    With `layout_cache`, nodes known from the previous render of the same `lineage` keep their positions
+    and only the new ones are placed, by `neato` instead of `prog`. Positions from this render are stored back.
+
+    :param network: a Network to render
+    :param format: any Graphviz output format, e.g. 'png' or 'svg'
+    :param stream: if provided, rendered image is also written to it
+    :param prog: Graphviz layout engine
+    :param layout_cache: cache of node positions from previous renders
+    :param lineage: key of the model in `layout_cache`
+    :param pin: cached nodes are fixed, otherwise their positions are only a starting point
+    :param graph_options: passed to `build_graph`
+    :return: rendered image
+    """
+    G = build_graph(network, **graph_options)
+    if layout_cache is None:
+        data = G.draw(format=format, prog=prog)
+    else:
+        if layout_cache.apply(G, lineage, pin) > 0:
+            prog = 'neato'
+        G.layout(prog=prog)
+        layout_cache.store(G, lineage)
+        data = G.draw(format=format)
+    if stream is not None:
+        stream.write(data)
+    return data
+
+
+def level_of_detail(network: Network, max_nodes: int, min_edge_count=0) -> Network:
+    """
+    Simplified copy of network for rendering big models.
+    Only `max_nodes - 1` heaviest nodes are kept (events by count, gates by their heaviest edge),
+    the rest is collapsed into a single aggregate event. Parallel edges created by collapsing are merged
+    and edges with count below `min_edge_count` are dropped.
+
+    :return: new network, same as original if it's small enough and no edges are dropped
+    """
+    def weight(node):
+        if node.cnt != inf:
+            return node.cnt
+        counts = [network.edges[node.name][s.name].cnt for s in node.successors] \
+            + [network.edges[p.name][node.name].cnt for p in node.predecessors]
+        return max(counts, default=0)
+
+    nodes = list(network.nodes.values())
+    if len(nodes) > max_nodes:
+        nodes.sort(key=weight, reverse=True)
+        kept, collapsed = nodes[:max(max_nodes - 1, 0)], nodes[max(max_nodes - 1, 0):]
+    else:
+        kept, collapsed = nodes, []
+
+    node_table, _ = network.get_state(kept)
+    simplified = type(network).from_state((node_table, []))
+
+    aggregate = None
+    if collapsed:
+        collapsed_events = [n for n in collapsed if n.type == NodeType.EVENT]
+        aggregate = simplified.add_node(f'{len(collapsed)} other nodes',
+                                        cnt=sum(n.cnt for n in collapsed_events),
+                                        is_start=any(n.is_start_node for n in collapsed),
+                                        is_end=any(n.is_end_node for n in collapsed))
+
+    counts = dict()
+    for edge in network.get_edge_list():
+        src = edge.src.name if edge.src.name in simplified.nodes else aggregate.name
+        target = edge.target.name if edge.target.name in simplified.nodes else aggregate.name
+        if aggregate is not None and src == target == aggregate.name:
+            continue
+        counts[(src, target)] = counts.get((src, target), 0) + edge.cnt
+
+    for (src, target), cnt in counts.items():
+        if cnt >= min_edge_count:
+            simplified.add_edge(src, target, cnt)
+
+    return simplified
+
+
+@instrumented(counts=lambda data, *args, **kwargs: {'bytes': len(data)})
+def render_with_budget(network: Network,
+                       max_nodes=150,
+                       time_limit: float = None,
+                       fast_threshold=100,
+                       min_edge_count=0,
+                       format='png',
+                       **graph_options) -> bytes:
+    """
+    Renders big networks within a budget. Network is simplified by `level_of_detail`, so that the diagram
+    has at most `max_nodes` nodes including start and end circles, strongly connected regions are drawn
+    as clusters. Above `fast_threshold` nodes, a faster layout engine (`FAST_PROG`) is used instead of `dot`.
+
+    :param time_limit: if set, `dot` layout running longer than that is killed and the faster
+        engine gets the rest of the time. TimeoutError is raised if it doesn't make it either
+    :return: rendered image
+    """
+    circles = 2 if graph_options.get('draw_start_end_circles', True) else 0
+    simplified = level_of_detail(network, max(max_nodes - circles, 1), min_edge_count)
+    clusters = [set(n.name for n in c) for c in simplified.strongly_connected_components() if len(c) > 1]
+
+    prog = 'dot' if len(simplified.nodes) + circles <= fast_threshold else FAST_PROG
+    if prog == FAST_PROG:
+        graph_options['ortho'] = False
+
+    G = build_graph(simplified, clusters=clusters, **graph_options)
+    if time_limit is None:
+        return G.draw(format=format, prog=prog)
+
+    from batch_render import render_dot
+
+    start = time.perf_counter()
+    # leave half of the time for the fast engine, in case `dot` doesn't make it
+    data = render_dot(G.string(), format=format, prog=prog,
+                      timeout=time_limit if prog == FAST_PROG else time_limit / 2)
+    if data is None and prog != FAST_PROG:
+        graph_options['ortho'] = False
+        G = build_graph(simplified, clusters=clusters, **graph_options)
+        data = render_dot(G.string(), format=format, prog=FAST_PROG, timeout=time_limit - (time.perf_counter() - start))
+    if data is None:
+        raise TimeoutError(f'Network could not be rendered within {time_limit}s')
+
+    return data
+
+
+def draw_simple_network(network: Network,
+                        name='graph',
+                        title='Process Diagram',
+                        auto_show=False,
+                        with_numbers=False,
+                        ortho=True,
+                        draw_filtered_out=False,
+                        draw_start_end_circles=True,
+                        duration_label: str = None,
+                        duration_color: str = None):
+    """
+    Draws a BPMN process diagram using PyGraphViz
+
+    :param network: a Network to render
+    :param name: unique name if multiple renders at time - it is saved to {name}.png
+    :param title: Title to display
+    :param auto_show: If true, the diagram is shown by `plt.show()`, matplotlib is not used otherwise
+    :param numbers: Show event and edge count on labels
+    :param ortho: Draw edges only orthogonal
+    :param draw_filtered_out: Draw filtered-out edges
+    :param draw_start_end_circles: Draw start and end event circle
+    :param duration_label: show this statistic of service and waiting times, see `build_graph`
+    :param duration_color: color events and edges by this statistic, see `build_graph`
+    """
+    png = render(network, format='png', with_numbers=with_numbers, ortho=ortho,
+                 draw_filtered_out=draw_filtered_out, draw_start_end_circles=draw_start_end_circles,
+                 duration_label=duration_label, duration_color=duration_color)
+    with open(f'results/{name}.png', 'wb') as f:
+        f.write(png)
+
+    if not auto_show:
+        return
+
+    import matplotlib.pyplot as plt
+
+    img = plt.imread(io.BytesIO(png))
     plt.figure()
     plt.axis('off')
     plt.imshow(img)
     plt.title(title)
-    if auto_show:
-        plt.show()
+    plt.show()
@@ -0,0 +1,136 @@
+"""
+Activity and edge durations from event timestamps, for bottleneck analysis.
+
+    service time  - Complete Timestamp - Start Timestamp of an event
+    waiting time  - start of an event - completion of the previous event of the same case,
+                    for every directly-follows pair (start of the previous one, if the log
+                    has no complete timestamps). Overlapping events wait 0.
+
+Both are computed for all events at once, with shifted columns of the event table sorted by case and start.
+Statistics are attached to networks by `annotate` - nodes get `service_time`, edges `waiting_time`,
+and `drawing.build_graph` can label and color by them.
+"""
+from __future__ import annotations
+
+from typing import Dict, NamedTuple, Optional, Tuple, TYPE_CHECKING
+
+from import_handler import Result
+from instrumentation import instrumented
+from network import Network
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+STATISTICS = ('mean', 'p50', 'p95', 'max')
+
+
+class DurationStats(NamedTuple):
+    """
+    Durations in seconds
+    """
+    mean: float
+    p50: float
+    p95: float
+    max: float
+    count: int
+
+
+class LogDurations(NamedTuple):
+    service: Dict[str, DurationStats]  # activity -> service time, only if the log has complete timestamps
+    waiting: Dict[Tuple[str, str], DurationStats]  # (activity, next activity) -> waiting time
+
+
+def _aggregate(values: pd.Series, keys) -> Dict:
+    grouped = values.groupby(keys, sort=False)
+    table = grouped.agg(['mean', 'median', 'max', 'count'])
+    table['p95'] = grouped.quantile(0.95)
+    table = table[table['count'] > 0]
+    return {key: DurationStats(float(row.mean), float(row.median), float(row.p95), float(row.max), int(row.count))
+            for key, row in zip(table.index, table.itertuples(index=False))}
+
+
+def _duration_counts(result: LogDurations, *args, **kwargs):
+    return {'activities': len(result.service), 'edges': len(result.waiting)}
+
+
+@instrumented(counts=_duration_counts)
+def compute(log: Result) -> LogDurations:
+    """
+    :param log: import result with `events_df` (logs read by `import_handler.from_csv`)
+    :return: per activity and per directly-follows pair statistics
+    """
+    if log.events_df is None:
+        raise ValueError('Log has no event timestamps, durations need a log read from CSV')
+
+    events, service, pairs = event_durations(log.events_df)
+    return LogDurations(_aggregate(service, events['Activity']),
+                        _aggregate(pairs['waiting'], [pairs['source'], pairs['target']]))
+
+
+def event_durations(events: pd.DataFrame) -> Tuple[pd.DataFrame, pd.Series, pd.DataFrame]:
+    """
+    :param events: table like `Result.events_df`
+    :return: (events sorted by case and start, their service times in seconds,
+        directly-follows pairs with columns source, target, waiting)
+    """
+    import pandas as pd
+
+    events = events.sort_values(['Case ID', 'Start Event'], kind='stable')
+    start = events['Start Event']
+    end = events['End Event']
+
+    service = (end - start).dt.total_seconds()
+
+    # pairs (event, next event of the same case)
+    same_case = (events['Case ID'] == events['Case ID'].shift(-1)).to_numpy()
+    previous_end = end.fillna(start)
+    waiting = (start.shift(-1) - previous_end).dt.total_seconds().clip(lower=0)
+    pairs = pd.DataFrame({'source': events['Activity'].to_numpy()[same_case],
+                          'target': events['Activity'].shift(-1).to_numpy()[same_case],
+                          'waiting': waiting.to_numpy()[same_case]})
+    return events, service, pairs
+
+
+def annotate(network: Network, durations: LogDurations) -> Network:
+    """
+    Sets `service_time` of event nodes and `waiting_time` of edges (DurationStats or None).
+    Edges of mined networks go through gates, only edges between two events get waiting times.
+    Annotate the network after filtering and mining, `FilterView.materialize` does not copy edge attributes.
+
+    :return: the same network
+    """
+    for node in network.nodes.values():
+        node.service_time = durations.service.get(node.name) if node.is_event() else None
+    for edge in network.get_edge_list():
+        edge.waiting_time = durations.waiting.get((edge.src.name, edge.target.name))
+    return network
+
+
+def format_duration(seconds: float) -> str:
+    """
+    :return: short human readable duration, e.g. '45s', '12m', '3.5h', '2.1d'
+    """
+    if seconds < 60:
+        return f'{seconds:.0f}s'
+    if seconds < 3600:
+        return f'{seconds / 60:.0f}m'
+    if seconds < 86400:
+        return f'{seconds / 3600:.1f}h'
+    return f'{seconds / 86400:.1f}d'
+
+
+def heat_color(value: float, maximum: float) -> str:
+    """
+    :return: Graphviz HSV color from green (0) to red (`maximum`)
+    """
+    ratio = min(1.0, value / maximum) if maximum > 0 else 0.0
+    return f'{0.33 * (1 - ratio):.3f} 0.8 0.9'
+
+
+def statistic(stats: Optional[DurationStats], name: str) -> Optional[float]:
+    """
+    :param name: one of STATISTICS
+    """
+    if name not in STATISTICS:
+        raise ValueError(f'Unknown statistic {name}, use one of {", ".join(STATISTICS)}')
+    return None if stats is None else getattr(stats, name)
@@ -188,4 +188,31 @@ def lab3_setB_nofilter(case: int):
     bpmn_network = alpha_miner(filtered_network)
 
     draw_simple_network(bpmn_network, with_numbers=True, auto_show=True,
-                        name='BB'+str(case), title='BB'+str(case))
\ No newline at end of file
+                        name='BB'+str(case), title='BB'+str(case))
+
+
+def lab3_setB_thresholds(case: int, thresholds=(0, 0.5, 0.9)):
+    """
+    Jak lab3_setB, ale dla kilku progow - import i macierze sa liczone tylko raz
+    """
+    from pipeline import standard_pipeline
+
+    pipeline = standard_pipeline('filtered')
+    for threshold in thresholds:
+        result = pipeline.run('mine', path='data/B'+str(case)+'.csv', dependency_threshold=threshold)
+        draw_simple_network(result['mine'], with_numbers=True,
+                            name='B'+str(case)+'_'+str(threshold), title='B'+str(case)+' prog '+str(threshold))
+
+
+def lab1_repair_durations(statistic='mean'):
+    """
+    Repair example z czasami - etykiety i kolory wg czasu wykonania i oczekiwania (waskie gardla)
+    """
+    import durations
+
+    repair_example = import_handler('data/repairExample.csv')
+    network = network_factory.from_importer(repair_example, import_start_end_events=True)
+    durations.annotate(network, durations.compute(repair_example))
+
+    draw_simple_network(network, ortho=False, auto_show=True, duration_label=statistic, duration_color=statistic,
+                        name='repair_durations', title='Repair Example - czasy ('+statistic+')')
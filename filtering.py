@@ -1,6 +1,14 @@
 from typing import Dict
 
 from import_handler import Result
+from instrumentation import instrumented
+
+
+def _matrix_counts(matrix, *args, **kwargs):
+    return {'entries': sum(len(row) for row in matrix.values())}
+
+
+@instrumented(counts=_matrix_counts)
 def calculate_significance_dependency_matrix(import_result: Result):
     significance_dependency = dict()
     for event, counter in import_result.direct_succession.items():
@@ -15,6 +23,7 @@ def calculate_significance_dependency_matrix(import_result: Result):
 
     return significance_dependency
 
+@instrumented(counts=_matrix_counts)
 def calculate_2loop_matrix(import_result: Result):
     two_loop = dict()
     for event, counter in import_result.direct_succession.items():
@@ -54,6 +63,7 @@ def calculate_2loop_matrix(import_result: Result):
 
 
 
+@instrumented(counts=lambda result, *args, **kwargs: {'edges': sum(len(row) for row in result[0].values())})
 def filter_network_by_matrices(sd_dict: Dict[str, Dict[str, float]], two_loop_dict: Dict[str, Dict[str, float]], threshold: float):
     filtered_direct_succession = dict()
     filtered_out_two_loop = dict()
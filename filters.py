@@ -1,6 +1,14 @@
+from __future__ import annotations
+
+import heapq
+import re
+from collections import deque
 from copy import deepcopy
+from math import inf
+from typing import Callable, Iterable, List, NamedTuple, Set, Tuple
 
 from bpmn_network import BPMNNetwork
+from network import Network, Node, Edge, NodeType
 
 
 def filter_edges(network: BPMNNetwork, threshold: int) -> BPMNNetwork:
@@ -29,11 +37,212 @@ def filter_events(network: BPMNNetwork, threshold: int) -> BPMNNetwork:
     return new_network
 
 
-def find_broken_nodes(network: BPMNNetwork):
+def top_k_threshold(counts: Iterable[float], k: int) -> float:
+    """
+    Finds the smallest threshold, which keeps `k` largest counts (items with cnt >= threshold).
+    Items tied with the k-th count are kept too, so more than k items may pass.
+    Uses a bounded heap, O(n log k).
+
+    :return: threshold, inf if k < 1
+    """
+    if k < 1:
+        return inf
+    largest = heapq.nlargest(k, counts)
+    return largest[-1] if largest else inf
+
+
+def coverage_threshold(counts: Iterable[float], coverage: float) -> float:
+    """
+    Finds the threshold keeping the smallest set of largest counts,
+    which together make at least `coverage` (0..1) of the total count.
+    Counts are popped from a heap only until coverage is reached, O(n + m log n) for m kept items.
+
+    :return: threshold, inf if nothing has to be kept
     """
-    Można użyć BFS / DFS do szukania urwanych ścieżek
-    czyli jak jakiś event został samotny bez krawędzi po filtracji
-    :param network:
-    :return:
+    heap = [-cnt for cnt in counts]
+    required = coverage * -sum(heap)
+    heapq.heapify(heap)
+
+    threshold = inf
+    covered = 0
+    while heap and covered < required:
+        cnt = -heapq.heappop(heap)
+        covered += cnt
+        threshold = cnt
+
+    return threshold
+
+
+def _event_counts(network: Network) -> List[float]:
+    # utility nodes have infinite count, they are never filtered out
+    return [node.cnt for node in network.nodes.values() if node.type == NodeType.EVENT]
+
+
+def _edge_counts(network: Network) -> List[float]:
+    return [edge.cnt for edge in network.get_edge_list()]
+
+
+def filter_edges_top_k(network: BPMNNetwork, k: int) -> Tuple[BPMNNetwork, float]:
+    """
+    `filter_edges` keeping `k` most frequent edges (and ties)
+
+    :return: tuple (filtered network, effective threshold)
+    """
+    threshold = top_k_threshold(_edge_counts(network), k)
+    return filter_edges(network, threshold), threshold
+
+
+def filter_events_top_k(network: BPMNNetwork, k: int) -> Tuple[BPMNNetwork, float]:
+    """
+    `filter_events` keeping `k` most frequent events (and ties)
+
+    :return: tuple (filtered network, effective threshold)
+    """
+    threshold = top_k_threshold(_event_counts(network), k)
+    return filter_events(network, threshold), threshold
+
+
+def filter_edges_by_coverage(network: BPMNNetwork, coverage: float) -> Tuple[BPMNNetwork, float]:
+    """
+    `filter_edges` keeping most frequent edges covering `coverage` (0..1) of all edge counts
+
+    :return: tuple (filtered network, effective threshold)
+    """
+    threshold = coverage_threshold(_edge_counts(network), coverage)
+    return filter_edges(network, threshold), threshold
+
+
+def filter_events_by_coverage(network: BPMNNetwork, coverage: float) -> Tuple[BPMNNetwork, float]:
     """
-    pass
+    `filter_events` keeping most frequent events covering `coverage` (0..1) of all event counts
+
+    :return: tuple (filtered network, effective threshold)
+    """
+    threshold = coverage_threshold(_event_counts(network), coverage)
+    return filter_events(network, threshold), threshold
+
+
+class FilterMask(NamedTuple):
+    nodes: Set[str]  # names of filtered out nodes
+    edges: Set[Tuple[str, str]]  # (src, target) of filtered out edges, including edges of filtered out nodes
+
+
+class FilterView:
+    """
+    Lazy alternative to `filter_edges` / `filter_events`.
+    It only records predicates (True means filtered out), network is not copied.
+    Adding a predicate returns a new view, so views can be composed and reused:
+
+        base = FilterView(network).events_below(700)
+        for threshold in (100, 200, 400):
+            pruned = base.edges_below(threshold).materialize()
+
+    All predicates are evaluated together in a single pass over nodes and edges, when `mask()` is needed.
+    """
+    def __init__(self, network: Network,
+                 node_predicates: List[Callable[[Node], bool]] = None,
+                 edge_predicates: List[Callable[[Edge], bool]] = None):
+        self.network = network
+        self._node_predicates = list(node_predicates or [])
+        self._edge_predicates = list(edge_predicates or [])
+        self._mask = None
+
+    def exclude_nodes(self, predicate: Callable[[Node], bool]) -> FilterView:
+        return FilterView(self.network, self._node_predicates + [predicate], self._edge_predicates)
+
+    def exclude_edges(self, predicate: Callable[[Edge], bool]) -> FilterView:
+        return FilterView(self.network, self._node_predicates, self._edge_predicates + [predicate])
+
+    def events_below(self, threshold) -> FilterView:
+        """
+        Same condition as `filter_events`
+        """
+        return self.exclude_nodes(lambda node: node.cnt < threshold)
+
+    def edges_below(self, threshold) -> FilterView:
+        """
+        Same condition as `filter_edges`
+        """
+        return self.exclude_edges(lambda edge: edge.cnt < threshold)
+
+    def events_matching(self, pattern: str) -> FilterView:
+        """
+        Filters out events which names match regex `pattern` (`re.search`)
+        """
+        regex = re.compile(pattern)
+        return self.exclude_nodes(lambda node: node.type == NodeType.EVENT and regex.search(node.name) is not None)
+
+    def mask(self) -> FilterMask:
+        """
+        Evaluates all predicates on first use, then the result is reused.
+        Create a new view after modifying the network.
+        """
+        if self._mask is None:
+            nodes = set(node.name for node in self.network.nodes.values()
+                        if any(predicate(node) for predicate in self._node_predicates))
+            edges = set((edge.src.name, edge.target.name) for edge in self.network.get_edge_list()
+                        if edge.src.name in nodes or edge.target.name in nodes
+                        or any(predicate(edge) for predicate in self._edge_predicates))
+            self._mask = FilterMask(nodes, edges)
+
+        return self._mask
+
+    def apply(self):
+        """
+        Sets `is_filtered_out` flags of the underlying network in place according to the mask,
+        so it can be drawn with filtered out items or purged with `delete_filtered_out_items`
+        """
+        mask = self.mask()
+        for node in self.network.nodes.values():
+            node.is_filtered_out = node.name in mask.nodes
+        for edge in self.network.get_edge_list():
+            edge.is_filtered_out = (edge.src.name, edge.target.name) in mask.edges
+
+    def materialize(self) -> Network:
+        """
+        :return: new network of the same type, containing only items which passed all filters.
+            Node attributes are copied shallowly
+        """
+        mask = self.mask()
+        kept = (node for node in self.network.nodes.values() if node.name not in mask.nodes)
+        node_table, edge_table = self.network.get_state(kept)
+        edge_table = [edge for edge in edge_table if (edge[0], edge[1]) not in mask.edges]
+        return type(self.network).from_state((node_table, edge_table))
+
+
+def find_broken_nodes(network: BPMNNetwork, delete=False) -> Set[Node]:
+    """
+    Finds nodes which are not on any path from a start event to an end event,
+    e.g. events left alone or dangling paths after filtering.
+    Uses iterative BFS forward from start events and backward from end events, O(V + E).
+
+    If there are no start (end) events marked, nodes without predecessors (successors) are used.
+
+    :param network: network to check
+    :param delete: if True, broken nodes are deleted from the network
+    :return: set of broken nodes
+    """
+    start_events = network.get_start_events() \
+        or set(node for node in network.nodes.values() if len(node.predecessors) == 0)
+    end_events = network.get_end_events() \
+        or set(node for node in network.nodes.values() if len(node.successors) == 0)
+
+    reachable = _reachable(start_events, lambda node: node.successors)
+    co_reachable = _reachable(end_events, lambda node: node.predecessors)
+    broken = set(node for node in network.nodes.values() if node not in reachable or node not in co_reachable)
+
+    if delete:
+        network.delete_nodes(broken)
+
+    return broken
+
+
+def _reachable(sources: Set[Node], neighbours: Callable[[Node], Set[Node]]) -> Set[Node]:
+    visited = set(sources)
+    queue = deque(sources)
+    while queue:
+        for neighbour in neighbours(queue.popleft()):
+            if neighbour not in visited:
+                visited.add(neighbour)
+                queue.append(neighbour)
+    return visited
@@ -1,22 +1,37 @@
-import pandas as pd
+from __future__ import annotations
+
 from more_itertools import pairwise
 from collections import Counter
-from typing import Set, Dict
-from opyenxes.data_in.XUniversalParser import XUniversalParser
+from typing import Set, Dict, List, Tuple, Iterable, TYPE_CHECKING
 import more_itertools as itt
 
+from instrumentation import instrumented
+
+# pandas and opyenxes take most of the startup time, they are imported only when a log is read
+if TYPE_CHECKING:
+    import pandas as pd
+
 
 class Result:
     def __init__(self, direct_succession: Dict[str, Counter],
                  start_events: Set[str],
                  end_events: Set[str],
                  traces_df: pd.DataFrame,
-                 ev_counter: Dict[str, int]):
+                 ev_counter: Dict[str, int],
+                 events_df: pd.DataFrame = None):
         self.end_events = end_events
         self.start_events = start_events
         self.direct_succession = direct_succession
         self.traces_df = traces_df
         self.ev_counter = ev_counter
+        # single events with timestamps (Case ID, Activity, Start Event, End Event), if the log has them
+        self.events_df = events_df
+
+    def get_variants(self) -> List[Tuple[Tuple[str, ...], int]]:
+        """
+        :return: list of unique traces (tuples of activities) with their case counts
+        """
+        return [(tuple(trace), count) for trace, count in zip(self.traces_df['Trace'], self.traces_df['Count'])]
 
 
 class CsvResult(Result):
@@ -25,11 +40,22 @@ class CsvResult(Result):
                  start_events: Set[str],
                  end_events: Set[str],
                  traces_df: pd.DataFrame,
-                 event_counter: Dict[str, int]):
-        super(CsvResult, self).__init__(direct_succession, start_events, end_events, traces_df, event_counter)
+                 event_counter: Dict[str, int],
+                 events_df: pd.DataFrame = None):
+        super(CsvResult, self).__init__(direct_succession, start_events, end_events, traces_df, event_counter,
+                                        events_df)
+
+
+def _log_counts(result: Result, *args, **kwargs):
+    # ev_counter is a pandas Series for CSV, dict otherwise
+    return {'events': int(sum(result.ev_counter[ev] for ev in result.ev_counter.keys())),
+            'variants': len(result.traces_df)}
 
 
+@instrumented(counts=_log_counts)
 def from_csv(filename: str, sep=",") -> CsvResult:
+    import pandas as pd
+
     df = pd.read_csv(filename, sep=sep)
     try:
         df['Start Event'] = pd.to_datetime(df['Start Timestamp'])
@@ -45,6 +71,7 @@ def from_csv(filename: str, sep=",") -> CsvResult:
             dfs = dfs.rename(columns={'Start Timestamp': 'Start Event'}, inplace=False)
 
     ev_counter = dfs.groupby(['Activity']).Activity.count()
+    events_df = _events_df(df, dfs)
 
     dfs = dfs.sort_values(by=['Case ID', 'Start Event']) \
         .groupby(['Case ID']) \
@@ -70,7 +97,26 @@ def from_csv(filename: str, sep=",") -> CsvResult:
                 w_net[ev_i] = Counter()
             w_net[ev_i][ev_j] += row['Count']
 
-    return CsvResult(w_net, ev_start_set, ev_end_set, dfs, ev_counter)
+    return CsvResult(w_net, ev_start_set, ev_end_set, dfs, ev_counter, events_df)
+
+
+def _events_df(df: pd.DataFrame, dfs: pd.DataFrame) -> pd.DataFrame:
+    """
+    Events with parsed timestamps, End Event is NaT if the log has no complete timestamps
+    """
+    import pandas as pd
+
+    events = dfs[['Case ID', 'Activity']].copy()
+    if pd.api.types.is_datetime64_any_dtype(dfs['Start Event']):
+        events['Start Event'] = dfs['Start Event']
+    elif 'Start Event' in df.columns:
+        # logs without complete timestamps - start timestamps were already parsed, parse them the same way
+        events['Start Event'] = df['Start Event']
+    else:
+        events['Start Event'] = pd.to_datetime(dfs['Start Event'], errors='coerce')
+    events['End Event'] = df['End Event'] if 'End Event' in df.columns else pd.Series(pd.NaT, index=df.index,
+                                                                                       dtype=events['Start Event'].dtype)
+    return events
 
 
 class XesImport(Result):
@@ -83,8 +129,15 @@ class XesImport(Result):
         super(XesImport, self).__init__(direct_succession, start_events, end_events, ev_counter)
         self.traces_df = traces
 
+    def get_variants(self) -> List[Tuple[Tuple[str, ...], int]]:
+        return [(tuple(trace.split(';')), count) for trace, count in zip(self.traces_df['trace'], self.traces_df['count'])]
+
 
+@instrumented(counts=_log_counts)
 def from_xes(filename: str) -> XesImport:
+    import pandas as pd
+    from opyenxes.data_in.XUniversalParser import XUniversalParser
+
     with open(filename) as log_file:
         log = XUniversalParser().parse(log_file)[0]
 
@@ -128,6 +181,40 @@ def from_xes(filename: str) -> XesImport:
     return XesImport(df, w_net, ev_start_set, ev_end_set, ev_counter)
 
 
+@instrumented(counts=_log_counts)
+def from_variants(variants: Iterable[Tuple[Tuple[str, ...], int]]) -> CsvResult:
+    """
+    Builds import result from already known variants, without reading any file.
+    Counts don't have to be integers.
+
+    :param variants: pairs (trace, number of cases)
+    """
+    import pandas as pd
+
+    variants = sorted(((tuple(trace), count) for trace, count in variants if len(trace) > 0),
+                      key=lambda v: v[1], reverse=True)
+
+    w_net = dict()
+    ev_counter = Counter()
+    ev_start_set = set()
+    ev_end_set = set()
+    for trace, count in variants:
+        ev_start_set.add(trace[0])
+        ev_end_set.add(trace[-1])
+        for ev in trace:
+            ev_counter[ev] += count
+        for ev_i, ev_j in pairwise(trace):
+            if ev_i not in w_net.keys():
+                w_net[ev_i] = Counter()
+            w_net[ev_i][ev_j] += count
+
+    dfs = pd.DataFrame({'Activity': [';'.join(trace) for trace, _ in variants],
+                        'Count': [count for _, count in variants],
+                        'Trace': [list(trace) for trace, _ in variants]})
+
+    return CsvResult(w_net, ev_start_set, ev_end_set, dfs, ev_counter)
+
+
 def import_handler(filename: str, sep=',') -> Result:
     if filename.endswith("csv"):
         return from_csv(filename, sep)
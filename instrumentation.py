@@ -0,0 +1,437 @@
+"""
+Timing instrumentation of pipeline stages.
+
+Instrumented functions (`@instrumented`) and blocks (`with span(...)`) emit spans with wall time,
+CPU time and item counts (events, variants, nodes, edges, gates...) to sinks:
+
+    import instrumentation
+    sink = instrumentation.ChromeTraceSink('trace.json')  # open in chrome://tracing or Perfetto
+    instrumentation.enable(sink)
+    ...
+    instrumentation.disable()  # closes sinks
+
+While no sink is enabled, an instrumented function costs one extra call and a check,
+and item counts are never computed.
+
+`profile_stage(name)` attaches cProfile to every span of given name.
+
+`enable_memory()` adds memory usage to spans: peak and retained memory allocated by Python
+(tracemalloc), peak RSS of the process sampled by a background thread and optionally
+live objects of the main types (Node, Edge, DataFrame, Counter) - see `MemoryTracker`.
+"""
+from __future__ import annotations
+
+import cProfile
+import functools
+import gc
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from typing import Any, Callable, Dict, List, Optional, TextIO, Union
+
+_sinks: List[Sink] = []
+_profilers: Dict[str, cProfile.Profile] = dict()
+_memory: Optional[MemoryTracker] = None
+_local = threading.local()
+
+
+class Span:
+    """
+    One execution of a stage. Times are in seconds, `start` is `time.perf_counter()` value
+    """
+    __slots__ = ('name', 'start', 'wall', 'cpu', 'counts', 'parent', 'depth', 'pid', 'tid', 'memory',
+                 '_cpu_start', '_memory_start')
+
+    def __init__(self, name: str, counts: Dict[str, Any] = None):
+        self.name = name
+        self.counts = dict(counts or {})
+        self.start = 0.0
+        self.wall = 0.0
+        self.cpu = 0.0
+        self.parent: Optional[str] = None
+        self.depth = 0
+        self.pid = os.getpid()
+        self.tid = threading.get_ident()
+        self.memory: Optional[Dict[str, Any]] = None
+
+    def count(self, **counts):
+        """
+        Adds item counts, e.g. `span.count(nodes=10, edges=20)`
+        """
+        self.counts.update(counts)
+
+    def __enter__(self) -> Span:
+        stack = _stack()
+        if stack:
+            self.parent = stack[-1].name
+            self.depth = len(stack)
+        stack.append(self)
+
+        if _memory is not None:
+            _memory.enter(self)
+        profiler = _profilers.get(self.name)
+        if profiler is not None:
+            profiler.enable()
+        self._cpu_start = time.process_time()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.wall = time.perf_counter() - self.start
+        self.cpu = time.process_time() - self._cpu_start
+        profiler = _profilers.get(self.name)
+        if profiler is not None:
+            profiler.disable()
+        if _memory is not None:
+            _memory.exit(self)
+
+        _stack().pop()
+        if exc_type is not None:
+            self.counts['error'] = exc_type.__name__
+        for sink in _sinks:
+            sink.emit(self)
+
+    def to_dict(self) -> Dict[str, Any]:
+        result = {'name': self.name, 'start': self.start, 'wall': self.wall, 'cpu': self.cpu,
+                  'counts': self.counts, 'parent': self.parent, 'depth': self.depth, 'pid': self.pid, 'tid': self.tid}
+        if self.memory is not None:
+            result['memory'] = self.memory
+        return result
+
+
+class _NullSpan:
+    """
+    Returned by `span()` while instrumentation is disabled
+    """
+    def count(self, **counts):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def _stack() -> List[Span]:
+    stack = getattr(_local, 'stack', None)
+    if stack is None:
+        stack = _local.stack = []
+    return stack
+
+
+class Sink:
+    def emit(self, span: Span):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class ListSink(Sink):
+    """
+    Keeps spans in memory, as dicts
+    """
+    def __init__(self):
+        self.spans: List[Dict[str, Any]] = []
+
+    def emit(self, span: Span):
+        self.spans.append(span.to_dict())
+
+
+class JsonLinesSink(Sink):
+    """
+    Writes every span as one JSON line, to a file path or an open text stream
+    """
+    def __init__(self, output: Union[str, TextIO]):
+        self._own = isinstance(output, str)
+        self.stream = open(output, 'a') if self._own else output
+
+    def emit(self, span: Span):
+        self.stream.write(json.dumps(span.to_dict()) + '\n')
+
+    def close(self):
+        if self._own:
+            self.stream.close()
+        else:
+            self.stream.flush()
+
+
+class ChromeTraceSink(Sink):
+    """
+    Collects spans and writes them on `close()` in Chrome trace event format,
+    viewable in chrome://tracing or https://ui.perfetto.dev
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self.events: List[Dict[str, Any]] = []
+
+    def emit(self, span: Span):
+        self.add(span.to_dict())
+
+    def add(self, span: Dict[str, Any]):
+        """
+        Adds span already converted to dict, e.g. received from a worker process
+        """
+        self.events.append({'name': span['name'], 'ph': 'X', 'ts': span['start'] * 1e6, 'dur': span['wall'] * 1e6,
+                            'pid': span['pid'], 'tid': span['tid'], 'args': {'cpu': span['cpu'], **span['counts']}})
+        memory = span.get('memory')
+        if memory is not None:
+            # counter track of memory, next to the span
+            self.events.append({'name': 'memory', 'ph': 'C', 'ts': (span['start'] + span['wall']) * 1e6,
+                                'pid': span['pid'], 'args': {'rss': memory['rss'], 'traced': memory['traced']}})
+
+    def close(self):
+        with open(self.path, 'w') as f:
+            json.dump({'traceEvents': self.events, 'displayTimeUnit': 'ms'}, f)
+
+
+def _rss() -> int:
+    """
+    :return: resident set size of this process in bytes, 0 if unknown
+    """
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        try:
+            import resource
+        except ImportError:
+            return 0
+        # only the high-water mark is available, in kB on Linux but bytes on macOS
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return max_rss if sys.platform == 'darwin' else max_rss * 1024
+
+
+def _object_sizes(obj) -> int:
+    # DataFrames know their own size, including strings in object columns
+    memory_usage = getattr(obj, 'memory_usage', None)
+    if callable(memory_usage) and type(obj).__name__ == 'DataFrame':
+        return int(memory_usage(deep=True).sum())
+    size = sys.getsizeof(obj)
+    if hasattr(obj, '__dict__'):
+        size += sys.getsizeof(obj.__dict__)
+    return size
+
+
+def memory_by_type() -> Dict[str, Dict[str, int]]:
+    """
+    Counts live objects of main types of the pipeline, by walking all objects known to gc - it is slow.
+
+    :return: dict type -> {'count': number of objects, 'bytes': shallow size (deep for DataFrames)}
+    """
+    from network import Node, Edge
+
+    groups = {'Node': Node, 'Edge': Edge, 'Counter': Counter}
+    pandas = sys.modules.get('pandas')
+    if pandas is not None:
+        groups['DataFrame'] = pandas.DataFrame
+    result = {name: {'count': 0, 'bytes': 0} for name in ('Node', 'Edge', 'Counter', 'DataFrame')}
+    # group of every seen type, so isinstance checks are done once per type, not per object
+    type_groups = dict()
+    for obj in gc.get_objects():
+        obj_type = type(obj)
+        group = type_groups.get(obj_type, False)
+        if group is False:
+            group = type_groups[obj_type] = next(
+                (name for name, cls in groups.items() if issubclass(obj_type, cls)), None)
+        if group is not None:
+            result[group]['count'] += 1
+            result[group]['bytes'] += _object_sizes(obj)
+    return result
+
+
+class MemoryTracker:
+    """
+    Measures memory of spans, enabled by `enable_memory()`. Every span gets `memory` dict with:
+
+        peak        max bytes allocated by Python during the span, above the amount at its start (tracemalloc)
+        retained    bytes allocated during the span and still alive at its end (tracemalloc)
+        traced      bytes allocated by Python at the end of the span (tracemalloc)
+        rss         resident set size at the end of the span
+        rss_peak    max RSS sampled during the span - includes memory of C libraries (Graphviz, numpy...)
+        types       with `types=True`, change of live Node, Edge, DataFrame and Counter objects during the span
+
+    tracemalloc slows allocations down a few times, so it should be used for diagnosis, not in production.
+    """
+    def __init__(self, types=False, rss_interval=0.01):
+        self.types = types
+        self.rss_interval = rss_interval
+        self._started_tracemalloc = False
+        self._active: List[Span] = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._sampler = None
+
+    def start(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracemalloc = True
+        if self.rss_interval:
+            self._sampler = threading.Thread(target=self._sample, daemon=True)
+            self._sampler.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._sampler is not None:
+            self._sampler.join()
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+
+    def _sample(self):
+        while not self._stop.wait(self.rss_interval):
+            rss = _rss()
+            with self._lock:
+                for span in self._active:
+                    span.memory['rss_peak'] = max(span.memory['rss_peak'], rss)
+
+    def enter(self, span: Span):
+        # before reading traced memory, so temporary objects of the counting don't make the peak
+        types_start = self.types and memory_by_type()
+        current, peak = tracemalloc.get_traced_memory()
+        rss = _rss()
+        with self._lock:
+            # peak is reset for the new span, so parents remember what they have seen so far
+            for active in self._active:
+                active.memory['_peak_seen'] = max(active.memory['_peak_seen'], peak)
+            span.memory = {'rss_peak': rss, '_peak_seen': 0}
+            self._active.append(span)
+        tracemalloc.reset_peak()
+        span._memory_start = (current, types_start)
+
+    def exit(self, span: Span):
+        current, peak = tracemalloc.get_traced_memory()
+        rss = _rss()
+        start, types_start = span._memory_start
+        with self._lock:
+            self._active.remove(span)
+            for active in self._active:
+                active.memory['_peak_seen'] = max(active.memory['_peak_seen'], peak)
+        memory = span.memory
+        memory['peak'] = max(peak, memory.pop('_peak_seen')) - start
+        memory['retained'] = current - start
+        memory['traced'] = current
+        memory['rss'] = rss
+        memory['rss_peak'] = max(memory['rss_peak'], rss)
+        if types_start:
+            types_end = memory_by_type()
+            memory['types'] = {name: {key: value - types_start[name][key] for key, value in values.items()}
+                               for name, values in types_end.items()}
+
+
+def enable_memory(types=False, rss_interval=0.01):
+    """
+    Adds memory usage to all spans (see `MemoryTracker`). Spans are still emitted only to enabled sinks.
+
+    :param types: count live Node, Edge, DataFrame and Counter objects at start and end of every span (slow)
+    :param rss_interval: seconds between RSS samples, 0 disables the sampling thread
+    """
+    global _memory
+    disable_memory()
+    _memory = MemoryTracker(types, rss_interval)
+    _memory.start()
+
+
+def is_memory_enabled() -> bool:
+    return _memory is not None
+
+
+def disable_memory():
+    global _memory
+    if _memory is not None:
+        _memory.stop()
+        _memory = None
+
+
+def enable(*sinks: Sink):
+    """
+    Starts sending spans to given sinks, in addition to already enabled ones
+    """
+    _sinks.extend(sinks)
+
+
+def disable():
+    """
+    Stops instrumentation and closes all sinks
+    """
+    for sink in _sinks:
+        sink.close()
+    _sinks.clear()
+
+
+def is_enabled() -> bool:
+    return bool(_sinks)
+
+
+def span(name: str, **counts) -> Union[Span, _NullSpan]:
+    """
+    Context manager measuring a block of code:
+
+        with span('mining', nodes=len(network.nodes)) as s:
+            ...
+            s.count(gates=inserted)
+    """
+    if not _sinks and name not in _profilers:
+        return _NULL_SPAN
+    return Span(name, counts)
+
+
+def instrumented(name: str = None, counts: Callable[..., Dict[str, Any]] = None):
+    """
+    Decorator emitting a span for every call of the function
+
+    :param name: span name, `module.function` by default
+    :param counts: called as `counts(result, *args, **kwargs)` after the function returns,
+        should return item counts of the span. Called only when instrumentation is enabled
+    """
+    def decorator(func):
+        span_name = name or f'{func.__module__}.{func.__qualname__}'
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _sinks and span_name not in _profilers:
+                return func(*args, **kwargs)
+            with Span(span_name) as s:
+                result = func(*args, **kwargs)
+                if counts is not None:
+                    s.count(**counts(result, *args, **kwargs))
+            return result
+
+        return wrapper
+
+    return decorator
+
+
+def profile_stage(name: str) -> cProfile.Profile:
+    """
+    Attaches cProfile to all spans called `name`, even if no sink is enabled.
+    Only one stage can be profiled at a time.
+
+    :return: profiler, e.g. for `pstats.Stats(profiler).sort_stats('cumulative').print_stats(20)`
+        or `profiler.dump_stats(path)`
+    """
+    _profilers.clear()
+    profiler = _profilers[name] = cProfile.Profile()
+    return profiler
+
+
+def stop_profiling():
+    _profilers.clear()
+
+
+def network_counts(network, *args, **kwargs) -> Dict[str, int]:
+    """
+    `counts` function for stages returning a network
+    """
+    from network import NodeType
+
+    return {'nodes': len(network.nodes),
+            'edges': sum(len(targets) for targets in network.edges.values()),
+            'gates': sum(1 for node in network.nodes.values() if node.type == NodeType.UTILITY)}
@@ -0,0 +1,93 @@
+"""
+Log-level filters - remove rare behaviour from the log itself, before the network is built.
+
+All filters work on unique variants with their case counts, so each one costs O(variants)
+instead of O(events). Direct succession, event counts and start/end events of the result
+are then recomputed from surviving variants, without reading the file again.
+"""
+from __future__ import annotations
+
+from typing import Iterable, List, Tuple, Union
+
+from import_handler import Result, CsvResult, from_variants
+
+
+class VariantIndex:
+    def __init__(self, variants: Iterable[Tuple[Tuple[str, ...], int]]):
+        # the most frequent first
+        self.variants: List[Tuple[Tuple[str, ...], int]] = sorted(
+            ((tuple(trace), count) for trace, count in variants), key=lambda v: v[1], reverse=True)
+        self.activity_sets = [frozenset(trace) for trace, _ in self.variants]
+
+    @classmethod
+    def from_result(cls, import_result: Result) -> VariantIndex:
+        return cls(import_result.get_variants())
+
+    def total_cases(self) -> int:
+        return sum(count for _, count in self.variants)
+
+    def _select(self, indices: Iterable[int]) -> VariantIndex:
+        selected = VariantIndex.__new__(VariantIndex)
+        indices = list(indices)
+        selected.variants = [self.variants[i] for i in indices]
+        selected.activity_sets = [self.activity_sets[i] for i in indices]
+        return selected
+
+    def top(self, n: int) -> VariantIndex:
+        """
+        Keeps `n` most frequent variants
+        """
+        return self._select(range(min(n, len(self.variants))))
+
+    def covering(self, coverage: float) -> VariantIndex:
+        """
+        Keeps the smallest set of most frequent variants, which covers `coverage` (0..1) of cases
+        """
+        required = coverage * self.total_cases()
+        covered = 0
+        kept = 0
+        while kept < len(self.variants) and covered < required:
+            covered += self.variants[kept][1]
+            kept += 1
+        return self._select(range(kept))
+
+    def with_length(self, min_length: int = None, max_length: int = None) -> VariantIndex:
+        """
+        Keeps variants with number of events in <min_length, max_length>, None means no limit
+        """
+        return self._select(i for i, (trace, _) in enumerate(self.variants)
+                            if (min_length is None or len(trace) >= min_length)
+                            and (max_length is None or len(trace) <= max_length))
+
+    def with_activities(self, required: Iterable[str] = (), forbidden: Iterable[str] = ()) -> VariantIndex:
+        """
+        Keeps variants containing all `required` activities and none of `forbidden` ones
+        """
+        required = frozenset(required)
+        forbidden = frozenset(forbidden)
+        return self._select(i for i, activities in enumerate(self.activity_sets)
+                            if required <= activities and forbidden.isdisjoint(activities))
+
+    def to_result(self) -> CsvResult:
+        return from_variants(self.variants)
+
+
+def _index(log: Union[Result, VariantIndex]) -> VariantIndex:
+    return log if isinstance(log, VariantIndex) else VariantIndex.from_result(log)
+
+
+def top_variants(log: Union[Result, VariantIndex], n: int) -> CsvResult:
+    return _index(log).top(n).to_result()
+
+
+def variants_covering(log: Union[Result, VariantIndex], coverage: float) -> CsvResult:
+    return _index(log).covering(coverage).to_result()
+
+
+def filter_trace_length(log: Union[Result, VariantIndex], min_length: int = None, max_length: int = None) -> CsvResult:
+    return _index(log).with_length(min_length, max_length).to_result()
+
+
+def filter_activities(log: Union[Result, VariantIndex], required: Iterable[str] = (),
+                      forbidden: Iterable[str] = ()) -> CsvResult:
+    return _index(log).with_activities(required, forbidden).to_result()
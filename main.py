@@ -1,22 +1,23 @@
-import examples
-import matplotlib.pyplot as plt
+import sys
 
-if __name__ == '__main__':
-    print('Hello!')
-
-    # examples.lab1_repair_example()      # OK
-    # examples.lab2_example()             # OK
-    # examples.lab2_ex1()                 # OK
-    # examples.lab2_ex2()                   # OK
+import cli
 
-    for i in range(1, 10):
-        # examples.lab2_setA(i)
-        examples.lab3_setB(i)
-        examples.lab3_setB_nofilter(i)
+if __name__ == '__main__':
+    # Single examples are in `examples` module, e.g. examples.lab2_example()
+    # Sets A and B are run by the command line runner, for example:
+    #   python main.py data/A*.csv --sep ';' --pipeline alpha
+    #   python main.py data/B*.csv --pipeline filtered --dependency-threshold 0.9
+    # Run without arguments it does the same as the old loop over set B: filtered (0.9 for 4, 5, 6, 8, 9)
+    # and without filtering, into results/nofilter
+    if len(sys.argv) > 1:
+        sys.exit(cli.main())
 
-    # examples.loop1()
-    # examples.loop2()
-    # examples.loop3()
+    exit_code = cli.main(['data/B1.csv', 'data/B2.csv', 'data/B3.csv', 'data/B7.csv',
+                          '--pipeline', 'filtered', '--with-numbers', '--summary', 'results/summary_B.json'])
+    exit_code |= cli.main(['data/B4.csv', 'data/B5.csv', 'data/B6.csv', 'data/B8.csv', 'data/B9.csv',
+                           '--pipeline', 'filtered', '--dependency-threshold', '0.9', '--with-numbers',
+                           '--summary', 'results/summary_B_filtered.json'])
+    exit_code |= cli.main(['data/B*.csv', '--pipeline', 'alpha', '--with-numbers', '--output-dir', 'results/nofilter'])
 
     """
     Zestaw A:
@@ -44,4 +45,4 @@ if __name__ == '__main__':
     9 - 
     """
 
-    plt.show()
+    sys.exit(exit_code)
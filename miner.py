@@ -1,7 +1,12 @@
+import os
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
 from copy import deepcopy
+from typing import List, Set, Tuple, Dict, Optional
 
 from bpmn_network import NodeKind, BPMNNetwork, UtilityNode, NodeFunction
-from network import NodeType, Edge
+from instrumentation import instrumented, network_counts
+from network import NodeType, Edge, Node
 
 
 def patch_gate_to_gate(net: BPMNNetwork):
@@ -53,6 +58,13 @@ def patch_gate_to_gate(net: BPMNNetwork):
                 break
 
 
+def _mined_counts(mined: BPMNNetwork, network: BPMNNetwork, *args, **kwargs):
+    counts = network_counts(mined)
+    counts['gates_inserted'] = counts['gates'] - network_counts(network)['gates']
+    return counts
+
+
+@instrumented(counts=_mined_counts)
 def alpha_miner(network: BPMNNetwork) -> BPMNNetwork:
     """
     Alpha miner taki sam jak u nas w Lab 2
@@ -61,6 +73,73 @@ def alpha_miner(network: BPMNNetwork) -> BPMNNetwork:
     :return: Zwraca nowa siec z bramami
     """
     net = deepcopy(network)
+    parallelisms = _insert_gates(net)
+
+    update_end_events(net, parallelisms)
+    update_start_events(net, parallelisms)
+
+    return net
+
+
+@instrumented(counts=_mined_counts)
+def alpha_miner_parallel(network: BPMNNetwork, workers: int = None) -> BPMNNetwork:
+    """
+    Same as `alpha_miner`, but every weakly connected component of the network
+    is mined separately in a process pool. Sub-networks are then stitched back together
+    and start/end gates are inserted for the whole network at once.
+
+    :param network: network to mine, it is not modified
+    :param workers: number of worker processes, None means CPU count. If 1, components are mined in current process
+    :return: new network with gates
+    """
+    components = network.weakly_connected_components()
+    if len(components) <= 1:
+        return alpha_miner(network)
+
+    states = [network.get_state(component) for component in components]
+    if workers == 1:
+        results = list(map(_mine_state, states))
+    else:
+        chunksize = max(1, len(states) // ((workers or os.cpu_count() or 1) * 4))
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_mine_state, states, chunksize=chunksize))
+
+    return _stitch(results)
+
+
+def _mine_state(state) -> Tuple[tuple, List[Set[str]]]:
+    """
+    Process pool worker - mines single component without start/end gates
+    Parallelisms are returned as node names, because nodes don't survive the process boundary
+    """
+    net = BPMNNetwork.from_state(state)
+    parallelisms = _insert_gates(net)
+    return net.get_state(), [set(n.name for n in p) for p in parallelisms]
+
+
+def _stitch(results: List[Tuple[tuple, List[Set[str]]]]) -> BPMNNetwork:
+    nodes, edges, parallelism_names = [], [], []
+    for (component_nodes, component_edges), component_parallelisms in results:
+        nodes += component_nodes
+        edges += component_edges
+        parallelism_names += component_parallelisms
+
+    net = BPMNNetwork.from_state((nodes, edges))
+    parallelisms = [set(net.nodes[name] for name in p) for p in parallelism_names]
+
+    update_end_events(net, parallelisms)
+    update_start_events(net, parallelisms)
+
+    return net
+
+
+def _insert_gates(net: BPMNNetwork) -> List[Set[Node]]:
+    """
+    Mining itself, modifies provided network in place.
+    Start and end events are left untouched, so they can be handled for whole network later.
+
+    :return: detected parallelisms (sets of parallel events)
+    """
     patch_gate_to_gate(net)
     net.process_short_loops()
 
@@ -133,10 +212,7 @@ def alpha_miner(network: BPMNNetwork) -> BPMNNetwork:
     for d in dummies:
         net.delete_node_merge_edges(d)
 
-    update_end_events(net, parallelisms)
-    update_start_events(net, parallelisms)
-
-    return net
+    return parallelisms
 
 
 def update_start_events(net: BPMNNetwork, parallelisms=None):
@@ -180,3 +256,250 @@ def update_end_events(net: BPMNNetwork, parallelisms=None):
         ev.remove_all_successors()
         # ev.cnt is not really correct
         net.add_edge(ev.name, gate.name, ev.cnt)
+
+
+def diff_direct_succession(old: Dict[str, Dict[str, int]], new: Dict[str, Dict[str, int]]) -> Dict[str, Counter]:
+    """
+    Computes count changes between two direct successions (e.g. `Result.direct_succession`)
+
+    :return: dict event -> Counter successor -> count change, unchanged pairs are omitted
+    """
+    diff = dict()
+    for event in old.keys() | new.keys():
+        changes = Counter()
+        old_successors = old.get(event, {})
+        new_successors = new.get(event, {})
+        for successor in old_successors.keys() | new_successors.keys():
+            delta = new_successors.get(successor, 0) - old_successors.get(successor, 0)
+            if delta != 0:
+                changes[successor] = delta
+        if changes:
+            diff[event] = changes
+
+    return diff
+
+
+class IncrementalMiner:
+    """
+    Keeps direct succession network together with its mined version, so that small changes
+    of direct-follows counts don't need mining everything again.
+
+    Mining doesn't depend on counts, so count-only changes are applied in place to the mined network,
+    except for relations going through loop gates - loop gate edges hold counts of several relations
+    (e.g. short loop skip and loop exit), so their components are mined again.
+    Edges appearing or disappearing change structure - only weakly connected components
+    touched by them are mined again, unless they cover more than `max_changed_fraction` of events.
+    """
+    def __init__(self, network: BPMNNetwork, max_changed_fraction=0.25, workers: int = 1):
+        """
+        :param network: direct succession network (before mining), it is copied
+        :param max_changed_fraction: above this fraction of changed events whole network is mined again
+        :param workers: process pool size used for mining components, see `alpha_miner_parallel`
+        """
+        self.source = deepcopy(network)
+        self.max_changed_fraction = max_changed_fraction
+        self.workers = workers
+        self.network: BPMNNetwork = None
+
+        self._component_of: Dict[str, int] = dict()  # source event -> component id
+        self._mined_nodes: Dict[int, Set[str]] = dict()  # component id -> node names in mined network
+        self._parallelisms: Dict[int, List[Set[str]]] = dict()
+        self._next_component_id = 0
+
+        self._mine_all()
+
+    def update(self, diff: Dict[str, Dict[str, int]],
+               event_counter_diff: Dict[str, int] = None,
+               start_events: Set[str] = None,
+               end_events: Set[str] = None) -> Set[str]:
+        """
+        Applies changes to the source network and updates mined network.
+
+        :param diff: event -> successor -> count change, see `diff_direct_succession`
+        :param event_counter_diff: event -> count change
+        :param start_events: new set of start events, unchanged if None
+        :param end_events: new set of end events, unchanged if None
+        :return: names of source events which were mined again
+        """
+        changed_events = set()
+        count_changes = []
+        for src, successors in diff.items():
+            for target, delta in successors.items():
+                for name in (src, target):
+                    if name not in self.source.nodes:
+                        self.source.add_node(name)
+                        changed_events.add(name)
+
+                edge = self.source.edges.get(src, {}).get(target)
+                if edge is None:
+                    if delta > 0:
+                        self.source.add_edge(src, target, delta)
+                        changed_events.update((src, target))
+                elif edge.cnt + delta <= 0:
+                    self.source.delete_edge(edge)
+                    changed_events.update((src, target))
+                else:
+                    edge.cnt += delta
+                    count_changes.append((src, target, delta))
+
+        for flag, names in (('is_start_node', start_events), ('is_end_node', end_events)):
+            if names is None:
+                continue
+            for node in self.source.nodes.values():
+                if getattr(node, flag) != (node.name in names):
+                    setattr(node, flag, node.name in names)
+                    changed_events.add(node.name)
+
+        # before mining again, start/end gates built by it take their edge counts from events
+        self._update_event_counts(event_counter_diff)
+
+        affected_components = set(self._component_of[name] for name in changed_events if name in self._component_of)
+
+        # edges of loop gates hold counts of several relations, such changes are structural
+        count_paths = []
+        for src, target, delta in count_changes:
+            component = self._component_of.get(src)
+            if component in affected_components:
+                continue
+            path = _mined_path(self.network, src, target)
+            if path is None:
+                affected_components.add(component)
+            else:
+                count_paths.append((path, delta))
+
+        affected_events = set(name for name, c in self._component_of.items() if c in affected_components)
+        affected_events |= changed_events
+
+        if len(affected_events) > self.max_changed_fraction * len(self.source.nodes):
+            self._mine_all()
+            return set(self.source.nodes.keys())
+
+        for path, delta in count_paths:
+            for edge in path:
+                edge.cnt += delta
+
+        if affected_events:
+            self._remine(affected_components, affected_events)
+
+        return affected_events
+
+    def _mine_all(self):
+        self._component_of.clear()
+        self._mined_nodes.clear()
+        self._parallelisms.clear()
+
+        components = self.source.weakly_connected_components()
+        results = self._mine_components(self.source, components)
+        self.network = _stitch([r for _, r in results])
+        for component, ((node_table, _), parallelism_names) in results:
+            self._register_component(component, node_table, parallelism_names)
+
+    def _remine(self, affected_components: Set[int], affected_events: Set[str]):
+        net = self.network
+
+        # global gates have to be built again, unaffected start/end events get their flags back
+        for gate_name, flag, neighbours in (('start_split_gate', 'is_start_node', 'successors'),
+                                            ('end_merge_gate', 'is_end_node', 'predecessors')):
+            if gate_name in net.nodes:
+                gate = net.nodes[gate_name]
+                for node in getattr(gate, neighbours):
+                    setattr(node, flag, True)
+                net.delete_node(gate)
+
+        for component_id in affected_components:
+            for name in self._mined_nodes.pop(component_id):
+                net.edges.pop(name, None)
+                del net.nodes[name]
+            del self._parallelisms[component_id]
+        for name in affected_events:
+            self._component_of.pop(name, None)
+
+        # affected events may have been split into several components or joined into one
+        part = BPMNNetwork.from_state(self.source.get_state(self.source.nodes[name] for name in affected_events))
+        results = self._mine_components(part, part.weakly_connected_components())
+        for component, (state, parallelism_names) in results:
+            net.add_state(state)
+            self._register_component(component, state[0], parallelism_names)
+
+        parallelisms = [set(net.nodes[name] for name in p) for ps in self._parallelisms.values() for p in ps]
+        update_end_events(net, parallelisms)
+        update_start_events(net, parallelisms)
+
+    def _mine_components(self, network: BPMNNetwork, components: List[Set[Node]]):
+        states = [network.get_state(component) for component in components]
+        if self.workers == 1 or len(states) <= 1:
+            results = list(map(_mine_state, states))
+        else:
+            with ProcessPoolExecutor(max_workers=self.workers) as pool:
+                results = list(pool.map(_mine_state, states))
+
+        return list(zip(([n.name for n in c] for c in components), results))
+
+    def _register_component(self, event_names: List[str], node_table, parallelism_names: List[Set[str]]):
+        component_id = self._next_component_id
+        self._next_component_id += 1
+        for name in event_names:
+            self._component_of[name] = component_id
+        self._mined_nodes[component_id] = set(attrs['name'] for _, attrs in node_table)
+        self._parallelisms[component_id] = parallelism_names
+
+    def _update_event_counts(self, event_counter_diff: Dict[str, int]):
+        """
+        Adds count changes to events of both networks and to edges of start/end gates, which hold event counts
+        """
+        if not event_counter_diff:
+            return
+        for name, delta in event_counter_diff.items():
+            for net in (self.source, self.network):
+                if name in net.nodes and not isinstance(net.nodes[name], UtilityNode):
+                    net.nodes[name].cnt += delta
+            for src, target in (('start_split_gate', name), (name, 'end_merge_gate')):
+                edge = self.network.edges.get(src, {}).get(target)
+                if edge is not None:
+                    edge.cnt += delta
+
+
+_LOOP_GATE_PREFIXES = ('self_loop_', 'shortloop_', 'twoloop_')
+
+
+def _is_loop_gate(node: Node) -> bool:
+    return isinstance(node, UtilityNode) and \
+        (node.function == NodeFunction.LOOP_GATE or node.name.startswith(_LOOP_GATE_PREFIXES))
+
+
+def _mined_path(net: BPMNNetwork, src: str, target: str) -> Optional[List[Edge]]:
+    """
+    Finds edges of relation src->target in mined network. Mining could have put gates between
+    these events, then it is path src->gate(s)->target.
+
+    :return: edges on the path, empty if the relation was consumed by mining (e.g. parallel events),
+        None if the path goes through a loop gate
+    """
+    if src not in net.nodes or target not in net.nodes:
+        return []
+
+    # BFS through non-event nodes only
+    came_from = {net.nodes[src]: None}
+    queue = deque([net.nodes[src]])
+    while queue:
+        node = queue.popleft()
+        for successor in node.successors:
+            if successor in came_from:
+                continue
+            came_from[successor] = node
+            if successor.name == target:
+                queue.clear()
+                break
+            if successor.type != NodeType.EVENT:
+                queue.append(successor)
+
+    node = net.nodes[target]
+    if node not in came_from:
+        return []
+    path = []
+    while came_from[node] is not None:
+        if _is_loop_gate(node) or _is_loop_gate(came_from[node]):
+            return None
+        path.append(net.edges[came_from[node].name][node.name])
+        node = came_from[node]
+    return path[::-1]
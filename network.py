@@ -1,7 +1,8 @@
 from __future__ import annotations
 
+from collections import deque
 from enum import Enum
-from typing import List, Dict, Set, Union
+from typing import List, Dict, Set, Union, Iterable, Tuple, Any
 
 
 class NodeType(Enum):
@@ -10,7 +11,18 @@ class NodeType(Enum):
     DUMMY = 2  # dummy node, not drawable
 
 
+# assigning these node attributes changes relations between nodes
+_VERSIONED_ATTRIBUTES = {'successors', 'predecessors', 'type'}
+
+
 class Node:
+    def __setattr__(self, name, value):
+        if name in _VERSIONED_ATTRIBUTES:
+            network = self.__dict__.get('network')
+            if network is not None:
+                network.version += 1
+        object.__setattr__(self, name, value)
+
     def __init__(self, network: Network, name: str, cnt: int = 0, is_start=False, is_end=False, and_paralleled_with=None, is_self_looped=False, is_in_two_loop_main=False, in_two_loop_feedback_with=None):
         self.network = network
         self.name = name
@@ -103,6 +115,7 @@ class Node:
 
         successor_to_remove.predecessors.remove(self)
         self.successors.remove(successor_to_remove)
+        self.network.version += 1
 
     def remove_predecessor(self, predecessor_to_remove: Node):
         if predecessor_to_remove not in self.predecessors:
@@ -110,6 +123,7 @@ class Node:
 
         predecessor_to_remove.successors.remove(self)
         self.predecessors.remove(predecessor_to_remove)
+        self.network.version += 1
 
     def remove_all_successors(self):
         for successor in set(self.successors):
@@ -143,6 +157,10 @@ class Edge:
 
 class Network:
     def __init__(self):
+        # Incremented by every structural change, used to invalidate cached queries.
+        # Network methods and assigning node `successors`/`predecessors` do it automatically,
+        # code modifying these sets in place has to do it on its own.
+        self.version = 0
         self.nodes: Dict[str, Node] = {}
         self.edges: Dict[str, Dict[str, Edge]] = {}
 
@@ -173,6 +191,7 @@ class Network:
 
         src_node.successors.add(target_node)
         target_node.predecessors.add(src_node)
+        self.version += 1
         if src not in self.edges:
             self.edges[src] = {}
         self.edges[src][target] = Edge(self, src_node, target_node, cnt)
@@ -192,16 +211,155 @@ class Network:
         """
         return set(x for x in self.nodes.values() if x.is_end_node)
 
+    def weakly_connected_components(self) -> List[Set[Node]]:
+        """
+        Splits network into groups of nodes connected by edges of any direction.
+        Components are ordered by their first node in `self.nodes`
+        """
+        components = []
+        visited = set()
+        for start in self.nodes.values():
+            if start in visited:
+                continue
+
+            component = {start}
+            visited.add(start)
+            queue = deque([start])
+            while queue:
+                node = queue.popleft()
+                for neighbour in (*node.successors, *node.predecessors):
+                    if neighbour not in visited:
+                        visited.add(neighbour)
+                        component.add(neighbour)
+                        queue.append(neighbour)
+            components.append(component)
+
+        return components
+
+    def strongly_connected_components(self) -> List[Set[Node]]:
+        """
+        Finds groups of nodes reachable from each other (Tarjan's algorithm, iterative)
+        """
+        index = {}
+        low = {}
+        stack = []
+        on_stack = set()
+        components = []
+        for root in self.nodes.values():
+            if root in index:
+                continue
+
+            index[root] = low[root] = len(index)
+            stack.append(root)
+            on_stack.add(root)
+            work = [(root, iter(root.successors))]
+            while work:
+                node, successors = work[-1]
+                for successor in successors:
+                    if successor not in index:
+                        index[successor] = low[successor] = len(index)
+                        stack.append(successor)
+                        on_stack.add(successor)
+                        work.append((successor, iter(successor.successors)))
+                        break
+                    elif successor in on_stack:
+                        low[node] = min(low[node], index[successor])
+                else:
+                    work.pop()
+                    if work:
+                        parent = work[-1][0]
+                        low[parent] = min(low[parent], low[node])
+                    if low[node] == index[node]:
+                        component = set()
+                        while True:
+                            member = stack.pop()
+                            on_stack.remove(member)
+                            component.add(member)
+                            if member is node:
+                                break
+                        components.append(component)
+
+        return components
+
+    def get_state(self, nodes: Iterable[Node] = None) -> Tuple[List[Tuple[type, Dict[str, Any]]], List[Tuple[str, str, Any, bool]]]:
+        """
+        Flattens network (or its part) into plain node and edge tables.
+        Unlike pickling whole network, it does not recurse through node connections,
+        so it's safe to send it between processes.
+
+        :param nodes: nodes to include, all nodes if None. Only edges between included nodes are kept
+        :return: tuple (nodes, edges) where nodes are (class, attributes) and edges are (src, target, cnt, is_filtered_out)
+        """
+        nodes = list(self.nodes.values()) if nodes is None else list(nodes)
+        included = set(nodes)
+
+        node_table = []
+        edge_table = []
+        for node in nodes:
+            attrs = {k: v for k, v in node.__dict__.items() if k not in ('network', 'successors', 'predecessors')}
+            node_table.append((type(node), attrs))
+            for successor in node.successors:
+                if successor in included:
+                    edge = self.edges[node.name][successor.name]
+                    edge_table.append((node.name, successor.name, edge.cnt, edge.is_filtered_out))
+
+        return node_table, edge_table
+
+    @classmethod
+    def from_state(cls, state) -> Network:
+        """
+        Builds new network from tables returned by `get_state()`
+        """
+        network = cls()
+        network.add_state(state)
+        return network
+
+    def add_state(self, state):
+        """
+        Adds nodes and edges from tables returned by `get_state()` to this network.
+        Node names must not collide with existing ones.
+        """
+        node_table, edge_table = state
+        for node_cls, attrs in node_table:
+            node = node_cls.__new__(node_cls)
+            node.__dict__.update(attrs)
+            node.network = self
+            node.successors = set()
+            node.predecessors = set()
+            self.nodes[node.name] = node
+
+        for src, target, cnt, is_filtered_out in edge_table:
+            self.add_edge(src, target, cnt)
+            self.edges[src][target].is_filtered_out = is_filtered_out
+
     def delete_node(self, node: Node):
         node.remove_all_successors()
         node.remove_all_predecessors()
 
-        del self.edges[node.name]
+        self.edges.pop(node.name, None)  # nodes without successors may have no entry
         for edge_list in self.edges.values():
             if node.name in edge_list:
                 del edge_list[node.name]
 
         del self.nodes[node.name]
+        self.version += 1
+
+    def delete_nodes(self, nodes: Iterable[Node]):
+        """
+        Deletes many nodes at once, in O(V + E) total instead of O(V) per node as in `delete_node`
+        """
+        names = set()
+        for node in list(nodes):
+            node.remove_all_successors()
+            node.remove_all_predecessors()
+            self.edges.pop(node.name, None)
+            del self.nodes[node.name]
+            names.add(node.name)
+
+        for edge_list in self.edges.values():
+            for name in names.intersection(edge_list.keys()):
+                del edge_list[name]
+        self.version += 1
 
     def delete_edge(self, edge: Edge):
         edge.src.remove_successor(edge.target)
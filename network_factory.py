@@ -3,6 +3,7 @@ from typing import Dict, Set, List, Tuple
 
 from bpmn_network import BPMNNetwork
 from import_handler import Result, CsvResult
+from instrumentation import instrumented, network_counts
 
 
 def from_simple_direct_succession(direct_succession: Dict[str, Set[str]]) -> BPMNNetwork:
@@ -17,6 +18,7 @@ def from_simple_direct_succession(direct_succession: Dict[str, Set[str]]) -> BPM
     return network
 
 
+@instrumented(counts=network_counts)
 def from_counter_direct_succession(direct_succession: Dict[str, Counter],
                                    event_counter: Dict[str, int] = None) -> BPMNNetwork:
     network = BPMNNetwork()
@@ -34,6 +36,7 @@ def from_counter_direct_succession(direct_succession: Dict[str, Counter],
     return network
 
 
+@instrumented(counts=network_counts)
 def from_importer(import_result: Result, import_start_end_events=False, autodetect_start_end_events=False) -> BPMNNetwork:
     assert not (import_start_end_events and autodetect_start_end_events), \
         "Choose either importing start/end events or autodetection. You cannot select both!"
@@ -54,6 +57,7 @@ def from_importer(import_result: Result, import_start_end_events=False, autodete
     return network
 
 
+@instrumented(counts=network_counts)
 def from_filtered_import(import_res: Result, filtered_direct_succession: Dict[str, Dict[str, float]], filtered_out_two_loop: Dict[str, Dict[str, float]],
                          parallel_tuples: List[Tuple[str, str]], self_loop_events: List[str]):
     network = BPMNNetwork()
@@ -0,0 +1,305 @@
+"""
+Declarative pipeline with memoized stages.
+
+Stages declare which stages they take outputs from and which parameters they use:
+
+    pipeline = Pipeline() \\
+        .stage('import', import_stage, params=('path', 'sep')) \\
+        .stage('network', network_factory.from_importer, inputs=('import',)) \\
+        ...
+    result = pipeline.run(path='data/B1.csv', dependency_threshold=0.9)
+    result['render']
+
+Key of a stage output is a hash of the stage, its parameter values and keys of its inputs, so after
+changing one parameter only the stages depending on it (directly or through inputs) are computed again.
+Outputs are kept in memory (LRU) and optionally pickled to `cache_dir`. Files given as parameters
+are identified by path, size and modification time.
+
+Stage functions get outputs of `inputs` as positional arguments and `params` as keyword arguments,
+parameters not given to `run()` take defaults of the function. Stage functions must not modify their inputs,
+cached objects are shared between runs.
+"""
+from __future__ import annotations
+
+import hashlib
+import inspect
+import json
+import os
+import pickle
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+import instrumentation
+import serialization
+from network import Network
+
+
+class Stage(NamedTuple):
+    name: str
+    func: Callable
+    inputs: Tuple[str, ...] = ()
+    params: Tuple[str, ...] = ()
+
+
+class StageRun(NamedTuple):
+    seconds: float
+    cached: Optional[str]  # None if computed, 'memory' or 'disk' if loaded from cache
+    key: str
+    memory: Optional[Dict[str, Any]] = None  # see `instrumentation.MemoryTracker`
+
+
+class PipelineResult:
+    def __init__(self, outputs: Dict[str, Any], stages: Dict[str, StageRun]):
+        self.outputs = outputs
+        self.stages = stages
+
+    def __getitem__(self, stage: str):
+        return self.outputs[stage]
+
+    @property
+    def seconds(self) -> float:
+        return sum(run.seconds for run in self.stages.values())
+
+    def summary(self) -> Dict[str, Any]:
+        """
+        :return: JSON serializable timings (and memory, if measured) of stages
+        """
+        return {name: {key: value for key, value in run._asdict().items() if value is not None}
+                for name, run in self.stages.items()}
+
+
+class Pipeline:
+    def __init__(self, cache_dir: str = None, max_cached=64):
+        """
+        :param cache_dir: if set, stage outputs are also pickled there and reused by other processes and runs
+        :param max_cached: number of stage outputs kept in memory, the least recently used ones are dropped
+        """
+        self.stages: Dict[str, Stage] = dict()
+        self.cache_dir = cache_dir
+        self.max_cached = max_cached
+        self._cache: OrderedDict[str, Any] = OrderedDict()
+
+    def stage(self, name: str, func: Callable, inputs: Iterable[str] = (), params: Iterable[str] = ()) -> Pipeline:
+        """
+        Adds a stage, its inputs have to be added before
+
+        :return: self, for chaining
+        """
+        inputs = tuple(inputs)
+        for input_name in inputs:
+            if input_name not in self.stages:
+                raise ValueError(f'Stage {name}: unknown input stage {input_name}')
+        self.stages[name] = Stage(name, func, inputs, tuple(params))
+        return self
+
+    def run(self, *targets: str, memory=False, **params) -> PipelineResult:
+        """
+        Computes `targets` (all stages by default) and stages they depend on
+
+        :param memory: measure memory of computed stages (it is slower)
+        :param params: parameters of stages
+        :return: outputs of computed stages with their timings
+        """
+        needed = self._needed(targets or tuple(self.stages.keys()))
+
+        own_memory = memory and not instrumentation.is_memory_enabled()
+        if own_memory:
+            instrumentation.enable_memory()
+
+        outputs = dict()
+        runs = dict()
+        keys = dict()
+        try:
+            for stage in self.stages.values():
+                if stage.name not in needed:
+                    continue
+                stage_params = self._params(stage, params)
+                keys[stage.name] = key = self._key(stage, stage_params, [keys[i] for i in stage.inputs])
+
+                start = time.perf_counter()
+                output, cached = self._load(key)
+                span_memory = None
+                if cached is None:
+                    # real span is needed to get memory, even without any sink
+                    span = instrumentation.Span if memory else instrumentation.span
+                    with span(f'pipeline.{stage.name}') as stage_span:
+                        output = stage.func(*[outputs[i] for i in stage.inputs], **stage_params)
+                    span_memory = getattr(stage_span, 'memory', None)
+                    self._store(key, output)
+                outputs[stage.name] = output
+                runs[stage.name] = StageRun(time.perf_counter() - start, cached, key, span_memory)
+        finally:
+            if own_memory:
+                instrumentation.disable_memory()
+
+        return PipelineResult({name: outputs[name] for name in (targets or outputs.keys())}, runs)
+
+    def clear_cache(self):
+        """
+        Clears memory cache, files in `cache_dir` are kept
+        """
+        self._cache.clear()
+
+    def _needed(self, targets: Iterable[str]) -> set:
+        needed = set()
+        pending = list(targets)
+        while pending:
+            name = pending.pop()
+            if name not in self.stages:
+                raise ValueError(f'Unknown stage {name}')
+            if name not in needed:
+                needed.add(name)
+                pending.extend(self.stages[name].inputs)
+        return needed
+
+    @staticmethod
+    def _params(stage: Stage, params: Dict[str, Any]) -> Dict[str, Any]:
+        signature = inspect.signature(stage.func).parameters
+        values = dict()
+        for name in stage.params:
+            if name in params:
+                values[name] = params[name]
+            elif name in signature and signature[name].default is not inspect.Parameter.empty:
+                values[name] = signature[name].default
+            else:
+                raise ValueError(f'Stage {stage.name}: missing parameter {name}')
+        return values
+
+    @staticmethod
+    def _key(stage: Stage, params: Dict[str, Any], input_keys: List[str]) -> str:
+        description = [stage.name, f'{stage.func.__module__}.{stage.func.__qualname__}',
+                       {name: _fingerprint(value) for name, value in params.items()}, input_keys]
+        return hashlib.sha256(json.dumps(description, sort_keys=True, default=repr).encode()).hexdigest()[:32]
+
+    def _load(self, key: str) -> Tuple[Any, Optional[str]]:
+        if key in self._cache:
+            self._cache.move_to_end(key)
+            return self._cache[key], 'memory'
+        if self.cache_dir is not None:
+            path = os.path.join(self.cache_dir, f'{key}.pkl')
+            if os.path.exists(path):
+                with open(path, 'rb') as f:
+                    output = _from_disk(pickle.load(f))
+                self._remember(key, output)
+                return output, 'disk'
+        return None, None
+
+    def _store(self, key: str, output):
+        self._remember(key, output)
+        if self.cache_dir is not None:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            path = os.path.join(self.cache_dir, f'{key}.pkl')
+            with open(f'{path}.tmp', 'wb') as f:
+                pickle.dump(_to_disk(output), f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(f'{path}.tmp', path)
+
+    def _remember(self, key: str, output):
+        self._cache[key] = output
+        while len(self._cache) > self.max_cached:
+            self._cache.popitem(last=False)
+
+
+def _fingerprint(value):
+    # files are identified by content metadata, not just by path
+    if isinstance(value, str) and os.path.isfile(value):
+        stat = os.stat(value)
+        return [value, stat.st_size, stat.st_mtime_ns]
+    return value
+
+
+class _PickledNetwork(NamedTuple):
+    cls: type
+    state: tuple
+
+
+class _SerializedNetwork(NamedTuple):
+    data: bytes
+
+
+def _to_disk(output):
+    # networks are linked structures, pickling them directly recurses through all nodes
+    if isinstance(output, Network):
+        try:
+            return _SerializedNetwork(serialization.dumps(output))
+        except ValueError:
+            # custom classes or attributes, not supported by the binary format
+            return _PickledNetwork(type(output), output.get_state())
+    return output
+
+
+def _from_disk(output):
+    if isinstance(output, _SerializedNetwork):
+        return serialization.loads(output.data)
+    if isinstance(output, _PickledNetwork):
+        return output.cls.from_state(output.state)
+    return output
+
+
+def _import_stage(path: str, sep=','):
+    from import_handler import import_handler
+    return import_handler(path, sep)
+
+
+def _dependency_matrices_stage(import_result):
+    import filtering
+    return (filtering.calculate_significance_dependency_matrix(import_result),
+            filtering.calculate_2loop_matrix(import_result))
+
+
+def _dependency_filter_stage(import_result, matrices, dependency_threshold=0.0):
+    import filtering
+    import network_factory
+    filtered = filtering.filter_network_by_matrices(*matrices, dependency_threshold)
+    return network_factory.from_filtered_import(import_result, *filtered)
+
+
+def _dfg_stage(import_result):
+    import network_factory
+    return network_factory.from_importer(import_result, import_start_end_events=True)
+
+
+def _threshold_filter_stage(network, edge_threshold=0, event_threshold=0):
+    from filters import FilterView
+    return FilterView(network).edges_below(edge_threshold).events_below(event_threshold).materialize()
+
+
+def _mine_stage(network):
+    from miner import alpha_miner
+    return alpha_miner(network)
+
+
+def _render_stage(network, format='png', prog='dot', with_numbers=False, ortho=True):
+    from drawing import render
+    return render(network, format=format, prog=prog, with_numbers=with_numbers, ortho=ortho)
+
+
+RENDER_PARAMS = ('format', 'prog', 'with_numbers', 'ortho')
+
+
+def standard_pipeline(kind='alpha', cache_dir: str = None) -> Pipeline:
+    """
+    Pipelines of the examples:
+
+        dfg       import -> network -> filter (edge_threshold, event_threshold) -> render
+        alpha     import -> network -> filter (edge_threshold, event_threshold) -> mine -> render
+        filtered  import -> matrices -> filter (dependency_threshold) -> mine -> render
+
+    Parameters: path, sep and render parameters (format, prog, with_numbers, ortho)
+    """
+    pipeline = Pipeline(cache_dir).stage('import', _import_stage, params=('path', 'sep'))
+    if kind == 'filtered':
+        pipeline.stage('matrices', _dependency_matrices_stage, inputs=('import',)) \
+            .stage('filter', _dependency_filter_stage, inputs=('import', 'matrices'), params=('dependency_threshold',))
+    elif kind in ('dfg', 'alpha'):
+        pipeline.stage('network', _dfg_stage, inputs=('import',)) \
+            .stage('filter', _threshold_filter_stage, inputs=('network',), params=('edge_threshold', 'event_threshold'))
+    else:
+        raise ValueError(f'Unknown pipeline {kind}')
+
+    if kind == 'dfg':
+        pipeline.stage('render', _render_stage, inputs=('filter',), params=RENDER_PARAMS)
+    else:
+        pipeline.stage('mine', _mine_stage, inputs=('filter',)) \
+            .stage('render', _render_stage, inputs=('mine',), params=RENDER_PARAMS)
+    return pipeline
@@ -0,0 +1,200 @@
+"""
+Variant sampling in front of `network_factory.from_importer` and `filtering`
+
+Each sampler draws cases (with replacement) from the variants of an import result
+and returns a `SampledResult`. Its counts are estimates for the whole log,
+so it can be used everywhere an import result is expected.
+"""
+import random
+from collections import Counter
+from itertools import accumulate
+from math import sqrt
+from statistics import NormalDist
+from typing import Dict, List, Tuple, Callable, Hashable, Any
+
+from more_itertools import pairwise
+
+from import_handler import Result, CsvResult, from_variants
+
+Variant = Tuple[Tuple[str, ...], int]
+
+
+class SampledResult(CsvResult):
+    def __init__(self,
+                 base: CsvResult,
+                 sample_size: int,
+                 population_size: int,
+                 edge_variance: Dict[str, Dict[str, float]]):
+        super(SampledResult, self).__init__(base.direct_succession, base.start_events, base.end_events,
+                                            base.traces_df, base.ev_counter)
+        self.sample_size = sample_size
+        self.population_size = population_size
+        self.edge_variance = edge_variance
+
+    def edge_count_bounds(self, confidence=0.95) -> Dict[str, Dict[str, Tuple[float, float]]]:
+        """
+        Confidence interval of each direct succession count in the whole log
+        (normal approximation of the sample mean)
+
+        :return: dict event -> successor -> (lower, upper)
+        """
+        z = NormalDist().inv_cdf((1 + confidence) / 2)
+        bounds = dict()
+        for event, counter in self.direct_succession.items():
+            bounds[event] = dict()
+            for successor, cnt in counter.items():
+                margin = z * sqrt(self.edge_variance[event][successor])
+                bounds[event][successor] = (max(0.0, cnt - margin), cnt + margin)
+
+        return bounds
+
+    def dependency_bounds(self, confidence=0.95) -> Dict[str, Dict[str, Tuple[float, float]]]:
+        """
+        Bounds of values from `filtering.calculate_significance_dependency_matrix`.
+        Dependency grows with t12 and falls with t21, so extremes are taken at the corners
+        of both count intervals. Both intervals have to hold, so real coverage
+        is at least `2 * confidence - 1`.
+
+        :return: dict event -> successor -> (lower, upper)
+        """
+        counts = self.edge_count_bounds(confidence)
+        bounds = dict()
+        for event, successors in counts.items():
+            bounds[event] = dict()
+            for successor, (low12, high12) in successors.items():
+                low21, high21 = counts.get(successor, {}).get(event, (0.0, 0.0))
+                bounds[event][successor] = ((low12 - high21) / (low12 + high21 + 1),
+                                            (high12 - low21) / (high12 + low21 + 1))
+
+        return bounds
+
+
+def weighted_sample(import_result: Result, n_cases: int, seed=None) -> SampledResult:
+    """
+    Draws `n_cases` cases, every variant with probability proportional to its case count
+    """
+    variants = import_result.get_variants()
+    rng = random.Random(seed)
+    draws = _draw(rng, variants, n_cases)
+    return _estimate([(variants, draws)])
+
+
+def stratified_sample(import_result: Result, n_cases: int,
+                      key: Callable[[Tuple[str, ...]], Hashable] = len, seed=None) -> SampledResult:
+    """
+    Splits variants into strata by `key(trace)` (trace length by default) and draws cases
+    from every stratum separately, proportionally to its size but at least one case per stratum.
+    Rare groups of variants are therefore always represented.
+    """
+    strata: Dict[Any, List[Variant]] = dict()
+    for trace, count in import_result.get_variants():
+        strata.setdefault(key(trace), []).append((trace, count))
+
+    total = sum(count for _, count in import_result.get_variants())
+    rng = random.Random(seed)
+    sampled = []
+    for stratum_key in sorted(strata, key=repr):
+        variants = strata[stratum_key]
+        stratum_size = sum(count for _, count in variants)
+        n = max(1, round(n_cases * stratum_size / total))
+        sampled.append((variants, _draw(rng, variants, n)))
+
+    return _estimate(sampled)
+
+
+def adaptive_sample(import_result: Result, batch_size=100, tolerance=0.01, max_cases: int = None,
+                    seed=None) -> SampledResult:
+    """
+    Draws cases in batches until direct-follows relations stabilize, that is when
+    no relative edge frequency changes by more than `tolerance` after a batch.
+
+    :param max_cases: upper limit of drawn cases, number of cases in log by default
+    """
+    variants = import_result.get_variants()
+    if max_cases is None:
+        max_cases = sum(count for _, count in variants)
+
+    rng = random.Random(seed)
+    cum_weights = list(accumulate(count for _, count in variants))
+    draws = Counter()
+    edge_totals = Counter()
+    previous = dict()
+    while sum(draws.values()) < max_cases:
+        batch = _draw(rng, variants, min(batch_size, max_cases - sum(draws.values())), cum_weights)
+        draws.update(batch)
+        for idx, w in batch.items():
+            for pair in pairwise(variants[idx][0]):
+                edge_totals[pair] += w
+
+        all_edges = sum(edge_totals.values()) or 1
+        current = {pair: cnt / all_edges for pair, cnt in edge_totals.items()}
+        change = max((abs(current.get(pair, 0) - previous.get(pair, 0)) for pair in current.keys() | previous.keys()),
+                     default=0)
+        previous = current
+        if change < tolerance and sum(draws.values()) > batch_size:
+            break
+
+    return _estimate([(variants, draws)])
+
+
+def _draw(rng: random.Random, variants: List[Variant], n: int, cum_weights=None) -> Counter:
+    """
+    :return: Counter variant index -> number of drawn cases
+    """
+    if cum_weights is None:
+        cum_weights = list(accumulate(count for _, count in variants))
+    return Counter(rng.choices(range(len(variants)), cum_weights=cum_weights, k=n))
+
+
+def _estimate(strata: List[Tuple[List[Variant], Counter]]) -> SampledResult:
+    """
+    Stratified estimator of log totals. In every stratum h, total is N_h times mean per case
+    and its variance is N_h^2 * s_h^2 / n_h, where s_h^2 is sample variance per case.
+    """
+    estimated_variants = []
+    edge_estimate = Counter()
+    edge_variance = Counter()
+    sample_size = 0
+    population_size = 0
+    for variants, draws in strata:
+        n = sum(draws.values())
+        stratum_size = sum(count for _, count in variants)
+        sample_size += n
+        population_size += stratum_size
+        if n == 0:
+            continue
+
+        scale = stratum_size / n
+        s1 = Counter()
+        s2 = Counter()
+        for idx, w in draws.items():
+            trace = variants[idx][0]
+            estimated_variants.append((trace, w * scale))
+            for pair, occurrences in Counter(pairwise(trace)).items():
+                s1[pair] += w * occurrences
+                s2[pair] += w * occurrences ** 2
+
+        for pair in s1:
+            edge_estimate[pair] += scale * s1[pair]
+            if n > 1:
+                variance_per_case = max(0.0, (s2[pair] - s1[pair] ** 2 / n) / (n - 1))
+                edge_variance[pair] += stratum_size ** 2 * variance_per_case / n
+
+    base = from_variants(estimated_variants)
+
+    # keep counts integer, so thresholds behave the same as for full import
+    for event, counter in base.direct_succession.items():
+        for successor in counter:
+            counter[successor] = round(edge_estimate[(event, successor)])
+    for event in base.ev_counter:
+        base.ev_counter[event] = round(base.ev_counter[event])
+    base.traces_df['Count'] = base.traces_df['Count'].round().astype(int)
+
+    variance = dict()
+    for (event, successor), value in edge_variance.items():
+        variance.setdefault(event, dict())[successor] = value
+    for event, counter in base.direct_succession.items():
+        for successor in counter:
+            variance.setdefault(event, dict()).setdefault(successor, 0.0)
+
+    return SampledResult(base, sample_size, population_size, variance)
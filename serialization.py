@@ -0,0 +1,403 @@
+"""
+Compact binary format of `Network` / `BPMNNetwork`.
+
+Nodes and edges are stored as columns of plain arrays instead of linked objects,
+so saving and loading is a few bulk copies and the file can be memory-mapped (`MappedNetwork`).
+
+Layout (all arrays in byte order given in the header, every section aligned to 8 bytes):
+
+    header          magic, format version, byte order, network class, n_nodes, n_edges, n_strings,
+                    n_set_entries and offsets of all sections
+    string table    u32 offsets[n_strings + 1] + UTF-8 data. Strings 0..n_nodes-1 are node names,
+                    the rest are members of node sets
+    node table      u8 class, type, kind, function, flags and f64 cnt, one item per node
+    edge table      CSR by source node: u32 offsets[n_nodes + 1], u32 targets, f64 cnt, u8 flags
+    node sets       `and_paralleled_with` and `in_two_loop_feedback_with` - CSR offsets into
+                    u32 string indices
+
+Counts are stored as f64 (inf of gates is preserved) with a flag telling if the count was an integer,
+so ints up to 2^53 round-trip exactly. None and empty sets are distinguished by flags.
+"""
+from __future__ import annotations
+
+import mmap
+import struct
+import sys
+from array import array
+from typing import BinaryIO, Dict, List, Optional, Tuple, Union
+
+from bpmn_network import BPMNNetwork, UtilityNode, NodeKind, NodeFunction
+from network import Network, Node, Edge, NodeType
+
+MAGIC = b'BPMNNET\0'
+FORMAT_VERSION = 1
+
+NETWORK_CLASSES = [Network, BPMNNetwork]
+NODE_CLASSES = [Node, UtilityNode]
+NO_ENUM = 255  # kind / function of nodes which don't have it
+
+# node flags
+FILTERED_OUT = 1
+START = 2
+END = 4
+SELF_LOOPED = 8
+IN_TWO_LOOP_MAIN = 16
+HAS_AND_SET = 32
+HAS_FEEDBACK_SET = 64
+INT_COUNT = 128
+# edge flags use FILTERED_OUT and INT_COUNT
+
+NODE_ATTRIBUTES = {'network', 'successors', 'predecessors', 'name', 'cnt', 'is_filtered_out', 'is_start_node',
+                   'is_end_node', 'type', 'is_self_looped', 'is_in_two_loop_main', 'in_two_loop_feedback_with',
+                   'and_paralleled_with', 'kind', 'function'}
+
+SECTIONS = ['string_offsets', 'string_data', 'node_class', 'node_type', 'node_kind', 'node_function', 'node_flags',
+            'node_cnt', 'edge_offsets', 'edge_targets', 'edge_cnt', 'edge_flags', 'and_offsets', 'feedback_offsets',
+            'set_entries']
+TYPECODES = {'string_offsets': 'I', 'string_data': 'B', 'node_class': 'B', 'node_type': 'B', 'node_kind': 'B',
+             'node_function': 'B', 'node_flags': 'B', 'node_cnt': 'd', 'edge_offsets': 'I', 'edge_targets': 'I',
+             'edge_cnt': 'd', 'edge_flags': 'B', 'and_offsets': 'I', 'feedback_offsets': 'I', 'set_entries': 'I'}
+# magic, version, byte order (0 little, 1 big), network class, n_nodes, n_edges, n_strings, n_set_entries,
+# then offset of every section
+HEADER = struct.Struct(f'<8sHBBIIII{len(SECTIONS)}Q')
+
+
+def _count(value) -> Tuple[float, bool]:
+    is_int = not isinstance(value, float) and float(value) == int(value)
+    return float(value), is_int
+
+
+def _restore_count(value: float, is_int: bool):
+    return int(value) if is_int else value
+
+
+def to_columns(network: Network) -> Tuple[int, Dict[str, array], int]:
+    """
+    :return: network class code, dict section -> array and number of node set entries
+    """
+    if type(network) not in NETWORK_CLASSES:
+        raise ValueError(f'Unsupported network class {type(network).__name__}')
+
+    nodes = list(network.nodes.values())
+    index = {node.name: i for i, node in enumerate(nodes)}
+    columns = {section: array(TYPECODES[section]) for section in SECTIONS}
+
+    strings = [node.name for node in nodes]
+    string_index = dict(index)
+
+    def string(value: str) -> int:
+        if value not in string_index:
+            string_index[value] = len(strings)
+            strings.append(value)
+        return string_index[value]
+
+    and_entries = array('I')
+    feedback_entries = array('I')
+    columns['edge_offsets'].append(0)
+    columns['and_offsets'].append(0)
+    columns['feedback_offsets'].append(0)
+    for node in nodes:
+        extra = set(node.__dict__.keys()) - NODE_ATTRIBUTES
+        if extra:
+            raise ValueError(f'Node {node.name} has attributes which can not be serialized: {sorted(extra)}')
+        if type(node) not in NODE_CLASSES:
+            raise ValueError(f'Unsupported node class {type(node).__name__}')
+
+        cnt, int_cnt = _count(node.cnt)
+        and_set = node.and_paralleled_with
+        feedback_set = node.in_two_loop_feedback_with
+        flags = (FILTERED_OUT * node.is_filtered_out | START * node.is_start_node | END * node.is_end_node
+                 | SELF_LOOPED * bool(node.is_self_looped) | IN_TWO_LOOP_MAIN * bool(node.is_in_two_loop_main)
+                 | HAS_AND_SET * (and_set is not None) | HAS_FEEDBACK_SET * (feedback_set is not None)
+                 | INT_COUNT * int_cnt)
+
+        columns['node_class'].append(NODE_CLASSES.index(type(node)))
+        columns['node_type'].append(node.type.value)
+        kind = getattr(node, 'kind', None)
+        function = getattr(node, 'function', None)
+        columns['node_kind'].append(NO_ENUM if kind is None else kind.value)
+        columns['node_function'].append(NO_ENUM if function is None else function.value)
+        columns['node_flags'].append(flags)
+        columns['node_cnt'].append(cnt)
+
+        # edges in order of the edge dict, only those which really connect nodes
+        successors = node.successors
+        for target, edge in network.edges.get(node.name, {}).items():
+            if edge.target in successors:
+                edge_cnt, int_edge_cnt = _count(edge.cnt)
+                columns['edge_targets'].append(index[target])
+                columns['edge_cnt'].append(edge_cnt)
+                columns['edge_flags'].append(FILTERED_OUT * edge.is_filtered_out | INT_COUNT * int_edge_cnt)
+        columns['edge_offsets'].append(len(columns['edge_targets']))
+
+        and_entries.extend(string(value) for value in (and_set or ()))
+        feedback_entries.extend(string(value) for value in (feedback_set or ()))
+        columns['and_offsets'].append(len(and_entries))
+        columns['feedback_offsets'].append(len(feedback_entries))
+
+    # feedback sets follow and-sets in a single entry array
+    columns['feedback_offsets'] = array('I', (offset + len(and_entries) for offset in columns['feedback_offsets']))
+    columns['set_entries'] = and_entries + feedback_entries
+
+    string_data = bytearray()
+    columns['string_offsets'].append(0)
+    for value in strings:
+        string_data += value.encode()
+        columns['string_offsets'].append(len(string_data))
+    columns['string_data'] = array('B', bytes(string_data))
+
+    return NETWORK_CLASSES.index(type(network)), columns, len(strings)
+
+
+def _pad(position: int) -> int:
+    return (8 - position % 8) % 8
+
+
+def dumps(network: Network) -> bytes:
+    network_class, columns, n_strings = to_columns(network)
+
+    offsets = []
+    position = HEADER.size + _pad(HEADER.size)
+    for section in SECTIONS:
+        offsets.append(position)
+        size = len(columns[section]) * columns[section].itemsize
+        position += size + _pad(size)
+
+    header = HEADER.pack(MAGIC, FORMAT_VERSION, int(sys.byteorder == 'big'), network_class,
+                         len(network.nodes), len(columns['edge_targets']), n_strings, len(columns['set_entries']),
+                         *offsets)
+    data = bytearray(position)
+    data[:len(header)] = header
+    for section, offset in zip(SECTIONS, offsets):
+        raw = columns[section].tobytes()
+        data[offset:offset + len(raw)] = raw
+    return bytes(data)
+
+
+def save(network: Network, file: Union[str, BinaryIO]):
+    """
+    Saves network to a file path or a binary stream
+    """
+    data = dumps(network)
+    if isinstance(file, str):
+        with open(file, 'wb') as f:
+            f.write(data)
+    else:
+        file.write(data)
+
+
+class _Header:
+    def __init__(self, buffer):
+        if len(buffer) < HEADER.size:
+            raise ValueError('Not a serialized network, file is too short')
+        magic, version, byte_order, network_class, n_nodes, n_edges, n_strings, n_set_entries, *offsets = \
+            HEADER.unpack_from(buffer)
+        if magic != MAGIC:
+            raise ValueError('Not a serialized network')
+        if version != FORMAT_VERSION:
+            raise ValueError(f'Unsupported format version {version}')
+        self.swap = byte_order != int(sys.byteorder == 'big')
+        self.network_class = NETWORK_CLASSES[network_class]
+        self.n_nodes = n_nodes
+        self.n_edges = n_edges
+        self.n_strings = n_strings
+        lengths = {'string_offsets': n_strings + 1, 'node_class': n_nodes, 'node_type': n_nodes,
+                   'node_kind': n_nodes, 'node_function': n_nodes, 'node_flags': n_nodes, 'node_cnt': n_nodes,
+                   'edge_offsets': n_nodes + 1, 'edge_targets': n_edges, 'edge_cnt': n_edges, 'edge_flags': n_edges,
+                   'and_offsets': n_nodes + 1, 'feedback_offsets': n_nodes + 1, 'set_entries': n_set_entries}
+        self.sections = dict()
+        for section, offset in zip(SECTIONS, offsets):
+            if section == 'string_data':
+                self.string_data_offset = offset
+            else:
+                self.sections[section] = (offset, lengths[section])
+
+    def column(self, buffer, section: str):
+        """
+        :return: memoryview of section without copying if byte order matches, array otherwise
+        """
+        offset, length = self.sections[section]
+        typecode = TYPECODES[section]
+        size = length * array(typecode).itemsize
+        if offset + size > len(buffer):
+            raise ValueError('Serialized network is truncated')
+        view = memoryview(buffer)[offset:offset + size]
+        if not self.swap or array(typecode).itemsize == 1:
+            return view.cast(typecode)
+        values = array(typecode, view.tobytes())
+        values.byteswap()
+        return values
+
+    def string_data(self, buffer, string_offsets) -> memoryview:
+        offset = self.string_data_offset
+        return memoryview(buffer)[offset:offset + string_offsets[self.n_strings]]
+
+
+def _decode_strings(header: _Header, buffer) -> List[str]:
+    offsets = header.column(buffer, 'string_offsets')
+    data = bytes(header.string_data(buffer, offsets))
+    return [data[offsets[i]:offsets[i + 1]].decode() for i in range(header.n_strings)]
+
+
+def loads(data: Union[bytes, bytearray, memoryview, mmap.mmap]) -> Network:
+    header = _Header(data)
+    strings = _decode_strings(header, data)
+    column = {section: header.column(data, section) for section in header.sections}
+
+    network = header.network_class()
+    nodes = []
+    for i in range(header.n_nodes):
+        node_cls = NODE_CLASSES[column['node_class'][i]]
+        flags = column['node_flags'][i]
+        node = node_cls.__new__(node_cls)
+
+        and_set = feedback_set = None
+        if flags & HAS_AND_SET:
+            and_set = set(strings[s] for s in column['set_entries'][column['and_offsets'][i]:column['and_offsets'][i + 1]])
+        if flags & HAS_FEEDBACK_SET:
+            feedback_set = set(strings[s] for s in
+                               column['set_entries'][column['feedback_offsets'][i]:column['feedback_offsets'][i + 1]])
+
+        # same attribute order as Node.__init__
+        attrs = {'network': network, 'name': strings[i],
+                 'cnt': _restore_count(column['node_cnt'][i], flags & INT_COUNT),
+                 'predecessors': set(), 'successors': set(),
+                 'is_filtered_out': bool(flags & FILTERED_OUT), 'is_start_node': bool(flags & START),
+                 'is_end_node': bool(flags & END), 'type': NodeType(column['node_type'][i]),
+                 'is_self_looped': bool(flags & SELF_LOOPED), 'is_in_two_loop_main': bool(flags & IN_TWO_LOOP_MAIN),
+                 'in_two_loop_feedback_with': feedback_set, 'and_paralleled_with': and_set}
+        if column['node_kind'][i] != NO_ENUM:
+            attrs['kind'] = NodeKind(column['node_kind'][i])
+        if column['node_function'][i] != NO_ENUM:
+            attrs['function'] = NodeFunction(column['node_function'][i])
+        node.__dict__.update(attrs)
+        network.nodes[node.name] = node
+        nodes.append(node)
+
+    edge_offsets = column['edge_offsets']
+    targets = column['edge_targets']
+    counts = column['edge_cnt']
+    edge_flags = column['edge_flags']
+    for i, src in enumerate(nodes):
+        start, end = edge_offsets[i], edge_offsets[i + 1]
+        if start == end:
+            continue
+        out = network.edges[src.name] = dict()
+        for e in range(start, end):
+            target = nodes[targets[e]]
+            edge = Edge(network, src, target, _restore_count(counts[e], edge_flags[e] & INT_COUNT))
+            edge.is_filtered_out = bool(edge_flags[e] & FILTERED_OUT)
+            out[target.name] = edge
+            src.successors.add(target)
+            target.predecessors.add(src)
+
+    return network
+
+
+def load(file: Union[str, BinaryIO]) -> Network:
+    """
+    Loads network saved by `save` from a file path or a binary stream
+    """
+    if isinstance(file, str):
+        with open(file, 'rb') as f:
+            return loads(f.read())
+    return loads(file.read())
+
+
+class MappedNetwork:
+    """
+    Read-only view of a saved network, backed by a memory-mapped file.
+    Nothing is loaded until asked for, so it opens instantly and many processes share the same pages.
+    Nodes are addressed by name or index (0..len-1, in the order of the original network).
+    """
+    def __init__(self, path: str):
+        self._file = open(path, 'rb')
+        self._buffer = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._header = _Header(self._buffer)
+        if self._header.swap:
+            raise ValueError('Memory mapping needs the same byte order as the file, use load() instead')
+        self._columns = {section: self._header.column(self._buffer, section) for section in self._header.sections}
+        self._string_data = self._header.string_data(self._buffer, self._columns['string_offsets'])
+        self._index: Optional[Dict[str, int]] = None
+
+    def __len__(self):
+        return self._header.n_nodes
+
+    def __enter__(self) -> MappedNetwork:
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        # views have to be released before the map can be closed
+        for view in self._columns.values():
+            view.release()
+        self._string_data.release()
+        self._buffer.close()
+        self._file.close()
+
+    @property
+    def network_class(self) -> type:
+        return self._header.network_class
+
+    @property
+    def edge_count(self) -> int:
+        return self._header.n_edges
+
+    def name(self, i: int) -> str:
+        offsets = self._columns['string_offsets']
+        return bytes(self._string_data[offsets[i]:offsets[i + 1]]).decode()
+
+    def names(self) -> List[str]:
+        return [self.name(i) for i in range(len(self))]
+
+    def index(self, name: str) -> int:
+        """
+        Index of node by name, name lookup table is built on the first call
+        """
+        if self._index is None:
+            self._index = {name: i for i, name in enumerate(self.names())}
+        return self._index[name]
+
+    def _node_index(self, node: Union[str, int]) -> int:
+        return node if isinstance(node, int) else self.index(node)
+
+    def cnt(self, node: Union[str, int]):
+        i = self._node_index(node)
+        return _restore_count(self._columns['node_cnt'][i], self._columns['node_flags'][i] & INT_COUNT)
+
+    def node_type(self, node: Union[str, int]) -> NodeType:
+        return NodeType(self._columns['node_type'][self._node_index(node)])
+
+    def kind(self, node: Union[str, int]) -> Optional[NodeKind]:
+        kind = self._columns['node_kind'][self._node_index(node)]
+        return None if kind == NO_ENUM else NodeKind(kind)
+
+    def function(self, node: Union[str, int]) -> Optional[NodeFunction]:
+        function = self._columns['node_function'][self._node_index(node)]
+        return None if function == NO_ENUM else NodeFunction(function)
+
+    def is_start(self, node: Union[str, int]) -> bool:
+        return bool(self._columns['node_flags'][self._node_index(node)] & START)
+
+    def is_end(self, node: Union[str, int]) -> bool:
+        return bool(self._columns['node_flags'][self._node_index(node)] & END)
+
+    def successors(self, node: Union[str, int]) -> List[Tuple[str, float]]:
+        """
+        :return: list of (target name, edge count)
+        """
+        i = self._node_index(node)
+        offsets = self._columns['edge_offsets']
+        targets = self._columns['edge_targets']
+        counts = self._columns['edge_cnt']
+        flags = self._columns['edge_flags']
+        return [(self.name(targets[e]), _restore_count(counts[e], flags[e] & INT_COUNT))
+                for e in range(offsets[i], offsets[i + 1])]
+
+    def to_network(self) -> Network:
+        """
+        :return: full, modifiable copy of the network
+        """
+        return loads(self._buffer)
@@ -0,0 +1,64 @@
+"""
+Networks and logs shared by several test modules
+"""
+from bpmn_network import BPMNNetwork, UtilityNode, NodeKind, NodeFunction
+
+
+"""
+Two independent copies of the lab 2 example:
+a -> b, c (parallel) -> d -> e | f -> g
+A -> B, C (parallel) -> D -> E | F -> G
+"""
+test_network = {
+    'a': {'b', 'c'},
+    'b': {'c', 'd'},
+    'c': {'b', 'd'},
+    'd': {'e', 'f'},
+    'e': {'g'},
+    'f': {'g'},
+    'A': {'B', 'C'},
+    'B': {'C', 'D'},
+    'C': {'B', 'D'},
+    'D': {'E', 'F'},
+    'E': {'G'},
+    'F': {'G'},
+}
+
+
+def gate(network: BPMNNetwork, name: str, kind: NodeKind, function: NodeFunction):
+    node = UtilityNode(network, name=name)
+    node.kind = kind
+    node.function = function
+    network.nodes[name] = node
+
+
+def parallel_network(kind=NodeKind.AND) -> BPMNNetwork:
+    """
+    a -> split -> (b, c) -> merge -> d
+    """
+    network = BPMNNetwork()
+    for name in 'abcd':
+        network.add_node(name)
+    gate(network, 'split', kind, NodeFunction.SPLIT)
+    gate(network, 'merge', kind, NodeFunction.MERGE)
+    for src, target in (('a', 'split'), ('split', 'b'), ('split', 'c'), ('b', 'merge'), ('c', 'merge'),
+                        ('merge', 'd')):
+        network.add_edge(src, target)
+    network.nodes['a'].is_start_node = True
+    network.nodes['d'].is_end_node = True
+    return network
+
+
+# log with timestamps: (case, activity, start minute, complete minute)
+timed_rows = [(1, 'a', 0, 1), (1, 'b', 3, 7), (1, 'c', 7, 8),
+              (2, 'a', 10, 12), (2, 'b', 20, 30), (2, 'c', 29, 31)]
+
+
+def write_timed_log(path: str, rows):
+    """
+    Writes CSV log with Start and Complete Timestamp columns, minutes are of 2020-01-01 00:00
+    """
+    with open(path, 'w') as f:
+        f.write('Case ID,Activity,Start Timestamp,Complete Timestamp\n')
+        for case, activity, start, end in rows:
+            f.write(f'{case},{activity},2020-01-01 00:{start:02}:00,2020-01-01 00:{end:02}:00\n')
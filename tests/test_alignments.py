@@ -0,0 +1,78 @@
+import unittest
+
+import alignments
+from alignments import SKIP
+from bpmn_network import NodeKind
+from tests.fixtures import parallel_network
+
+
+class AlignmentTests(unittest.TestCase):
+    def test_fitting_traces(self):
+        result = alignments.align_log(parallel_network(), [(('a', 'b', 'c', 'd'), 3), (('a', 'c', 'b', 'd'), 1)],
+                                      workers=1)
+
+        self.assertEqual(result.fitness, 1.0)
+        self.assertEqual(result.empty_cost, 4)
+        alignment = result.alignments[0]
+        self.assertEqual(alignment.count, 3)
+        self.assertEqual(alignment.deviations, ())
+        self.assertListEqual([move for move in alignment.moves if move[0] != SKIP],
+                             [('a', 'a'), ('b', 'b'), ('c', 'c'), ('d', 'd')])
+
+    def test_deviations(self):
+        result = alignments.align_log(parallel_network(), [(('a', 'b', 'x', 'd'), 2)], workers=1)
+
+        alignment = result.alignments[0]
+        self.assertEqual(alignment.cost, 2)
+        self.assertTrue(alignment.optimal)
+        self.assertCountEqual(alignment.deviations, [(2, ('x', SKIP)), (3, (SKIP, 'c'))])
+        self.assertEqual(result.deviations()[('x', SKIP)], 2)
+        self.assertAlmostEqual(alignment.fitness, 1 - 2 / (4 + 4))
+
+    def test_exclusive_choice(self):
+        result = alignments.align_log(parallel_network(NodeKind.XOR), [(('a', 'b', 'c', 'd'), 1)], workers=1)
+
+        alignment = result.alignments[0]
+        self.assertEqual(result.empty_cost, 3)
+        self.assertEqual(alignment.cost, 1)
+        self.assertIn(alignment.deviations[0][1], (('b', SKIP), ('c', SKIP)))
+
+    def test_budget_fallback(self):
+        trace = ('a', 'x', 'b', 'y', 'c', 'z', 'd')
+        exact = alignments.align_log(parallel_network(), [(trace, 1)], workers=1).alignments[0]
+        approximate = alignments.align_log(parallel_network(), [(trace, 1)], max_states=5, workers=1).alignments[0]
+
+        self.assertTrue(exact.optimal)
+        self.assertFalse(approximate.optimal)
+        self.assertTrue(approximate.complete)
+        self.assertGreaterEqual(approximate.cost, exact.cost)
+        self.assertEqual([log for log, _ in approximate.moves if log != SKIP], list(trace))
+
+    def test_completion_has_own_budget(self):
+        trace = ('a', 'x', 'b', 'y', 'c', 'z', 'd')
+        variants = [(trace, 1), (('a', 'b', 'c', 'd'), 3)]
+
+        small = alignments.align_log(parallel_network(), variants, max_states=8, workers=1)
+        incomplete = alignments.align_log(parallel_network(), variants, max_states=8, max_completion_states=0,
+                                          workers=1)
+
+        self.assertEqual(small.alignments[1].trace, trace)
+        self.assertFalse(small.alignments[1].optimal)
+        self.assertTrue(small.alignments[1].complete)
+        self.assertEqual(small.incomplete, 0)
+        self.assertEqual(incomplete.incomplete, 1)
+        self.assertFalse(incomplete.alignments[1].complete)
+        # only the fitting variant is left in the log fitness
+        self.assertEqual(incomplete.fitness, 1.0)
+
+    def test_cache_and_pool(self):
+        variants = [(('a', 'b', 'c', 'd'), 3), (('a', 'b', 'd'), 2), (('a', 'c', 'd', 'b'), 1)]
+        cache = dict()
+
+        in_process = alignments.align_log(parallel_network(), variants, workers=1, cache=cache)
+        pooled = alignments.align_log(parallel_network(), variants, workers=2)
+        cached = alignments.align_log(parallel_network(), variants, workers=1, cache=cache)
+
+        self.assertEqual(len(cache), 3)
+        self.assertEqual([a.cost for a in pooled.alignments], [a.cost for a in in_process.alignments])
+        self.assertEqual(cached.alignments, in_process.alignments)
@@ -0,0 +1,133 @@
+import json
+import multiprocessing
+import os
+import queue
+import signal
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+import batch_render
+import network_factory
+from batch_render import render_batch, CACHE_FILE
+
+
+def _sleeping_job(name, dot, path, format, prog, results):
+    # DOT source of the job is the number of seconds to sleep
+    time.sleep(float(dot))
+    with open(path, 'w') as f:
+        f.write(dot)
+    results.put((name, None, float(dot)))
+
+
+def _reporting_job(name, dot, path, format, prog, results):
+    # reports success at once, but keeps running for the number of seconds in DOT source
+    results.put((name, None, 0.0))
+    time.sleep(float(dot))
+
+
+class _LateQueue:
+    """
+    Result queue whose messages are read only after the first job has ended, as if it reported
+    just after the timeout check
+    """
+    queue_type = multiprocessing.Queue
+
+    def __init__(self):
+        self.queue = self.queue_type()
+
+    def put(self, item):
+        self.queue.put(item)
+
+    def get(self, timeout):
+        if _RecordingProcess.started[0].is_alive():
+            time.sleep(timeout)
+            raise queue.Empty
+        return self.queue.get(timeout=timeout)
+
+    def empty(self):
+        return self.queue.empty()
+
+
+class _RecordingProcess(multiprocessing.Process):
+    started = []
+    max_alive = 0
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.job = kwargs['args'][0]
+
+    def start(self):
+        super().start()
+        _RecordingProcess.started.append(self)
+        alive = sum(1 for p in _RecordingProcess.started if p.is_alive())
+        _RecordingProcess.max_alive = max(_RecordingProcess.max_alive, alive)
+
+
+class RenderBatchTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.output_dir = self.tmp_dir.name
+        _RecordingProcess.started = []
+        _RecordingProcess.max_alive = 0
+
+    def tearDown(self) -> None:
+        self.tmp_dir.cleanup()
+
+    def _render_sleeping(self, jobs, **options):
+        with mock.patch.object(batch_render, '_render_job', _sleeping_job), \
+                mock.patch.object(multiprocessing, 'Process', _RecordingProcess):
+            return render_batch(jobs, self.output_dir, format='txt', use_cache=False, **options)
+
+    def test_worker_count(self):
+        outcomes = self._render_sleeping({f'job{i}': '0.3' for i in range(5)}, workers=2)
+
+        self.assertEqual(set(o.status for o in outcomes.values()), {'rendered'})
+        self.assertEqual(len(_RecordingProcess.started), 5)
+        self.assertEqual(_RecordingProcess.max_alive, 2)
+
+    def test_timeout_kills_job(self):
+        outcomes = self._render_sleeping({'slow': '30', 'fast': '0'}, workers=2, timeout=0.5)
+
+        self.assertEqual(outcomes['slow'].status, 'timeout')
+        self.assertEqual(outcomes['fast'].status, 'rendered')
+        self.assertLess(outcomes['slow'].seconds, 5)
+        process = next(p for p in _RecordingProcess.started if p.job == 'slow')
+        self.assertFalse(process.is_alive())
+        self.assertEqual(process.exitcode, -signal.SIGKILL)
+        self.assertFalse(os.path.exists(outcomes['slow'].path))
+
+    def test_result_reported_after_timeout(self):
+        with mock.patch.object(multiprocessing, 'Queue', _LateQueue), \
+                mock.patch.object(batch_render, '_render_job', _reporting_job), \
+                mock.patch.object(multiprocessing, 'Process', _RecordingProcess):
+            outcomes = render_batch({'late': '30', 'next': '0'}, self.output_dir, format='txt', use_cache=False,
+                                    workers=1, timeout=0.3)
+
+        self.assertEqual(outcomes['late'].status, 'timeout')
+        self.assertEqual(outcomes['next'].status, 'rendered')
+
+    def test_failing_job_is_captured(self):
+        net = network_factory.from_simple_direct_succession({'a': {'b'}})
+
+        outcomes = render_batch({'broken': 'digraph { a -> ', 'good': net}, self.output_dir, format='svg')
+
+        self.assertEqual(outcomes['broken'].status, 'failed')
+        self.assertIn('Error', outcomes['broken'].error)
+        self.assertEqual(outcomes['good'].status, 'rendered')
+        self.assertTrue(os.path.exists(outcomes['good'].path))
+
+    def test_unchanged_jobs_are_skipped(self):
+        jobs = {'first': 'digraph { a -> b }', 'second': 'digraph { c -> d }'}
+        render_batch(jobs, self.output_dir, format='svg')
+        with open(os.path.join(self.output_dir, CACHE_FILE)) as f:
+            self.assertSetEqual(set(json.load(f)), {'first', 'second'})
+
+        jobs['second'] = 'digraph { c -> e }'
+        outcomes = render_batch(jobs, self.output_dir, format='svg')
+
+        self.assertEqual(outcomes['first'].status, 'unchanged')
+        self.assertEqual(outcomes['second'].status, 'rendered')
+        self.assertEqual(render_batch(jobs, self.output_dir, format='svg', use_cache=False)['first'].status,
+                         'rendered')
@@ -0,0 +1,89 @@
+import io
+import unittest
+from collections import Counter
+from math import inf
+from xml.etree import ElementTree
+
+import bpmn_xml
+import network_factory
+from bpmn_network import UtilityNode, NodeKind
+from miner import alpha_miner
+from tests.fixtures import test_network
+
+
+def _state(network):
+    nodes, edges = network.get_state()
+    return ([(cls, {key: sorted(value) if isinstance(value, set) else value for key, value in attrs.items()})
+             for cls, attrs in nodes], sorted(edges))
+
+
+class BPMNXmlTests(unittest.TestCase):
+    def setUp(self) -> None:
+        net = network_factory.from_simple_direct_succession(test_network)
+        net.autodetect_start_nodes()
+        net.autodetect_end_nodes()
+        self.mined = alpha_miner(net)
+
+    def _export(self, **options) -> str:
+        stream = io.StringIO()
+        bpmn_xml.export_bpmn(self.mined, stream, **options)
+        return stream.getvalue()
+
+    def test_export_is_bpmn(self):
+        root = ElementTree.fromstring(self._export())
+        process = root.find(f'{{{bpmn_xml.BPMN_NS}}}process')
+        tags = [child.tag.split('}')[1] for child in process]
+
+        self.assertEqual(tags.count('startEvent'), 1)
+        self.assertEqual(tags.count('endEvent'), 1)
+        gates = [node for node in self.mined.nodes.values() if isinstance(node, UtilityNode)]
+        self.assertEqual(tags.count('task'), len(self.mined.nodes) - len(gates))
+        self.assertEqual(tags.count('parallelGateway'), sum(gate.kind == NodeKind.AND for gate in gates))
+        self.assertEqual(tags.count('exclusiveGateway'), sum(gate.kind != NodeKind.AND for gate in gates))
+
+        ids = {child.get('id') for child in process}
+        for flow in process.iter(f'{{{bpmn_xml.BPMN_NS}}}sequenceFlow'):
+            self.assertIn(flow.get('sourceRef'), ids)
+            self.assertIn(flow.get('targetRef'), ids)
+
+    def test_round_trip(self):
+        loaded = bpmn_xml.import_bpmn(io.StringIO(self._export()))
+
+        self.assertEqual(_state(loaded), _state(self.mined))
+        gate = next(node for node in loaded.nodes.values() if isinstance(node, UtilityNode))
+        self.assertEqual(gate.cnt, inf)
+
+    def test_names_are_escaped(self):
+        net = network_factory.from_counter_direct_succession({'a<&>"': Counter({'b\'': 1})})
+        stream = io.StringIO()
+        bpmn_xml.export_bpmn(net, stream)
+
+        loaded = bpmn_xml.import_bpmn(io.StringIO(stream.getvalue()))
+        self.assertEqual(set(loaded.nodes.keys()), {'a<&>"', 'b\''})
+        self.assertEqual(loaded.edges['a<&>"']['b\''].cnt, 1)
+
+    def test_import_without_miner_attributes(self):
+        xml = f'''<definitions xmlns="{bpmn_xml.BPMN_NS}"><process id="p">
+            <startEvent id="s"/><userTask id="t1" name="a"/><parallelGateway id="g" gatewayDirection="Diverging"/>
+            <task id="t2" name="b"/><task id="t3" name="c"/><endEvent id="e"/>
+            <sequenceFlow id="f1" sourceRef="s" targetRef="t1"/><sequenceFlow id="f2" sourceRef="t1" targetRef="g"/>
+            <sequenceFlow id="f3" sourceRef="g" targetRef="t2"/><sequenceFlow id="f4" sourceRef="g" targetRef="t3"/>
+            <sequenceFlow id="f5" sourceRef="t2" targetRef="e"/></process></definitions>'''
+        loaded = bpmn_xml.import_bpmn(io.StringIO(xml))
+
+        self.assertEqual(loaded.nodes['g'].kind, NodeKind.AND)
+        self.assertEqual({node.name for node in loaded.nodes['g'].successors}, {'b', 'c'})
+        self.assertTrue(loaded.nodes['a'].is_start_node)
+        self.assertTrue(loaded.nodes['b'].is_end_node)
+        self.assertFalse(loaded.nodes['c'].is_end_node)
+
+    def test_layout(self):
+        root = ElementTree.fromstring(self._export(with_layout=True))
+        shapes = list(root.iter(f'{{{bpmn_xml.BPMNDI_NS}}}BPMNShape'))
+        edges = list(root.iter(f'{{{bpmn_xml.BPMNDI_NS}}}BPMNEdge'))
+
+        self.assertEqual(len(shapes), len(self.mined.nodes) + 2)
+        self.assertEqual(len(edges), len(list(root.iter(f'{{{bpmn_xml.BPMN_NS}}}sequenceFlow'))))
+        for shape in shapes:
+            bounds = shape.find(f'{{{bpmn_xml.DC_NS}}}Bounds')
+            self.assertGreaterEqual(float(bounds.get('y')), -1)
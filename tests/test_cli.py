@@ -0,0 +1,65 @@
+import json
+import os
+import tempfile
+import unittest
+
+import cli
+
+
+class CliTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.output_dir = self.tmp_dir.name
+        self.log = os.path.join(self.output_dir, 'log.csv')
+        with open(self.log, 'w') as f:
+            f.write('Case ID,Activity,Start Timestamp\n')
+            for case, trace in enumerate(['abcd', 'acbd', 'abcd']):
+                for i, activity in enumerate(trace):
+                    f.write(f'{case},{activity},2020-01-01 00:0{i}:00\n')
+
+    def tearDown(self) -> None:
+        self.tmp_dir.cleanup()
+
+    def _summary(self):
+        with open(os.path.join(self.output_dir, 'summary.json')) as f:
+            return json.load(f)
+
+    def test_pipelines(self):
+        for pipeline, stages in (('dfg', ['import', 'network', 'filter', 'render']),
+                                 ('alpha', ['import', 'network', 'filter', 'mine', 'render'])):
+            exit_code = cli.main([self.log, '--pipeline', pipeline, '--format', 'svg',
+                                  '--output-dir', self.output_dir, '--workers', '1', '--headless'])
+
+            self.assertEqual(exit_code, 0)
+            log_summary = self._summary()['logs'][0]
+            self.assertEqual(log_summary['status'], 'ok')
+            self.assertListEqual(list(log_summary['stages'].keys()), stages)
+            self.assertTrue(os.path.exists(os.path.join(self.output_dir, 'log.svg')))
+
+    def test_failures_are_reported(self):
+        exit_code = cli.main([self.log, os.path.join(self.output_dir, 'missing.csv'), '--format', 'svg',
+                              '--output-dir', self.output_dir, '--workers', '2', '--headless'])
+
+        self.assertEqual(exit_code, 1)
+        statuses = [log['status'] for log in self._summary()['logs']]
+        self.assertListEqual(statuses, ['ok', 'failed'])
+
+    def test_globs(self):
+        self.assertListEqual(cli._expand_inputs([os.path.join(self.output_dir, '*.csv'), self.log]), [self.log])
+
+    def test_bpmn_export(self):
+        exit_code = cli.main([self.log, '--format', 'svg', '--bpmn',
+                              '--output-dir', self.output_dir, '--workers', '1', '--headless'])
+
+        self.assertEqual(exit_code, 0)
+        self.assertEqual(self._summary()['logs'][0]['bpmn'], os.path.join(self.output_dir, 'log.bpmn'))
+        self.assertTrue(os.path.exists(os.path.join(self.output_dir, 'log.bpmn')))
+
+    def test_conformance(self):
+        exit_code = cli.main([self.log, '--format', 'svg', '--conformance',
+                              '--output-dir', self.output_dir, '--workers', '1', '--headless'])
+
+        self.assertEqual(exit_code, 0)
+        log_summary = self._summary()['logs'][0]
+        self.assertGreater(log_summary['fitness'], 0)
+        self.assertLessEqual(log_summary['fitness'], 1)
@@ -0,0 +1,83 @@
+import unittest
+from collections import Counter
+
+import conformance
+import network_factory
+from bpmn_network import NodeKind
+from conformance import SOURCE, SINK
+from tests.fixtures import parallel_network
+
+
+class TokenReplayTests(unittest.TestCase):
+    def test_parallel_gates(self):
+        result = conformance.token_replay(parallel_network(), [(('a', 'b', 'c', 'd'), 3), (('a', 'c', 'b', 'd'), 2)])
+
+        self.assertEqual(result.fitness, 1.0)
+        self.assertEqual(result.fitting_cases, 1.0)
+        self.assertEqual(result.edge_report(), {})
+
+    def test_missing_parallel_branch(self):
+        result = conformance.token_replay(parallel_network(), [(('a', 'b', 'd'), 1)])
+
+        replay = result.variants[0]
+        self.assertLess(result.fitness, 1.0)
+        self.assertEqual(replay.missing, 1)
+        # token for c is left, the one from c to merge is missing
+        self.assertEqual(result.missing[('c', 'merge')], 1)
+        self.assertEqual(result.remaining[('split', 'c')], 1)
+
+    def test_exclusive_gates(self):
+        network = parallel_network(NodeKind.XOR)
+
+        fitting = conformance.token_replay(network, [(('a', 'b', 'd'), 1), (('a', 'c', 'd'), 1)])
+        both = conformance.token_replay(network, [(('a', 'b', 'c', 'd'), 1)])
+
+        self.assertEqual(fitting.fitness, 1.0)
+        self.assertLess(both.fitness, 1.0)
+        self.assertEqual(both.variants[0].missing, 1)
+        self.assertEqual(both.variants[0].remaining, 1)
+
+    def test_start_end_and_unknown_activities(self):
+        network = network_factory.from_counter_direct_succession({'a': Counter({'b': 1})})
+        network.nodes['a'].is_start_node = True
+        network.nodes['b'].is_end_node = True
+
+        result = conformance.token_replay(network, [(('b',), 2), (('a', 'x', 'b'), 1)])
+
+        self.assertEqual(result.missing[('a', 'b')], 2)
+        self.assertEqual(result.remaining[(SOURCE, 'a')], 2)
+        self.assertEqual(result.unknown, Counter({'x': 1}))
+        self.assertEqual(result.missing[(None, 'x')], 1)
+        self.assertEqual(result.variants[0].trace, ('b',))
+        self.assertEqual(result.variants[0].count, 2)
+
+    def test_no_end_nodes(self):
+        network = network_factory.from_counter_direct_succession({'a': Counter({'b': 1})})
+        network.nodes['a'].is_start_node = True
+
+        result = conformance.token_replay(network, [(('a', 'b'), 1)])
+
+        self.assertEqual(result.missing[(None, SINK)], 1)
+        self.assertEqual(result.remaining[('b', SINK)], 0)
+
+    def test_variants_are_weighted(self):
+        network = parallel_network()
+        variants = [(('a', 'b', 'c', 'd'), 5), (('a', 'b', 'd'), 1), (('a', 'c'), 2), (('a', 'b', 'c', 'd', 'd'), 1)]
+        cases = [(trace, 1) for trace, count in variants for _ in range(count)]
+
+        by_variant = conformance.token_replay(network, variants)
+        by_case = conformance.token_replay(network, cases)
+
+        self.assertAlmostEqual(by_variant.fitness, by_case.fitness)
+        self.assertEqual(by_variant.missing, by_case.missing)
+        self.assertEqual(by_variant.remaining, by_case.remaining)
+        self.assertEqual(len(by_variant.variants), 4)
+        self.assertAlmostEqual(by_variant.fitting_cases, 5 / 9)
+
+    def test_empty_trace_without_start_nodes(self):
+        network = network_factory.from_counter_direct_succession({'a': Counter({'b': 1})})
+
+        result = conformance.token_replay(network, [((), 1)])
+
+        self.assertEqual(result.variants[0].fitness, 1.0)
+        self.assertEqual(result.fitness, 1.0)
@@ -0,0 +1,190 @@
+import io
+import os
+import sys
+import tempfile
+import time
+import unittest
+from collections import Counter
+from unittest import mock
+
+import pygraphviz as pgv
+
+import batch_render
+import network_factory
+from drawing import level_of_detail, build_graph, render, render_with_budget, draw_simple_network, LayoutCache, \
+    FAST_PROG
+
+
+"""
+a -> b -> c -> d, with rare detours b -> x -> c and c -> y -> d
+"""
+test_network = {
+    'a': Counter({'b': 10}),
+    'b': Counter({'c': 9, 'x': 1}),
+    'x': Counter({'c': 1}),
+    'c': Counter({'d': 8, 'y': 2}),
+    'y': Counter({'d': 2}),
+}
+test_events = {'a': 10, 'b': 10, 'c': 10, 'd': 10, 'x': 1, 'y': 2}
+
+
+def _slow_dot_job(name, dot, path, format, prog, results):
+    # stands for `dot` layout taking too long, other engines finish at once
+    if prog == 'dot':
+        time.sleep(30)
+    with open(path, 'wb') as f:
+        f.write(prog.encode())
+    results.put((name, None, 0.0))
+
+
+def _stuck_job(name, dot, path, format, prog, results):
+    time.sleep(30)
+
+
+class LevelOfDetailTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.net = network_factory.from_counter_direct_succession(test_network, test_events)
+
+    def test_small_network_is_unchanged(self):
+        simplified = level_of_detail(self.net, max_nodes=10)
+
+        self.assertSetEqual(set(simplified.nodes.keys()), set(self.net.nodes.keys()))
+        self.assertEqual(len(simplified.get_edge_list()), len(self.net.get_edge_list()))
+        self.assertIsNot(simplified.nodes['a'], self.net.nodes['a'])
+
+    def test_rare_nodes_are_collapsed(self):
+        simplified = level_of_detail(self.net, max_nodes=5)
+        simplified._validate_structure()
+
+        aggregate = simplified.nodes['2 other nodes']
+        self.assertEqual(aggregate.cnt, 3)
+        self.assertEqual(simplified.edges['b'][aggregate.name].cnt, 1)
+        self.assertEqual(simplified.edges['c'][aggregate.name].cnt, 2)
+        # x -> c and y -> d are merged
+        self.assertEqual(simplified.edges[aggregate.name]['c'].cnt, 1)
+        self.assertEqual(simplified.edges[aggregate.name]['d'].cnt, 2)
+
+    def test_rare_edges_are_dropped(self):
+        simplified = level_of_detail(self.net, max_nodes=5, min_edge_count=2)
+
+        self.assertNotIn(simplified.nodes['2 other nodes'], simplified.nodes['b'].successors)
+        self.assertIn('d', simplified.edges['2 other nodes'])
+
+    def test_clusters(self):
+        G = build_graph(self.net, clusters=[{'b', 'x'}])
+
+        self.assertSetEqual(set(G.get_subgraph('cluster_0').nodes()), {'b', 'x'})
+
+
+class RenderTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.net = network_factory.from_counter_direct_succession(test_network, test_events)
+        self.net.autodetect_start_nodes()
+        self.net.autodetect_end_nodes()
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        os.mkdir(os.path.join(self.tmp_dir.name, 'results'))
+        self.cwd = os.getcwd()
+
+    def tearDown(self) -> None:
+        os.chdir(self.cwd)
+        self.tmp_dir.cleanup()
+
+    def test_formats(self):
+        self.assertTrue(render(self.net, format='png').startswith(b'\x89PNG'))
+        svg = render(self.net, format='svg', with_numbers=True)
+        self.assertIn(b'<svg', svg)
+        self.assertIn(b'>b (10)<', svg)
+
+    def test_stream(self):
+        stream = io.BytesIO()
+
+        data = render(self.net, format='svg', stream=stream)
+
+        self.assertEqual(stream.getvalue(), data)
+
+    def test_matplotlib_only_for_auto_show(self):
+        os.chdir(self.tmp_dir.name)
+        # importing matplotlib fails
+        with mock.patch.dict(sys.modules, {'matplotlib': None, 'matplotlib.pyplot': None}):
+            draw_simple_network(self.net, name='headless')
+        with open(os.path.join('results', 'headless.png'), 'rb') as f:
+            self.assertTrue(f.read().startswith(b'\x89PNG'))
+
+        plt = mock.MagicMock()
+        with mock.patch.dict(sys.modules, {'matplotlib': mock.MagicMock(pyplot=plt), 'matplotlib.pyplot': plt}):
+            draw_simple_network(self.net, name='shown', title='Shown', auto_show=True)
+        plt.show.assert_called_once()
+        plt.title.assert_called_once_with('Shown')
+
+
+class RenderWithBudgetTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.net = network_factory.from_counter_direct_succession(test_network, test_events)
+        self.net.autodetect_start_nodes()
+        self.net.autodetect_end_nodes()
+
+    def test_circles_count_against_max_nodes(self):
+        data = render_with_budget(self.net, max_nodes=5, format='dot')
+
+        G = pgv.AGraph(string=data.decode())
+        self.assertEqual(G.number_of_nodes(), 5)
+        self.assertTrue(G.has_node('_start') and G.has_node('_end'))
+        G = pgv.AGraph(string=render_with_budget(self.net, max_nodes=5, format='dot',
+                                                 draw_start_end_circles=False).decode())
+        self.assertEqual(G.number_of_nodes(), 5)
+
+    def test_fast_engine_above_threshold(self):
+        drawn = []
+
+        def draw(G, format, prog):
+            drawn.append((prog, G.graph_attr.get('splines')))
+            return b''
+
+        with mock.patch.object(pgv.AGraph, 'draw', autospec=True, side_effect=draw):
+            render_with_budget(self.net, fast_threshold=8)
+            render_with_budget(self.net, fast_threshold=7)
+
+        self.assertEqual(drawn, [('dot', 'ortho'), (FAST_PROG, None)])
+
+    def test_slow_layout_is_killed(self):
+        with mock.patch.object(batch_render, '_render_job', _slow_dot_job):
+            start = time.perf_counter()
+            data = render_with_budget(self.net, time_limit=1, format='svg')
+            self.assertLess(time.perf_counter() - start, 5)
+            self.assertEqual(data, FAST_PROG.encode())
+
+        with mock.patch.object(batch_render, '_render_job', _stuck_job):
+            with self.assertRaises(TimeoutError):
+                render_with_budget(self.net, time_limit=1)
+
+
+class LayoutCacheTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.net = network_factory.from_counter_direct_succession(test_network, test_events)
+
+    def test_positions_are_kept_between_renders(self):
+        cache = LayoutCache()
+        render(self.net, format='svg', layout_cache=cache, lineage='model', ortho=False)
+        first = dict(cache.positions('model'))
+
+        self.net.add_node('z')
+        self.net.add_edge('d', 'z')
+        render(self.net, format='svg', layout_cache=cache, lineage='model', ortho=False)
+        second = cache.positions('model')
+
+        self.assertIn('z', second)
+        # whole drawing can be shifted, but old nodes don't move relative to each other
+        offset = lambda positions, name: (positions[name][0] - positions['a'][0], positions[name][1] - positions['a'][1])
+        for name in first:
+            self.assertAlmostEqual(offset(second, name)[0], offset(first, name)[0], places=1)
+            self.assertAlmostEqual(offset(second, name)[1], offset(first, name)[1], places=1)
+        self.assertDictEqual(cache.positions('other'), {})
+
+    def test_persistence(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'layout.json')
+            cache = LayoutCache(path)
+            render(self.net, format='svg', layout_cache=cache, lineage='model')
+            cache.save()
+
+            self.assertDictEqual(LayoutCache(path).positions('model'), cache.positions('model'))
@@ -0,0 +1,65 @@
+import os
+import tempfile
+import unittest
+import warnings
+
+import durations
+import network_factory
+from drawing import build_graph
+from import_handler import from_csv, from_variants
+from tests.fixtures import timed_rows, write_timed_log
+
+
+class DurationTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.log = os.path.join(self.tmp_dir.name, 'log.csv')
+        write_timed_log(self.log, timed_rows)
+        self.result = from_csv(self.log)
+
+    def tearDown(self) -> None:
+        self.tmp_dir.cleanup()
+
+    def test_service_and_waiting_times(self):
+        stats = durations.compute(self.result)
+
+        self.assertEqual(stats.service['a'], durations.DurationStats(90, 90, 117, 120, 2))
+        self.assertEqual(stats.service['b'].max, 600)
+        self.assertEqual(stats.waiting[('a', 'b')].mean, (120 + 480) / 2)
+        # overlapping events wait 0
+        self.assertEqual(stats.waiting[('b', 'c')].p50, 0)
+        self.assertNotIn(('c', 'a'), stats.waiting)
+
+    def test_without_complete_timestamps(self):
+        with open(self.log, 'w') as f:
+            f.write('Case ID,Activity,Start Timestamp\n1,a,2020-01-01 00:00:00\n1,b,2020-01-01 00:05:00\n')
+        stats = durations.compute(from_csv(self.log))
+
+        self.assertEqual(stats.service, {})
+        self.assertEqual(stats.waiting[('a', 'b')].mean, 300)
+        with self.assertRaises(ValueError):
+            durations.compute(from_variants([(('a', 'b'), 1)]))
+
+    def test_start_timestamps_are_parsed_once(self):
+        with open(self.log, 'w') as f:
+            f.write('Case ID,Activity,Start Timestamp\n1,a,19.04.21 15:10\n1,b,19.04.21 15:12\n')
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always')
+            result = from_csv(self.log)
+
+        self.assertLessEqual(sum('infer format' in str(w.message) for w in caught), 1)
+        self.assertEqual(durations.compute(result).waiting[('a', 'b')].mean, 120)
+
+    def test_annotate_and_draw(self):
+        network = network_factory.from_importer(self.result, import_start_end_events=True)
+        durations.annotate(network, durations.compute(self.result))
+
+        self.assertEqual(network.nodes['b'].service_time.mean, 420)
+        self.assertEqual(network.edges['a']['b'].waiting_time.max, 480)
+
+        G = build_graph(network, duration_label='max', duration_color='mean')
+        self.assertIn('10m', G.get_node('b').attr['label'])
+        self.assertEqual(G.get_node('b').attr['fillcolor'], durations.heat_color(1, 1))
+        self.assertEqual(G.get_edge('a', 'b').attr['label'], '8m')
+        with self.assertRaises(ValueError):
+            build_graph(network, duration_label='median')
@@ -0,0 +1,135 @@
+import unittest
+from collections import Counter
+
+import network_factory
+from filters import FilterView, find_broken_nodes, top_k_threshold, coverage_threshold, filter_edges_top_k, filter_events_by_coverage
+
+
+"""
+Network with counts:
+A (10) --8--> C (20) --15--> D (20) --12--> E (12)
+B (10) --2--^                       --3---> F (3)
+"""
+test_network = {
+    'A': Counter({'C': 8}),
+    'B': Counter({'C': 2}),
+    'C': Counter({'D': 15}),
+    'D': Counter({'E': 12, 'F': 3}),
+}
+test_event_counter = {'A': 10, 'B': 10, 'C': 20, 'D': 20, 'E': 12, 'F': 3}
+
+
+class ThresholdTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.net = network_factory.from_counter_direct_succession(test_network, test_event_counter)
+
+    def test_top_k_threshold(self):
+        self.assertEqual(top_k_threshold([5, 1, 9, 3, 7], 2), 7)
+        self.assertEqual(top_k_threshold([5, 1, 9], 10), 1)
+        self.assertEqual(top_k_threshold([5, 1, 9], 0), float('inf'))
+
+    def test_coverage_threshold(self):
+        # total is 40, 20 + 10 covers 75%
+        self.assertEqual(coverage_threshold([10, 20, 5, 5], 0.75), 10)
+        self.assertEqual(coverage_threshold([10, 20, 5, 5], 0.76), 5)
+        self.assertEqual(coverage_threshold([10, 20, 5, 5], 1), 5)
+        self.assertEqual(coverage_threshold([], 0.5), float('inf'))
+
+    def test_filter_edges_top_k(self):
+        filtered, threshold = filter_edges_top_k(self.net, 2)
+
+        self.assertEqual(threshold, 12)
+        kept = set((e.src.name, e.target.name) for e in filtered.get_edge_list() if not e.is_filtered_out)
+        self.assertSetEqual(kept, {('C', 'D'), ('D', 'E')})
+
+    def test_filter_events_by_coverage(self):
+        # events total 75, C + D + E = 52 < 0.75 * 75, then ties A, B with 10
+        filtered, threshold = filter_events_by_coverage(self.net, 0.75)
+
+        self.assertEqual(threshold, 10)
+        filtered_out = set(n.name for n in filtered.nodes.values() if n.is_filtered_out)
+        self.assertSetEqual(filtered_out, {'F'})
+
+
+class FilterViewTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.net = network_factory.from_counter_direct_succession(test_network, test_event_counter)
+
+    def test_mask_composes_filters(self):
+        view = FilterView(self.net).edges_below(5).events_below(5)
+
+        mask = view.mask()
+        self.assertSetEqual(mask.nodes, {'F'})
+        self.assertSetEqual(mask.edges, {('B', 'C'), ('D', 'F')})
+
+    def test_view_does_not_modify_network(self):
+        view = FilterView(self.net).edges_below(100)
+        view.mask()
+        view.materialize()
+
+        self.assertEqual(len(self.net.get_edge_list()), 5)
+        self.assertFalse(any(e.is_filtered_out for e in self.net.get_edge_list()))
+
+    def test_events_matching_and_custom_predicate(self):
+        view = FilterView(self.net).events_matching('^[AB]$').exclude_edges(lambda e: e.target.name == 'E')
+
+        mask = view.mask()
+        self.assertSetEqual(mask.nodes, {'A', 'B'})
+        self.assertSetEqual(mask.edges, {('A', 'C'), ('B', 'C'), ('D', 'E')})
+
+    def test_materialize(self):
+        pruned = FilterView(self.net).edges_below(5).events_below(5).materialize()
+
+        self.assertSetEqual(set(pruned.nodes.keys()), {'A', 'B', 'C', 'D', 'E'})
+        self.assertSetEqual(set((e.src.name, e.target.name) for e in pruned.get_edge_list()),
+                            {('A', 'C'), ('C', 'D'), ('D', 'E')})
+        self.assertEqual(pruned.edges['C']['D'].cnt, 15)
+        self.assertEqual(pruned.nodes['C'].cnt, 20)
+        self.assertIsNot(pruned.nodes['C'], self.net.nodes['C'])
+        pruned._validate_structure()
+
+    def test_apply_matches_delete_filtered_out_items(self):
+        FilterView(self.net).edges_below(5).events_below(5).apply()
+        self.assertTrue(self.net.nodes['F'].is_filtered_out)
+        self.assertTrue(self.net.edges['B']['C'].is_filtered_out)
+
+        self.net.delete_filtered_out_items()
+        self.assertNotIn('F', self.net.nodes)
+        self.assertNotIn('C', self.net.edges['B'])
+
+
+class BrokenNodesTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.net = network_factory.from_counter_direct_succession(test_network, test_event_counter)
+        self.net.nodes['A'].is_start_node = True
+        self.net.nodes['B'].is_start_node = True
+        self.net.nodes['E'].is_end_node = True
+
+    def test_healthy_network(self):
+        self.net.nodes['F'].is_end_node = True
+        self.assertSetEqual(find_broken_nodes(self.net), set())
+
+    def test_dangling_path_and_orphans(self):
+        self.net.add_node('X')
+        broken = find_broken_nodes(self.net)
+
+        # F does not lead to end event, X is alone
+        self.assertSetEqual(set(n.name for n in broken), {'F', 'X'})
+        self.assertIn('F', self.net.nodes)
+
+    def test_unreachable_from_start(self):
+        self.net.nodes['B'].is_start_node = False
+        broken = find_broken_nodes(self.net, delete=True)
+
+        self.assertSetEqual(set(n.name for n in broken), {'B', 'F'})
+        self.assertSetEqual(set(self.net.nodes.keys()), {'A', 'C', 'D', 'E'})
+        self.assertNotIn('F', self.net.edges['D'])
+        self.net._validate_structure()
+
+    def test_autodetects_start_end_without_flags(self):
+        net = network_factory.from_counter_direct_succession(test_network, test_event_counter)
+        self.assertSetEqual(find_broken_nodes(net), set())
+
+    def test_long_chain_has_no_recursion_limit(self):
+        net = network_factory.from_simple_direct_succession({str(i): {str(i + 1)} for i in range(20000)})
+        self.assertSetEqual(find_broken_nodes(net), set())
@@ -0,0 +1,112 @@
+import json
+import os
+import pstats
+import tempfile
+import unittest
+
+import instrumentation
+import network_factory
+from miner import alpha_miner
+from tests.fixtures import test_network
+
+
+class InstrumentationTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.net = network_factory.from_simple_direct_succession(test_network)
+        self.net.autodetect_start_nodes()
+        self.net.autodetect_end_nodes()
+        self.sink = instrumentation.ListSink()
+
+    def tearDown(self) -> None:
+        instrumentation.disable()
+        instrumentation.stop_profiling()
+
+    def test_disabled_emits_nothing(self):
+        alpha_miner(self.net)
+        with instrumentation.span('block') as span:
+            span.count(items=1)
+
+        self.assertFalse(instrumentation.is_enabled())
+        self.assertListEqual(self.sink.spans, [])
+
+    def test_spans_with_counts(self):
+        instrumentation.enable(self.sink)
+
+        with instrumentation.span('outer', logs=1) as span:
+            alpha_miner(self.net)
+            span.count(done=True)
+
+        inner, outer = self.sink.spans
+        self.assertEqual(inner['name'], 'miner.alpha_miner')
+        self.assertEqual(inner['parent'], 'outer')
+        self.assertEqual(inner['counts']['gates_inserted'], 10)
+        self.assertDictEqual(outer['counts'], {'logs': 1, 'done': True})
+        self.assertGreaterEqual(outer['wall'], inner['wall'])
+
+    def test_error_is_recorded(self):
+        instrumentation.enable(self.sink)
+
+        with self.assertRaises(ValueError):
+            with instrumentation.span('failing'):
+                raise ValueError()
+
+        self.assertEqual(self.sink.spans[0]['counts']['error'], 'ValueError')
+
+    def test_chrome_trace(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'trace.json')
+            instrumentation.enable(instrumentation.ChromeTraceSink(path))
+            alpha_miner(self.net)
+            instrumentation.disable()
+
+            with open(path) as f:
+                event, = json.load(f)['traceEvents']
+        self.assertEqual(event['ph'], 'X')
+        self.assertEqual(event['args']['nodes'], len(self.net.nodes) + 10)
+
+    def test_profile_single_stage(self):
+        profiler = instrumentation.profile_stage('miner.alpha_miner')
+
+        alpha_miner(self.net)
+
+        functions = [function for _, _, function in pstats.Stats(profiler).stats.keys()]
+        self.assertIn('_insert_gates', functions)
+
+
+class MemoryTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.sink = instrumentation.ListSink()
+        instrumentation.enable(self.sink)
+
+    def tearDown(self) -> None:
+        instrumentation.disable_memory()
+        instrumentation.disable()
+
+    def test_peak_and_retained(self):
+        instrumentation.enable_memory(rss_interval=0)
+
+        with instrumentation.span('outer'):
+            with instrumentation.span('temporary'):
+                data = bytearray(10 ** 6)
+                del data
+            kept = bytearray(10 ** 5)
+
+        temporary, outer = [span['memory'] for span in self.sink.spans]
+        self.assertGreaterEqual(temporary['peak'], 10 ** 6)
+        self.assertLess(temporary['retained'], 10 ** 5)
+        # peak of nested span counts for the parent too
+        self.assertGreaterEqual(outer['peak'], 10 ** 6)
+        self.assertGreaterEqual(outer['retained'], 10 ** 5)
+        self.assertGreater(outer['rss'], 0)
+        del kept
+
+    def test_types(self):
+        instrumentation.enable_memory(types=True, rss_interval=0)
+        net = network_factory.from_simple_direct_succession(test_network)
+
+        with instrumentation.span('mining'):
+            mined = alpha_miner(net)
+
+        types = self.sink.spans[-1]['memory']['types']
+        self.assertEqual(types['Node']['count'], len(mined.nodes))
+        self.assertEqual(types['Edge']['count'], len(mined.get_edge_list()))
@@ -0,0 +1,59 @@
+import unittest
+
+import log_filters
+from import_handler import from_variants
+from log_filters import VariantIndex
+
+
+"""
+Log:
+a b c d   x 50
+a c b d   x 30
+a b d     x 15
+a x b c d x 5
+"""
+test_variants = [
+    (('a', 'b', 'c', 'd'), 50),
+    (('a', 'c', 'b', 'd'), 30),
+    (('a', 'b', 'd'), 15),
+    (('a', 'x', 'b', 'c', 'd'), 5),
+]
+
+
+class LogFilterTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.log = from_variants(test_variants)
+
+    def test_top_variants(self):
+        result = log_filters.top_variants(self.log, 2)
+
+        self.assertEqual(len(result.get_variants()), 2)
+        self.assertEqual(result.direct_succession['a']['b'], 50)
+        self.assertEqual(result.direct_succession['a']['c'], 30)
+        self.assertNotIn('x', result.ev_counter)
+
+    def test_variants_covering(self):
+        self.assertEqual(len(log_filters.variants_covering(self.log, 0.8).get_variants()), 2)
+        self.assertEqual(len(log_filters.variants_covering(self.log, 0.81).get_variants()), 3)
+        self.assertEqual(len(log_filters.variants_covering(self.log, 1).get_variants()), 4)
+
+    def test_filter_trace_length(self):
+        result = log_filters.filter_trace_length(self.log, max_length=3)
+
+        self.assertListEqual(result.get_variants(), [(('a', 'b', 'd'), 15)])
+        self.assertSetEqual(result.start_events, {'a'})
+        self.assertSetEqual(result.end_events, {'d'})
+
+    def test_filter_activities(self):
+        result = log_filters.filter_activities(self.log, required={'c'}, forbidden={'x'})
+
+        self.assertListEqual([count for _, count in result.get_variants()], [50, 30])
+        self.assertEqual(result.ev_counter['b'], 80)
+
+    def test_index_filters_compose(self):
+        index = VariantIndex.from_result(self.log)
+
+        result = index.with_activities(required={'b'}).with_length(min_length=4).top(1).to_result()
+
+        self.assertListEqual(result.get_variants(), [(('a', 'b', 'c', 'd'), 50)])
+        self.assertEqual(index.total_cases(), 100)
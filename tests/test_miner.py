@@ -0,0 +1,170 @@
+import re
+import unittest
+from collections import Counter
+
+import network_factory
+from miner import alpha_miner, alpha_miner_parallel, IncrementalMiner, diff_direct_succession
+from tests.fixtures import test_network
+
+
+def _normalized_edges(net):
+    # gate names contain node sets, so their order depends on set iteration
+    sort_names = lambda name: re.sub(r'\[([^\]]*)\]', lambda m: f'[{",".join(sorted(m.group(1).split(",")))}]', name)
+    return sorted((sort_names(e.src.name), sort_names(e.target.name), e.cnt) for e in net.get_edge_list())
+
+
+class ParallelMinerTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.net = network_factory.from_simple_direct_succession(test_network)
+        self.net.autodetect_start_nodes()
+        self.net.autodetect_end_nodes()
+
+    def test_weakly_connected_components(self):
+        components = self.net.weakly_connected_components()
+
+        names = sorted(sorted(n.name for n in c) for c in components)
+        self.assertListEqual(names, [list('ABCDEFG'), list('abcdefg')])
+
+    def test_same_result_as_serial(self):
+        expected = _normalized_edges(alpha_miner(self.net))
+
+        for workers in (1, 2):
+            mined = alpha_miner_parallel(self.net, workers=workers)
+            mined._validate_structure()
+            self.assertListEqual(_normalized_edges(mined), expected)
+
+    def test_start_end_gates_are_global(self):
+        mined = alpha_miner_parallel(self.net, workers=1)
+
+        self.assertIn('start_split_gate', mined.nodes)
+        self.assertIn('end_merge_gate', mined.nodes)
+        self.assertSetEqual(set(n.name for n in mined.nodes['start_split_gate'].successors), {'a', 'A'})
+        self.assertSetEqual(set(n.name for n in mined.nodes['end_merge_gate'].predecessors), {'g', 'G'})
+
+    def test_input_network_not_modified(self):
+        edges_before = _normalized_edges(self.net)
+
+        alpha_miner_parallel(self.net, workers=1)
+
+        self.assertListEqual(_normalized_edges(self.net), edges_before)
+
+
+"""
+Lab 2 example with counts, plus independent chains x -> y -> z and p -> q
+"""
+test_counter_network = {
+    'a': Counter({'b': 5, 'c': 5}),
+    'b': Counter({'c': 2, 'd': 3}),
+    'c': Counter({'b': 2, 'd': 3}),
+    'd': Counter({'e': 4, 'f': 1}),
+    'e': Counter({'g': 4}),
+    'f': Counter({'g': 1}),
+    'x': Counter({'y': 3}),
+    'y': Counter({'z': 3}),
+    'p': Counter({'q': 1}),
+}
+
+
+def _canonical_name(name: str) -> str:
+    # member lists of gate names can be nested, e.g. XOR_m_[XOR_s_a->[d,b,c],c,b]->d
+    def parse(i, nested=False):
+        members, member = [], ''
+        while i < len(name):
+            char = name[i]
+            if char == '[':
+                nested_name, i = parse(i + 1, True)
+                member += nested_name
+                continue
+            if nested and char == ']':
+                return '[' + ','.join(sorted(members + [member])) + ']', i + 1
+            if nested and char == ',':
+                members.append(member)
+                member = ''
+            else:
+                member += char
+            i += 1
+        return member, i
+
+    return parse(0)[0]
+
+
+def _canonical_edges(net):
+    return sorted((_canonical_name(e.src.name), _canonical_name(e.target.name), e.cnt) for e in net.get_edge_list())
+
+
+class IncrementalMinerTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.net = network_factory.from_counter_direct_succession(test_counter_network)
+        self.net.autodetect_start_nodes()
+        self.net.autodetect_end_nodes()
+        self.miner = IncrementalMiner(self.net, max_changed_fraction=0.5)
+
+    def test_initial_mining(self):
+        self.assertListEqual(_canonical_edges(self.miner.network), _canonical_edges(alpha_miner(self.net)))
+
+    def test_count_changes_are_applied_in_place(self):
+        mined = self.miner.network
+
+        remined = self.miner.update({'x': {'y': 2}, 'a': {'b': 10}})
+
+        self.assertSetEqual(remined, set())
+        self.assertIs(self.miner.network, mined)
+        self.assertEqual(mined.edges['x']['y'].cnt, 5)
+        # a -> AND split -> b
+        gate = next(iter(mined.nodes['a'].successors))
+        self.assertEqual(mined.edges['a'][gate.name].cnt, 20)
+        self.assertEqual(mined.edges[gate.name]['b'].cnt, 15)
+
+    def test_only_changed_component_is_mined_again(self):
+        remined = self.miner.update({'y': {'w': 2}}, end_events={'g', 'w', 'q'})
+
+        self.assertSetEqual(remined, {'x', 'y', 'z', 'w'})
+        self.miner.network._validate_structure()
+        self.assertListEqual(_canonical_edges(self.miner.network), _canonical_edges(alpha_miner(self.miner.source)))
+
+    def test_large_change_mines_everything(self):
+        remined = self.miner.update({'a': {'d': 1}, 'y': {'x': 1}})
+
+        self.assertSetEqual(remined, set(self.miner.source.nodes.keys()))
+        self.assertListEqual(_canonical_edges(self.miner.network), _canonical_edges(alpha_miner(self.miner.source)))
+
+    def test_diff_direct_succession(self):
+        new = {'a': Counter({'b': 7, 'c': 5}), 'x': Counter({'y': 1})}
+        diff = diff_direct_succession({'a': test_counter_network['a'], 'x': test_counter_network['x']}, new)
+
+        self.assertDictEqual(diff, {'a': Counter({'b': 2}), 'x': Counter({'y': -2})})
+
+    def test_count_changes_in_loops_match_full_mining(self):
+        # x -> a* -> y | x -> y short loop, u -> b <-> c two-loop, b -> v
+        loops = {
+            'x': Counter({'a': 4, 'y': 2}),
+            'a': Counter({'a': 3, 'y': 4}),
+            'u': Counter({'b': 5}),
+            'b': Counter({'c': 2, 'v': 5}),
+            'c': Counter({'b': 2}),
+        }
+        net = network_factory.from_counter_direct_succession(loops)
+        net.autodetect_start_nodes()
+        net.autodetect_end_nodes()
+        miner = IncrementalMiner(net, max_changed_fraction=1)
+
+        for diff in ({'x': {'a': 3}}, {'x': {'y': 1}}, {'a': {'a': -1}}, {'c': {'b': 4}}, {'u': {'b': 2}}):
+            miner.update(diff)
+            self.assertListEqual(_canonical_edges(miner.network), _canonical_edges(alpha_miner(miner.source)), diff)
+
+    def test_event_count_changes_match_full_mining(self):
+        # a, b -> c -> d with start events a, b
+        net = network_factory.from_counter_direct_succession({'a': Counter({'c': 5}), 'b': Counter({'c': 3}),
+                                                              'c': Counter({'d': 8})},
+                                                             {'a': 5, 'b': 3, 'c': 8, 'd': 8})
+        net.autodetect_start_nodes()
+        net.autodetect_end_nodes()
+        miner = IncrementalMiner(net, max_changed_fraction=1)
+
+        # in place, then with 'e' as new end event next to d, mined again
+        for diff, counts, ends in (({'a': {'c': 2}}, {'a': 2, 'c': 2, 'd': 2}, None),
+                                   ({'c': {'e': 1}}, {'b': 1, 'c': 1, 'e': 1}, {'d', 'e'})):
+            miner.update(diff, counts, end_events=ends)
+            self.assertListEqual(_canonical_edges(miner.network), _canonical_edges(alpha_miner(miner.source)))
+        self.assertEqual(miner.network.edges['start_split_gate']['a'].cnt, 7)
+        self.assertEqual(miner.network.edges['e']['end_merge_gate'].cnt, 1)
@@ -242,3 +242,48 @@ class NetworkTests(unittest.TestCase):
 
         # validate edges - im too lazy to write assertions
         net._validate_structure()
+
+
+class RelationCacheTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.net = network_factory.from_simple_direct_succession(test_network)
+
+    def test_queries_are_cached_between_mutations(self):
+        causality = self.net.get_causality()
+
+        self.assertIs(self.net.get_causality(), causality)
+        self.assertIs(self.net.causalities_for_node('D'), causality[self.net.nodes['D']])
+
+    def test_mutations_invalidate_cache(self):
+        d = self.net.nodes['D']
+        e = self.net.nodes['E']
+        self.assertSetEqual(self.net.causalities_for_node(d), {e, self.net.nodes['F']})
+
+        self.net.add_edge('E', 'D')
+        self.assertSetEqual(self.net.causalities_for_node(d), {self.net.nodes['F']})
+        self.assertSetEqual(self.net.parallel_events_for_node(d), {e})
+
+        self.net.delete_edge(self.net.edges['E']['D'])
+        self.assertSetEqual(self.net.parallel_events_for_node(d), set())
+
+        d.successors = {e}
+        self.assertSetEqual(self.net.get_causality()[d], {e})
+
+    def test_version_changes(self):
+        version = self.net.version
+        self.net.nodes['C'].remove_successor(self.net.nodes['D'])
+        self.assertGreater(self.net.version, version)
+
+
+class ComponentTests(unittest.TestCase):
+    def test_strongly_connected_components(self):
+        net = network_factory.from_simple_direct_succession({
+            'a': {'b'},
+            'b': {'a', 'c'},
+            'c': {'d'},
+            'd': {'c', 'e'},
+        })
+
+        components = sorted(sorted(n.name for n in c) for c in net.strongly_connected_components())
+
+        self.assertListEqual(components, [['a', 'b'], ['c', 'd'], ['e']])
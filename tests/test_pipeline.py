@@ -0,0 +1,73 @@
+import os
+import tempfile
+import unittest
+
+from pipeline import Pipeline, standard_pipeline
+
+
+class PipelineTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.calls = []
+
+        def source(size=3):
+            self.calls.append('source')
+            return list(range(size))
+
+        def scaled(numbers, factor):
+            self.calls.append('scaled')
+            return [n * factor for n in numbers]
+
+        def total(numbers, scaled_numbers):
+            self.calls.append('total')
+            return sum(numbers) + sum(scaled_numbers)
+
+        self.pipeline = Pipeline() \
+            .stage('source', source, params=('size',)) \
+            .stage('scaled', scaled, inputs=('source',), params=('factor',)) \
+            .stage('total', total, inputs=('source', 'scaled'))
+
+    def test_run(self):
+        result = self.pipeline.run(factor=2)
+
+        self.assertEqual(result['total'], 9)
+        self.assertListEqual(self.calls, ['source', 'scaled', 'total'])
+        self.assertSetEqual(set(result.summary().keys()), {'source', 'scaled', 'total'})
+
+    def test_only_downstream_stages_are_recomputed(self):
+        self.pipeline.run(factor=2)
+        self.calls.clear()
+
+        result = self.pipeline.run(factor=3)
+
+        self.assertEqual(result['total'], 12)
+        self.assertListEqual(self.calls, ['scaled', 'total'])
+        self.assertEqual(result.stages['source'].cached, 'memory')
+        self.assertIsNone(result.stages['scaled'].cached)
+
+    def test_targets(self):
+        result = self.pipeline.run('scaled', factor=2, size=2)
+
+        self.assertListEqual(self.calls, ['source', 'scaled'])
+        self.assertDictEqual(result.outputs, {'scaled': [0, 2]})
+
+    def test_missing_parameter(self):
+        with self.assertRaises(ValueError):
+            self.pipeline.run()
+
+    def test_disk_cache(self):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            pipeline = standard_pipeline('alpha', cache_dir=cache_dir)
+            path = os.path.join(os.path.dirname(__file__), '..', 'data', 'B2.csv')
+            first = pipeline.run('mine', path=path)
+
+            second = standard_pipeline('alpha', cache_dir=cache_dir).run('mine', path=path)
+
+        self.assertTrue(all(run.cached == 'disk' for run in second.stages.values()))
+        self.assertSetEqual(set(second['mine'].nodes.keys()), set(first['mine'].nodes.keys()))
+        second['mine']._validate_structure()
+
+    def test_memory(self):
+        result = self.pipeline.run(factor=2, memory=True)
+
+        self.assertIn('peak', result.stages['scaled'].memory)
+        self.assertIn('memory', result.summary()['total'])
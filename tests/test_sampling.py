@@ -0,0 +1,73 @@
+import unittest
+
+import network_factory
+import sampling
+from import_handler import from_variants
+
+
+"""
+Log:
+a b c   x 900
+a c     x 90
+a b b c x 10
+"""
+test_variants = [
+    (('a', 'b', 'c'), 900),
+    (('a', 'c'), 90),
+    (('a', 'b', 'b', 'c'), 10),
+]
+
+
+class SamplingTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.log = from_variants(test_variants)
+
+    def test_from_variants(self):
+        self.assertEqual(self.log.direct_succession['a']['b'], 910)
+        self.assertEqual(self.log.direct_succession['b']['b'], 10)
+        self.assertEqual(self.log.ev_counter['b'], 920)
+        self.assertSetEqual(self.log.start_events, {'a'})
+        self.assertSetEqual(self.log.end_events, {'c'})
+        self.assertListEqual(self.log.get_variants(), test_variants)
+
+    def test_weighted_sample_is_reproducible(self):
+        first = sampling.weighted_sample(self.log, 200, seed=7)
+        second = sampling.weighted_sample(self.log, 200, seed=7)
+
+        self.assertEqual(first.sample_size, 200)
+        self.assertEqual(first.population_size, 1000)
+        self.assertDictEqual(first.direct_succession, second.direct_succession)
+
+    def test_bounds_contain_real_counts(self):
+        sample = sampling.weighted_sample(self.log, 500, seed=1)
+        bounds = sample.edge_count_bounds(confidence=0.99)
+
+        for event, successor in (('a', 'b'), ('a', 'c'), ('b', 'c')):
+            low, high = bounds[event][successor]
+            self.assertLessEqual(low, self.log.direct_succession[event][successor])
+            self.assertGreaterEqual(high, self.log.direct_succession[event][successor])
+
+        low, high = sample.dependency_bounds(confidence=0.99)['a']['b']
+        self.assertLessEqual(low, high)
+        self.assertLessEqual(high, 1)
+
+    def test_stratified_sample_keeps_rare_strata(self):
+        sample = sampling.stratified_sample(self.log, 20, seed=3)
+
+        # trace length 4 is a single stratum with 1% of cases
+        self.assertIn('b', sample.direct_succession['b'])
+        # each stratum contains one variant, so estimates are exact
+        self.assertEqual(sample.direct_succession['a']['b'], 910)
+
+    def test_adaptive_sample_stops_early(self):
+        sample = sampling.adaptive_sample(self.log, batch_size=50, tolerance=0.05, seed=5)
+
+        self.assertLess(sample.sample_size, 1000)
+        self.assertGreater(sample.sample_size, 50)
+
+    def test_sample_builds_network(self):
+        sample = sampling.weighted_sample(self.log, 100, seed=2)
+        network = network_factory.from_importer(sample, import_start_end_events=True)
+
+        self.assertIn('a', network.nodes)
+        self.assertTrue(network.nodes['a'].is_start_node)
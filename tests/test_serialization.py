@@ -0,0 +1,89 @@
+import io
+import os
+import tempfile
+import unittest
+from collections import Counter
+from math import inf
+
+import network_factory
+import serialization
+from bpmn_network import UtilityNode, NodeKind, NodeFunction
+from miner import alpha_miner
+from network import NodeType
+from serialization import MappedNetwork
+from tests.fixtures import test_network
+
+
+def _state(network):
+    # node sets compared as sorted lists, attribute values with their types
+    nodes, edges = network.get_state()
+    return ([(cls, {key: (sorted(value) if isinstance(value, set) else value, type(value))
+                    for key, value in attrs.items()}) for cls, attrs in nodes],
+            sorted(edges))
+
+
+class SerializationTests(unittest.TestCase):
+    def setUp(self) -> None:
+        net = network_factory.from_simple_direct_succession(test_network)
+        net.autodetect_start_nodes()
+        net.autodetect_end_nodes()
+        self.mined = alpha_miner(net)
+
+    def test_round_trip_mined_network(self):
+        loaded = serialization.loads(serialization.dumps(self.mined))
+
+        loaded._validate_structure()
+        self.assertIs(type(loaded), type(self.mined))
+        self.assertEqual(_state(loaded), _state(self.mined))
+        gate = next(node for node in loaded.nodes.values() if isinstance(node, UtilityNode))
+        self.assertEqual(gate.cnt, inf)
+        self.assertIsInstance(gate.kind, NodeKind)
+
+    def test_round_trip_flags_and_counts(self):
+        net = network_factory.from_counter_direct_succession({'a': Counter({'b': 2.5, 'a': 1})}, {'a': 3, 'b': 1.0})
+        a, b = net.nodes['a'], net.nodes['b']
+        a.is_self_looped = True
+        a.is_in_two_loop_main = True
+        a.and_paralleled_with = set()
+        b.and_paralleled_with = {'x', 'y'}
+        b.in_two_loop_feedback_with = {'a'}
+        b.is_filtered_out = True
+        net.edges['a']['a'].is_filtered_out = True
+        gate = net.nodes['gate'] = UtilityNode(net, 'gate')
+        gate.kind = NodeKind.XOR
+        gate.function = NodeFunction.LOOP_GATE
+        net.add_edge('b', 'gate')
+
+        loaded = serialization.loads(serialization.dumps(net))
+
+        self.assertEqual(_state(loaded), _state(net))
+        self.assertEqual(loaded.nodes['gate'].type, NodeType.UTILITY)
+        self.assertIsNone(loaded.nodes['a'].in_two_loop_feedback_with)
+        self.assertSetEqual(loaded.nodes['a'].and_paralleled_with, set())
+
+    def test_save_load(self):
+        stream = io.BytesIO()
+        serialization.save(self.mined, stream)
+        stream.seek(0)
+
+        self.assertEqual(_state(serialization.load(stream)), _state(self.mined))
+
+    def test_invalid_data(self):
+        with self.assertRaises(ValueError):
+            serialization.loads(b'not a network at all, not a network at all, not a network at all')
+
+    def test_mapped_network(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'net.bin')
+            serialization.save(self.mined, path)
+
+            with MappedNetwork(path) as mapped:
+                self.assertEqual(len(mapped), len(self.mined.nodes))
+                self.assertListEqual(mapped.names(), list(self.mined.nodes.keys()))
+                self.assertTrue(mapped.is_start('start_split_gate'))
+                self.assertEqual(mapped.kind('start_split_gate'), self.mined.nodes['start_split_gate'].kind)
+                self.assertIsNone(mapped.kind('a'))
+                expected = sorted((target.name, self.mined.edges['a'][target.name].cnt)
+                                  for target in self.mined.nodes['a'].successors)
+                self.assertListEqual(sorted(mapped.successors('a')), expected)
+                self.assertEqual(_state(mapped.to_network()), _state(self.mined))
@@ -1,6 +1,7 @@
 import unittest
 
 import network_factory
+from bpmn_network import LoopType
 from network import Network, NodeType
 
 
@@ -72,3 +73,39 @@ class NodeTests(unittest.TestCase):
         b = net.nodes['B']
         self.assertTrue(b.is_two_loop())
         self.assertFalse(a.is_two_loop())
+
+
+class LoopClassificationTests(unittest.TestCase):
+    def test_classify_loops(self):
+        cases = [
+            (test_net_loop1, [('A', LoopType.SELF)]),
+            (test_net_loop2, [('A', LoopType.SHORT)]),
+            (test_net_loop3, [('B', LoopType.TWO)]),
+        ]
+        for direct_succession, expected in cases:
+            net = network_factory.from_simple_direct_succession(direct_succession)
+            batch, deferred = net.classify_loops()
+            self.assertListEqual([(n.name, t) for n, t in batch], expected)
+            self.assertListEqual(deferred, [])
+
+    def test_overlapping_loops_are_deferred(self):
+        """
+        X -> A -> Y, A is self looped and in two loop with B
+        Two loop on B rewrites A's neighbours, so self loop on A cannot go in the same batch
+        """
+        net = network_factory.from_simple_direct_succession({
+            'X': {'A'},
+            'A': {'A', 'B', 'Y'},
+            'B': {'A'},
+        })
+        batch, deferred = net.classify_loops()
+        self.assertListEqual([(n.name, t) for n, t in batch], [('A', LoopType.SELF)])
+        self.assertListEqual([(n.name, t) for n, t in deferred], [('B', LoopType.TWO)])
+
+    def test_process_short_loops(self):
+        for direct_succession in (test_net_loop1, test_net_loop2, test_net_loop3):
+            net = network_factory.from_simple_direct_succession(direct_succession)
+            net.process_short_loops()
+            net._validate_structure()
+            batch, deferred = net.classify_loops()
+            self.assertListEqual(batch + deferred, [])
@@ -0,0 +1,110 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+import durations
+from import_handler import from_csv
+from sketches import KLLSketch, DurationSketches, read_events, sketch_file, sketch_files
+from tests.fixtures import timed_rows, write_timed_log
+
+
+class KLLSketchTests(unittest.TestCase):
+    def test_rank_error_within_bound(self):
+        values = np.random.default_rng(1).lognormal(3, 1.5, 100000)
+        sketch = KLLSketch(seed=1)
+        sketch.update_many(values)
+
+        ordered = np.sort(values)
+        for q in (0.5, 0.95, 0.99):
+            true_rank = np.searchsorted(ordered, sketch.quantile(q), side='right') / len(values)
+            self.assertLess(abs(true_rank - q), 0.0165)
+        self.assertEqual(sketch.count, len(values))
+        self.assertAlmostEqual(sketch.mean, values.mean())
+        self.assertEqual((sketch.quantile(0), sketch.quantile(1)), (values.min(), values.max()))
+
+    def test_bounded_memory(self):
+        sketch = KLLSketch(k=100, seed=2)
+        for _ in range(50):
+            sketch.update_many(np.random.default_rng(3).random(20000))
+
+        self.assertEqual(sketch.count, 10 ** 6)
+        self.assertLess(sketch.retained, 3 * 100 + 2 * len(sketch.levels))
+
+    def test_merge(self):
+        values = np.arange(20000, dtype=float)
+        whole = KLLSketch(seed=4)
+        whole.update_many(values)
+        parts = [KLLSketch(seed=i) for i in range(4)]
+        for part, chunk in zip(parts, np.array_split(values, 4)):
+            part.update_many(chunk)
+        merged = KLLSketch(seed=4)
+        for part in parts:
+            merged.merge(part)
+
+        self.assertEqual(merged.count, whole.count)
+        self.assertEqual(merged.sum, whole.sum)
+        for q in (0.5, 0.95, 0.99):
+            self.assertLess(abs(merged.rank(merged.quantile(q)) - q), 0.0165)
+            self.assertLess(abs(merged.quantile(q) - whole.quantile(q)) / len(values), 0.033)
+
+    def test_seeded_sketches_are_deterministic(self):
+        values = np.random.default_rng(5).random(5000)
+        first, second = KLLSketch(seed='x'), KLLSketch(seed='x')
+        first.update_many(values)
+        second.update_many(values)
+
+        self.assertEqual(first.quantiles([0.5, 0.95]), second.quantiles([0.5, 0.95]))
+        with self.assertRaises(ValueError):
+            KLLSketch().quantile(0.5)
+
+
+class DurationSketchTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.logs = [os.path.join(self.tmp_dir.name, f'log{i}.csv') for i in range(2)]
+        write_timed_log(self.logs[0], timed_rows)
+        write_timed_log(self.logs[1], [(3, 'a', 40, 41), (3, 'c', 45, 50)])
+
+    def tearDown(self) -> None:
+        self.tmp_dir.cleanup()
+
+    def test_chunks_match_exact_durations(self):
+        exact = durations.compute(from_csv(self.logs[0]))
+
+        for chunksize in (1, 2, 4):
+            sketched = sketch_file(self.logs[0], chunksize=chunksize).to_log_durations()
+
+            self.assertEqual(sketched.service.keys(), exact.service.keys())
+            # pairs across chunk boundaries are kept
+            self.assertEqual(sketched.waiting.keys(), exact.waiting.keys())
+            for stats, exact_stats in ((sketched.service, exact.service), (sketched.waiting, exact.waiting)):
+                for key, value in stats.items():
+                    self.assertEqual((value.mean, value.max, value.count),
+                                     (exact_stats[key].mean, exact_stats[key].max, exact_stats[key].count))
+
+    def test_merge_files(self):
+        in_process = sketch_files(self.logs, chunksize=3, seed=1, workers=1)
+        in_pool = sketch_files(self.logs, chunksize=3, seed=1, workers=2)
+
+        self.assertEqual(in_process.to_log_durations(), in_pool.to_log_durations())
+        self.assertEqual(in_process.waiting[('a', 'c')].count, 1)
+        self.assertEqual(in_process.service['a'].count, 3)
+
+        single = DurationSketches()
+        for chunk in read_events(self.logs[1]):
+            single.add_events(chunk)
+        self.assertEqual(single.waiting[('a', 'c')].quantile(0.5), 240)
+
+    def test_log_not_grouped_by_case(self):
+        by_time = sorted(timed_rows, key=lambda row: row[2])
+        by_time[2], by_time[3] = by_time[3], by_time[2]
+        write_timed_log(self.logs[0], by_time)
+
+        with self.assertRaises(ValueError):
+            sketch_file(self.logs[0])
+        # case 1 is carried from the first chunk, but comes again after case 2
+        write_timed_log(self.logs[0], timed_rows[:2] + timed_rows[3:4] + timed_rows[2:3] + timed_rows[4:])
+        with self.assertRaises(ValueError):
+            sketch_file(self.logs[0], chunksize=2)